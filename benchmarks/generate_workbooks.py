@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Synthetic Workbook Generator
+
+Creates reproducible input folders for the benchmark suite. Every workbook
+looks like the transcription part files in sample_data/ (a bold header row
+followed by Filename / Transcription / Status rows), and the amount of
+formatting can be varied: the share of highlighted rows, the density of bold
+and italic cells, and a stray formatted cell far below the data (the
+"phantom rows" that a badly saved workbook declares).
+
+Usage:
+    python benchmarks/generate_workbooks.py output_folder --files 8 --rows 5000
+"""
+
+import os
+import random
+import argparse
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font
+
+HIGHLIGHT_COLORS = ['FFFF00', '92D050', 'FFC000', '00B0F0']
+WORDS = ['corner', 'street', 'avenue', 'northwest', 'southeast', 'near', 'the', 'of',
+         'and', 'blvd', 'road', 'in', 'city', 'store', 'pharmacy', 'drive', 'lane', 'at']
+STATUSES = [None, None, None, None, 'Done', 'Review', 'Redo']
+
+
+def generate_workbook(file_path, rows, rng, highlight_pct=5.0, bold_pct=1.0,
+                      italic_pct=1.0, stray_row=0, start_index=0):
+    """
+    Write one synthetic transcription workbook.
+
+    Args:
+        file_path (str): Path of the workbook to create
+        rows (int): Number of data rows (excluding the header)
+        rng (random.Random): Seeded random generator
+        highlight_pct (float): Percentage of rows with a highlight fill
+        bold_pct (float): Percentage of cells that are bold
+        italic_pct (float): Percentage of cells that are italic
+        stray_row (int): Row number of a stray formatted empty cell (0 for none)
+        start_index (int): First number used in the generated audio filenames
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+
+    fills = {color: PatternFill(start_color=color, end_color=color, fill_type='solid')
+             for color in HIGHLIGHT_COLORS}
+    fonts = {(bold, italic): Font(bold=bold, italic=italic)
+             for bold in (False, True) for italic in (False, True)}
+
+    header = []
+    for value in ['Filename', 'Transcription', 'Status']:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = fonts[(True, False)]
+        header.append(cell)
+    ws.append(header)
+
+    for i in range(rows):
+        values = [
+            f"lp{start_index + i:05d}.wav",
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))).capitalize() + '.',
+            rng.choice(STATUSES),
+        ]
+        fill = None
+        if rng.random() * 100 < highlight_pct:
+            fill = fills[rng.choice(HIGHLIGHT_COLORS)]
+
+        row = []
+        for value in values:
+            bold = rng.random() * 100 < bold_pct
+            italic = rng.random() * 100 < italic_pct
+            if fill is None and not bold and not italic:
+                row.append(value)
+                continue
+            cell = WriteOnlyCell(ws, value=value)
+            if fill is not None:
+                cell.fill = fill
+            if bold or italic:
+                cell.font = fonts[(bold, italic)]
+            row.append(cell)
+        ws.append(row)
+
+    if stray_row and stray_row > rows + 1:
+        # A formatted but empty cell far below the data
+        for _ in range(rows + 2, stray_row):
+            ws.append([])
+        cell = WriteOnlyCell(ws, value=None)
+        cell.fill = fills[HIGHLIGHT_COLORS[0]]
+        ws.append([None, cell])
+
+    wb.save(file_path)
+
+
+def generate_folder(folder_path, files=4, rows=1000, highlight_pct=5.0, bold_pct=1.0,
+                    italic_pct=1.0, stray_row=0, seed=42):
+    """
+    Write a folder of synthetic part files.
+
+    The same arguments (including the seed) always produce the same content.
+
+    Returns:
+        list: Paths of the generated workbooks in sorted order
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    rng = random.Random(seed)
+
+    file_paths = []
+    for index in range(files):
+        file_path = os.path.join(folder_path, f"synthetic_transcriptions_part{index + 1:04d}.xlsx")
+        generate_workbook(file_path, rows, rng, highlight_pct=highlight_pct,
+                          bold_pct=bold_pct, italic_pct=italic_pct,
+                          stray_row=stray_row, start_index=index * rows)
+        file_paths.append(file_path)
+
+    return file_paths
+
+
+def add_generator_arguments(parser):
+    """Add the generator options to an argument parser."""
+    parser.add_argument('--files', type=int, default=4,
+                        help='Number of workbooks (default: 4)')
+    parser.add_argument('--rows', type=int, default=1000,
+                        help='Data rows per workbook (default: 1000)')
+    parser.add_argument('--highlight-pct', type=float, default=5.0,
+                        help='Percentage of highlighted rows (default: 5)')
+    parser.add_argument('--bold-pct', type=float, default=1.0,
+                        help='Percentage of bold cells (default: 1)')
+    parser.add_argument('--italic-pct', type=float, default=1.0,
+                        help='Percentage of italic cells (default: 1)')
+    parser.add_argument('--stray-row', type=int, default=0,
+                        help='Row of a stray formatted cell below the data, 0 for none (default: 0)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed (default: 42)')
+
+
+def generator_options(args):
+    """Get the generate_folder() keyword arguments from parsed arguments."""
+    return {
+        'files': args.files,
+        'rows': args.rows,
+        'highlight_pct': args.highlight_pct,
+        'bold_pct': args.bold_pct,
+        'italic_pct': args.italic_pct,
+        'stray_row': args.stray_row,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic workbooks for benchmarking')
+    parser.add_argument('folder_path', help='Folder to write the workbooks to')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    file_paths = generate_folder(args.folder_path, **generator_options(args))
+    print(f"Generated {len(file_paths)} workbooks in {os.path.abspath(args.folder_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark Harness
+
+Times the combiner's hot paths on a synthetic input folder (see
+generate_workbooks.py) and records their peak Python memory with tracemalloc:
+
+    cli     combine_excel_files.combine_excel_files() on the whole folder
+    reader  excel_reader.read_excel_data_with_formatting() on every file
+    native  xlsx_reader.read_xlsx_data_with_formatting() on every file
+    engine  combine_engine.combine_with_formatting() on every file
+    gui     the GUI's combine run, driven headlessly without a Tk window
+
+Each case is timed --repeat times without tracing, then run once more under
+tracemalloc for its peak memory, so tracing overhead never skews the timings.
+Results are written as JSON together with the generator parameters, so runs
+from different versions can be compared with --compare.
+
+Usage:
+    python benchmarks/run_benchmarks.py --files 8 --rows 5000 -o results.json
+    python benchmarks/run_benchmarks.py --compare results.json -o new.json
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import threading
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from generate_workbooks import generate_folder, add_generator_arguments, generator_options  # noqa: E402
+
+RESULTS_VERSION = 1
+CASES = ['cli', 'reader', 'native', 'engine', 'gui']
+CLI_OUTPUT = 'benchmark_cli_output.xlsx'
+ENGINE_OUTPUT = 'benchmark_engine_output.xlsx'
+GUI_OUTPUT = 'benchmark_gui_output.xlsx'
+
+
+class _Value:
+    """Stand-in for the Tk variables read by ExcelCombinerGUI."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class _SilentMessagebox:
+    """Stand-in for tkinter.messagebox that records instead of showing dialogs."""
+
+    def __init__(self):
+        self.messages = []
+
+    def __getattr__(self, name):
+        def show(title, message, **kwargs):
+            self.messages.append((name, title, message))
+            return True
+        return show
+
+
+def make_headless_gui(folder_path, output_filename):
+    """
+    Create an ExcelCombinerGUI whose combine run works without a Tk window.
+
+    Returns:
+        ExcelCombinerGUI: Instance with plain-value options and a list-backed log
+    """
+    import excel_combiner_gui
+
+    excel_combiner_gui.messagebox = _SilentMessagebox()
+
+    gui = excel_combiner_gui.ExcelCombinerGUI.__new__(excel_combiner_gui.ExcelCombinerGUI)
+    gui.folder_path = _Value(folder_path)
+    gui.output_filename = _Value(output_filename)
+    gui.streaming_output = _Value(True)
+    gui.workers = _Value(1)
+    gui.incremental = _Value(False)
+    gui.use_parse_cache = _Value(False)
+    gui.checkpoint = _Value(False)
+    gui.recursive = _Value(False)
+    gui.reader_backend = _Value('openpyxl')
+    gui.all_sheets = _Value(False)
+    gui.sheet_pattern = _Value('')
+    gui.sheet_column = _Value(False)
+    gui.dedup = _Value(False)
+    gui.dedup_keep = _Value('first')
+    gui.split_files = _Value(False)
+    gui.trace_memory = _Value(False)
+    gui.prescan = None
+    gui.cancel_event = threading.Event()
+    gui.log_lines = []
+    gui.log_message = gui.log_lines.append
+    gui.report_progress = lambda report: None
+    return gui
+
+
+def run_cli(folder_path, file_paths):
+    import combine_excel_files
+    combine_excel_files.combine_excel_files(folder_path, CLI_OUTPUT)
+
+
+def run_reader(folder_path, file_paths):
+    from excel_reader import read_excel_data_with_formatting
+    for file_path in file_paths:
+        read_excel_data_with_formatting(file_path)
+
+
+def run_native(folder_path, file_paths):
+    from xlsx_reader import read_xlsx_data_with_formatting
+    for file_path in file_paths:
+        read_xlsx_data_with_formatting(file_path)
+
+
+def run_engine(folder_path, file_paths):
+    from combine_engine import combine_with_formatting
+    combine_with_formatting(file_paths, os.path.join(folder_path, ENGINE_OUTPUT),
+                            log=lambda message: None)
+
+
+def run_gui(folder_path, file_paths):
+    gui = make_headless_gui(folder_path, GUI_OUTPUT)
+    if not gui.combine_excel_files():
+        raise RuntimeError("GUI combine failed: " + "; ".join(gui.log_lines[-3:]))
+
+
+CASE_FUNCTIONS = {
+    'cli': run_cli,
+    'reader': run_reader,
+    'native': run_native,
+    'engine': run_engine,
+    'gui': run_gui,
+}
+
+
+def _remove_outputs(folder_path):
+    """Delete the outputs of earlier runs so every run starts from the same state."""
+    for name in (CLI_OUTPUT, ENGINE_OUTPUT, GUI_OUTPUT):
+        path = os.path.join(folder_path, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_case(name, folder_path, file_paths, repeat):
+    """
+    Benchmark one case.
+
+    Returns:
+        dict: Wall-clock times of every run plus best/median time and peak memory
+    """
+    func = CASE_FUNCTIONS[name]
+    times = []
+
+    for _ in range(repeat):
+        _remove_outputs(folder_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(folder_path, file_paths)
+            times.append(time.perf_counter() - start)
+
+    _remove_outputs(folder_path)
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(folder_path, file_paths)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    _remove_outputs(folder_path)
+
+    return {
+        'times': [round(t, 4) for t in times],
+        'best': round(min(times), 4),
+        'median': round(statistics.median(times), 4),
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+    }
+
+
+def _git_commit():
+    """Return the current commit of the repository, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current):
+    """
+    Format a comparison of two result sets.
+
+    Returns:
+        str: One line per case found in both results
+    """
+    lines = [f"{'case':<8} {'baseline s':>11} {'current s':>10} {'speedup':>8} "
+             f"{'baseline MB':>12} {'current MB':>11}"]
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            continue
+        speedup = old['median'] / result['median'] if result['median'] else float('inf')
+        lines.append(f"{name:<8} {old['median']:>11.3f} {result['median']:>10.3f} "
+                     f"{speedup:>7.2f}x {old['peak_memory_mb']:>12.1f} "
+                     f"{result['peak_memory_mb']:>11.1f}")
+    if baseline.get('params') != current.get('params'):
+        lines.append("Warning: the two runs used different generator parameters")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Excel combiner on synthetic workbooks')
+    add_generator_arguments(parser)
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f"Comma-separated cases to run (default: {','.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed runs per case (default: 3)')
+    parser.add_argument('--data-dir',
+                        help='Folder for the generated workbooks (default: a temporary folder)')
+    parser.add_argument('--keep-data', action='store_true',
+                        help='Keep the generated workbooks after the run')
+    parser.add_argument('--label', help='Free-form label stored with the results')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare against an earlier results JSON file')
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASE_FUNCTIONS]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    params = generator_options(args)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='excel_combiner_bench_')
+
+    try:
+        print(f"Generating {params['files']} workbook(s) x {params['rows']:,} row(s) in {data_dir}")
+        file_paths = generate_folder(data_dir, **params)
+
+        results = {}
+        for name in cases:
+            print(f"Running {name}...", end=' ', flush=True)
+            try:
+                results[name] = run_case(name, data_dir, file_paths, args.repeat)
+            except ImportError as e:
+                # e.g. the GUI case on a Python build without tkinter
+                print(f"skipped ({e})")
+                continue
+            print(f"median {results[name]['median']:.3f}s, "
+                  f"peak {results[name]['peak_memory_mb']:.1f} MB")
+    finally:
+        if not args.data_dir and not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'version': RESULTS_VERSION,
+        'label': args.label,
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print()
+        print(compare_results(baseline, report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+
+Times how long the GUI takes to start, each launch in a fresh process so
+nothing is cached in the interpreter:
+
+    import    importing excel_combiner_gui (no window; works headless) and
+              which heavy modules (pandas, openpyxl, ...) that loaded
+    script    python excel_combiner_gui.py until its window is drawn
+    packaged  the PyInstaller executable (--executable) until its window is drawn
+
+The script and packaged launches pass --exit-after-startup, which closes
+the window as soon as it is drawn, and need a display; without one they are
+skipped. Results are written as JSON and can be compared with --compare.
+
+Usage:
+    python benchmarks/startup_benchmark.py -o startup.json
+    python benchmarks/startup_benchmark.py --executable dist/ExcelCombiner --compare startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+GUI_SCRIPT = os.path.join(REPO_DIR, 'excel_combiner_gui.py')
+
+RESULTS_VERSION = 1
+CASES = ['import', 'script', 'packaged']
+
+# Heavy modules whose presence after the import is reported
+HEAVY_MODULES = ('pandas', 'openpyxl', 'numpy', 'pyarrow')
+
+# Seconds a launch may take before it counts as failed
+LAUNCH_TIMEOUT = 120
+
+IMPORT_CHECK = (
+    "import sys, json, time\n"
+    "start = time.perf_counter()\n"
+    "import excel_combiner_gui\n"
+    "seconds = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': seconds, 'loaded': [name for name in %r if name in sys.modules]}))\n"
+    % (HEAVY_MODULES,)
+)
+
+
+def _launch(command):
+    """
+    Run a launch command to completion.
+
+    Returns:
+        tuple: (wall-clock seconds, standard output)
+
+    Raises:
+        RuntimeError: If the command fails or times out
+    """
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True, timeout=LAUNCH_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"no exit within {LAUNCH_TIMEOUT}s")
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"exit code {completed.returncode}")
+    return seconds, completed.stdout
+
+
+def run_import(repeat, executable):
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        _, output = _launch([sys.executable, '-c', IMPORT_CHECK])
+        result = json.loads(output)
+        times.append(result['seconds'])
+        loaded = result['loaded']
+    return times, {'heavy_modules_loaded': loaded}
+
+
+def run_script(repeat, executable):
+    return [_launch([sys.executable, GUI_SCRIPT, '--exit-after-startup'])[0] for _ in range(repeat)], {}
+
+
+def run_packaged(repeat, executable):
+    if not executable:
+        raise RuntimeError("no --executable given")
+    # The first launch of a onefile executable also unpacks it; it is timed separately
+    first, _ = _launch([executable, '--exit-after-startup'])
+    times = [_launch([executable, '--exit-after-startup'])[0] for _ in range(repeat)]
+    return times, {'first_launch': round(first, 4)}
+
+
+CASE_FUNCTIONS = {
+    'import': run_import,
+    'script': run_script,
+    'packaged': run_packaged,
+}
+
+
+def compare_results(baseline, current):
+    """
+    Format a comparison of two result sets.
+
+    Returns:
+        str: One line per case found in both results
+    """
+    lines = [f"{'case':<9} {'baseline s':>11} {'current s':>10} {'speedup':>8}"]
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            continue
+        speedup = old['median'] / result['median'] if result['median'] else float('inf')
+        lines.append(f"{name:<9} {old['median']:>11.3f} {result['median']:>10.3f} {speedup:>7.2f}x")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the Excel combiner GUI')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f"Comma-separated cases to run (default: {','.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Launches per case (default: 5)')
+    parser.add_argument('--executable',
+                        help='Packaged executable for the packaged case (e.g. dist/ExcelCombiner, '
+                             'dist/ExcelCombiner.app/Contents/MacOS/ExcelCombiner or dist_win11/ExcelCombiner.exe)')
+    parser.add_argument('--label', help='Free-form label stored with the results')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare against an earlier results JSON file')
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASE_FUNCTIONS]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    results = {}
+    for name in cases:
+        print(f"Running {name}...", end=' ', flush=True)
+        try:
+            times, extra = CASE_FUNCTIONS[name](args.repeat, args.executable)
+        except RuntimeError as e:
+            # e.g. no display for the window launches, or no executable built
+            print(f"skipped ({e})")
+            continue
+        results[name] = {
+            'times': [round(t, 4) for t in times],
+            'best': round(min(times), 4),
+            'median': round(statistics.median(times), 4),
+        }
+        results[name].update(extra)
+        print(f"median {results[name]['median']:.3f}s" +
+              (f", loaded {', '.join(extra['heavy_modules_loaded']) or 'no heavy modules'}"
+               if 'heavy_modules_loaded' in extra else ""))
+
+    report = {
+        'version': RESULTS_VERSION,
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'executable': args.executable,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print()
+        print(compare_results(baseline, report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Block Store
+
+Pickle-free storage of reader results for manifests and checkpoints, which
+live next to the combined output, and for the parse cache; both may sit in
+a shared folder. Loading a
+stored block must never run code, so every block is a directory holding its
+DataFrames in Feather format (Arrow's binary columnar format) and a JSON file
+with everything else: the column names, the row formats and phantom row
+count of a formatting reader, and the sheet names of a multi-sheet result.
+
+Columns that Arrow cannot store (e.g. numbers and text mixed in one column),
+and all columns when pyarrow is not installed, are kept in the JSON file
+with their values tagged by type. A value of any other type makes the block
+unstorable; save_block() then raises TypeError and the caller simply does
+not reuse that file.
+"""
+
+import os
+import json
+import shutil
+import datetime
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Bump whenever the layout of a stored block changes
+BLOCK_VERSION = 1
+
+META_FILE = 'block.json'
+
+
+def _encode_value(value):
+    """Convert a cell value to JSON; values JSON cannot represent are tagged by type."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if value is pd.NaT:
+        return {'nat': None}
+    if value is pd.NA:
+        return {'na': None}
+    if isinstance(value, np.generic):
+        return _encode_value(value.item())
+    if isinstance(value, pd.Timestamp):
+        return {'timestamp': value.isoformat()}
+    if isinstance(value, datetime.datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'date': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'time': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'timedelta': [value.days, value.seconds, value.microseconds]}
+    raise TypeError(f"cannot store a value of type {type(value).__name__}")
+
+
+def _decode_value(value):
+    if not isinstance(value, dict):
+        return value
+    (tag, data), = value.items()
+    if tag == 'nat':
+        return pd.NaT
+    if tag == 'na':
+        return pd.NA
+    if tag == 'timestamp':
+        return pd.Timestamp(data)
+    if tag == 'datetime':
+        return datetime.datetime.fromisoformat(data)
+    if tag == 'date':
+        return datetime.date.fromisoformat(data)
+    if tag == 'time':
+        return datetime.time.fromisoformat(data)
+    if tag == 'timedelta':
+        return datetime.timedelta(*data)
+    raise ValueError(f"unknown value tag {tag!r}")
+
+
+def _arrow_columns(frame):
+    """Get the positions of the columns of a frame that Arrow can store."""
+    if not HAS_PYARROW:
+        return []
+    try:
+        pa.Table.from_pandas(frame, preserve_index=False)
+        return list(range(len(frame.columns)))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    positions = []
+    for position in range(len(frame.columns)):
+        try:
+            pa.Table.from_pandas(frame.iloc[:, [position]], preserve_index=False)
+            positions.append(position)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return positions
+
+
+def _save_frame(df, block_dir, frame_file):
+    """Write a DataFrame and return its JSON description."""
+    frame = df.reset_index(drop=True)
+    frame.columns = [str(i) for i in range(len(frame.columns))]
+    arrow_positions = _arrow_columns(frame)
+
+    json_columns = []
+    for position in range(len(frame.columns)):
+        if position not in arrow_positions:
+            series = frame.iloc[:, position]
+            json_columns.append([position, str(series.dtype), [_encode_value(v) for v in series.tolist()]])
+
+    if arrow_positions:
+        frame.iloc[:, arrow_positions].to_feather(os.path.join(block_dir, frame_file))
+    else:
+        frame_file = None
+
+    return {
+        'file': frame_file,
+        'rows': len(frame),
+        'columns': [_encode_value(name) for name in df.columns],
+        'json_columns': json_columns,
+    }
+
+
+def _load_frame(meta, block_dir):
+    """Read a DataFrame written by _save_frame()."""
+    if meta['file'] is not None:
+        frame = pd.read_feather(os.path.join(block_dir, meta['file']))
+    else:
+        frame = pd.DataFrame(index=pd.RangeIndex(meta['rows']))
+    for position, dtype, values in meta['json_columns']:
+        series = pd.Series([_decode_value(v) for v in values], dtype=object)
+        if dtype != 'object':
+            series = series.astype(dtype)
+        frame.insert(position, str(position), series)
+    if meta['columns']:
+        frame.columns = [_decode_value(name) for name in meta['columns']]
+    return frame
+
+
+def _save_result(result, block_dir, frame_files):
+    """Describe a reader result as JSON, writing its frames to block_dir."""
+    frame_file = f"frame-{len(frame_files)}.feather"
+    if isinstance(result, pd.DataFrame):
+        frame_files.append(frame_file)
+        return {'kind': 'frame', 'frame': _save_frame(result, block_dir, frame_file)}
+    if isinstance(result, tuple):
+        # read_excel_data_with_formatting(): (DataFrame, filename, row formats, phantom rows)
+        df, _filename, row_formats, phantom_rows = result
+        frame_files.append(frame_file)
+        return {
+            'kind': 'formatting',
+            'frame': _save_frame(df, block_dir, frame_file),
+            # JSON object keys are strings, so the {row: {column: format}} maps are stored as pairs
+            'row_formats': [[row, [[col, fmt] for col, fmt in row_format.items()]]
+                            for row, row_format in row_formats.items()],
+            'phantom_rows': phantom_rows,
+        }
+    if isinstance(result, list):
+        # read_excel_files() with a SheetSelection: [(sheet name, reader result), ...]
+        return {'kind': 'sheets',
+                'sheets': [[name, _save_result(sheet_result, block_dir, frame_files)]
+                           for name, sheet_result in result]}
+    raise TypeError(f"cannot store a reader result of type {type(result).__name__}")
+
+
+def _load_result(meta, block_dir, file_path):
+    kind = meta['kind']
+    if kind == 'frame':
+        return _load_frame(meta['frame'], block_dir)
+    if kind == 'formatting':
+        row_formats = {row: {col: fmt for col, fmt in row_format} for row, row_format in meta['row_formats']}
+        return (_load_frame(meta['frame'], block_dir), os.path.basename(file_path),
+                row_formats, meta['phantom_rows'])
+    if kind == 'sheets':
+        return [(name, _load_result(sheet_meta, block_dir, file_path)) for name, sheet_meta in meta['sheets']]
+    raise ValueError(f"unknown block kind {kind!r}")
+
+
+def save_block(block_dir, result):
+    """
+    Store a reader result, replacing any block already at block_dir.
+
+    The block is written to a temporary directory that is renamed into
+    place, so an interrupted save never leaves a partial block behind.
+
+    Args:
+        block_dir (str): Directory of the block
+        result: Reader result (a DataFrame, a read_excel_data_with_formatting()
+            tuple, or a list of (sheet name, result) pairs)
+
+    Raises:
+        TypeError: If the result holds values that cannot be stored
+        OSError: If the block cannot be written
+    """
+    parent_dir = os.path.dirname(block_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=parent_dir)
+    try:
+        meta = {'version': BLOCK_VERSION, 'result': _save_result(result, tmp_path, [])}
+        with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        shutil.rmtree(block_dir, ignore_errors=True)
+        os.rename(tmp_path, block_dir)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def load_block(block_dir, file_path):
+    """
+    Load a reader result stored by save_block().
+
+    Args:
+        block_dir (str): Directory of the block
+        file_path (str): Input file the result belongs to (its name is the
+            source filename of a formatting reader's result)
+
+    Returns:
+        The stored reader result
+
+    Raises:
+        Exception: Any error raised while reading the block; callers treat
+            every failure as a block that is not there
+    """
+    with open(os.path.join(block_dir, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != BLOCK_VERSION:
+        raise ValueError(f"block version {meta.get('version')} is not {BLOCK_VERSION}")
+    return _load_result(meta['result'], block_dir, file_path)
@@ -0,0 +1,890 @@
+#!/usr/bin/env python3
+"""
+Combine Engine
+
+Headless, formatting-preserving combine shared by the GUI and the command-line
+version. The engine takes a list of input files and writes the combined
+workbook with full-row highlighting and bold/italic fonts carried over from
+the inputs. It never touches a display: messages and progress are reported
+through optional callbacks, so it runs the same inside the GUI's worker
+thread, on a server without a display, or under a profiler.
+
+Output with more rows than one worksheet holds is split before anything is
+written, into further sheets of the workbook or into numbered files that are
+written in parallel (see output_shards). The same combined rows can also be
+written as CSV, Parquet or Feather files, with each row's highlight color in
+a Highlight column.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from excel_reader import read_excel_data_with_formatting, read_excel_files, READER_VERSION, row_highlight_color
+from style_cache import StyleCache
+from combine_manifest import InputManifest
+from parse_cache import CachedReader
+from combine_progress import ProgressTracker, scan_file_sizes
+from combine_table import CombinedTable, output_columns, iter_output_rows, slice_rows, to_frame
+from xlsx_reader import read_xlsx_data_with_formatting, XLSX_READER_VERSION
+from row_dedup import RowDeduplicator, DEFAULT_DEDUP_KEEP, DEFAULT_MAX_MEMORY_KEYS, format_dropped_rows
+from output_shards import (plan_shards, shard_path, shard_sheet_title, format_shard_plan,
+                           DEFAULT_SHARD_ROWS, DEFAULT_SHARD_MODE)
+from run_report import RunReport
+from combine_options import DEFAULT_READER_BACKEND
+from workbook_prescan import prescan_group_rows
+
+OUTPUT_SHEET_TITLE = "Combined_Data"
+
+# Name of the formatting reader in manifests and parse cache keys
+FORMATTING_READER_NAME = 'with_formatting'
+
+# Reader backends: {backend: (reader, name in manifests and cache keys, reader version)}
+READER_BACKENDS = {
+    'openpyxl': (read_excel_data_with_formatting, FORMATTING_READER_NAME, READER_VERSION),
+    'native': (read_xlsx_data_with_formatting, 'with_formatting_native', XLSX_READER_VERSION),
+}
+
+# How highlighted rows are filled: 'row' gives the row a row-level style and
+# fills only its populated cells, 'cells' fills every cell up to
+# get_fill_columns() (the original behavior, with many empty styled cells)
+HIGHLIGHT_MODES = ('row', 'cells')
+DEFAULT_HIGHLIGHT_MODE = 'row'
+
+# Output rows written between two write progress updates
+WRITE_PROGRESS_ROWS = 1000
+
+# Column that carries each row's highlight color in the non-Excel formats
+HIGHLIGHT_COLUMN = 'Highlight'
+
+
+class CombineCancelled(Exception):
+    """Raised when a combine is cancelled through its cancel event."""
+
+
+def _ignore_progress(*args):
+    pass
+
+
+def check_cancelled(cancel_event):
+    """Raise CombineCancelled if cancellation has been requested."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise CombineCancelled("Combine cancelled")
+
+
+def _until_cancelled(file_results, cancel_event):
+    """
+    Pass file results through, stopping between files once cancellation is requested.
+
+    The wrapped generator is always closed, so a process pool drops the files it
+    has not started and a manifest saves its checkpoint.
+    """
+    try:
+        check_cancelled(cancel_event)
+        for file_result in file_results:
+            yield file_result
+            check_cancelled(cancel_event)
+    finally:
+        file_results.close()
+
+
+def get_row_highlight_colors(all_formatting, total_rows):
+    """
+    Determine the full-row highlight color of every formatted output row.
+
+    Args:
+        all_formatting (list): Per-file {output row: {column: cell format}} dicts
+        total_rows (int): Number of rows in the output (header included)
+
+    Returns:
+        tuple: (set of highlighted row numbers, {row number: 6-digit hex color})
+    """
+    formatted_rows_set = set()  # Track which rows need full-row formatting
+    row_colors = {}  # Store the primary color for each row
+
+    for format_dict in all_formatting:
+        for row_num, row_format in format_dict.items():
+            if row_num <= total_rows:
+                fill_color = row_highlight_color(row_format)
+                if fill_color is not None:
+                    formatted_rows_set.add(row_num)
+                    row_colors[row_num] = fill_color
+
+    return formatted_rows_set, row_colors
+
+
+def get_cell_fonts(all_formatting, font_columns):
+    """
+    Merge the bold/italic flags of every formatted cell into one lookup per row.
+
+    Args:
+        all_formatting (list): Per-file {output row: {column: cell format}} dicts
+        font_columns (int): Highest column that may receive a font
+
+    Returns:
+        dict: {row number: {column: (bold, italic)}}
+    """
+    row_fonts = {}
+    for format_dict in all_formatting:
+        for row_num, row_format in format_dict.items():
+            for col_num, cell_format in row_format.items():
+                if 'font' in cell_format and col_num <= font_columns:
+                    font_info = cell_format['font']
+                    cell_fonts = row_fonts.setdefault(row_num, {})
+                    bold, italic = cell_fonts.get(col_num, (False, False))
+                    cell_fonts[col_num] = (bold or font_info.get('bold', False),
+                                           italic or font_info.get('italic', False))
+    return row_fonts
+
+
+def get_fill_columns(data_columns):
+    """Get the number of columns a full-row highlight spans."""
+    # Color at least 15 columns for visual effect, plus extra columns beyond the data
+    return max(data_columns, 15) + 9
+
+
+def adjust_row_formats(row_formats, current_row, first_file):
+    """
+    Map a file's worksheet row formats to rows of the combined output.
+
+    The first file keeps its header row, so worksheet row r lands on output row
+    current_row + r - 1. Later files lose their first data row, so their rows
+    shift by one more and the formatting of their header row is dropped.
+
+    Args:
+        row_formats (dict): {worksheet row: {column: cell format}} of one file
+        current_row (int): Output row the file's block starts at
+        first_file (bool): Whether this is the first file of the output
+
+    Returns:
+        dict: {output row: {column: cell format}}
+    """
+    adjusted_formats = {}
+    for orig_row, format_info in row_formats.items():
+        # Calculate new row position in combined file
+        if first_file:
+            new_row = current_row + (orig_row - 1)
+        else:
+            # Subsequent files: adjust for skipped header
+            if orig_row > 1:  # Skip header row
+                new_row = current_row + (orig_row - 2)
+            else:
+                continue  # Skip header formatting
+
+        adjusted_formats[new_row] = format_info
+    return adjusted_formats
+
+
+def remap_row_formats(all_formatting, keep_mask, first_row=2):
+    """
+    Map output row formats to the rows that remain after rows were dropped.
+
+    Args:
+        all_formatting (list): Per-file {output row: {column: cell format}} dicts
+        keep_mask (numpy.ndarray): One keep flag per row from output row first_row on
+        first_row (int): Output row of the first keep flag (2, the first data
+            row, for a mask of all rows; the row a block starts at for the mask
+            of one block). Rows before it (e.g. the header) are kept as they are
+
+    Returns:
+        list: The per-file dicts with the formats of dropped rows removed and
+            the remaining rows renumbered
+    """
+    # Number of rows kept up to and including each masked row
+    kept_rows = np.cumsum(keep_mask)
+    remapped = []
+    for format_dict in all_formatting:
+        adjusted_formats = {}
+        for row_num, row_format in format_dict.items():
+            if row_num < first_row:
+                adjusted_formats[row_num] = row_format  # Header row or rows of earlier blocks
+                continue
+            data_index = row_num - first_row
+            if data_index < len(keep_mask) and keep_mask[data_index]:
+                adjusted_formats[int(kept_rows[data_index]) + first_row - 1] = row_format
+        if adjusted_formats:
+            remapped.append(adjusted_formats)
+    return remapped
+
+
+def shard_row_formats(all_formatting, row_colors, start, stop):
+    """
+    Select the row formats and highlight colors of one output shard.
+
+    The header row (row 1) is repeated on every shard, and the formats of
+    data rows [start, stop) are renumbered to follow it.
+
+    Args:
+        all_formatting (list): Per-file {output row: {column: cell format}} dicts
+        row_colors (dict): {output row: 6-digit hex color}
+        start (int): First data row of the shard
+        stop (int): Data row after the last one of the shard
+
+    Returns:
+        tuple: (per-file {shard row: {column: cell format}} dicts, {shard row: color})
+    """
+    # Output rows of the shard's data rows
+    first_row, last_row = start + 2, stop + 1
+    shard_formatting = []
+    for format_dict in all_formatting:
+        adjusted_formats = {}
+        for row_num, row_format in format_dict.items():
+            if row_num == 1:
+                adjusted_formats[row_num] = row_format  # Header row
+            elif first_row <= row_num <= last_row:
+                adjusted_formats[row_num - start] = row_format
+        if adjusted_formats:
+            shard_formatting.append(adjusted_formats)
+    shard_colors = {(row_num if row_num == 1 else row_num - start): fill_color
+                    for row_num, fill_color in row_colors.items()
+                    if row_num == 1 or first_row <= row_num <= last_row}
+    return shard_formatting, shard_colors
+
+
+def _shard_content(combined_data, all_formatting, row_colors, start, stop, copy=False):
+    """Get the (rows, formats, highlight colors) of a shard; the whole output is passed through as is."""
+    if start == 0 and stop == len(combined_data):
+        return combined_data, all_formatting, row_colors
+    shard_formatting, shard_colors = shard_row_formats(all_formatting, row_colors, start, stop)
+    return slice_rows(combined_data, start, stop, copy), shard_formatting, shard_colors
+
+
+def _fill_worksheet(output_ws, combined_data, all_formatting, row_colors, style_cache, log, report_rows,
+                    highlight_mode):
+    """Write the rows of one sheet of write_output_workbook(), reporting written rows through report_rows."""
+    # Write data to the workbook
+    for r_idx, row in enumerate(iter_output_rows(combined_data), 1):
+        for c_idx, value in enumerate(row, 1):
+            output_ws.cell(row=r_idx, column=c_idx, value=value)
+        if r_idx % WRITE_PROGRESS_ROWS == 0:
+            report_rows(r_idx)
+
+    total_rows = output_ws.max_row
+    data_columns = output_ws.max_column
+    fill_columns = get_fill_columns(data_columns)
+    # Fonts are only applied within the sheet width (which highlighting extends)
+    font_columns = fill_columns if row_colors else data_columns
+    row_fonts = get_cell_fonts(all_formatting, font_columns)
+
+    # Apply full-row background colors (together with the fonts of those rows)
+    filled_rows = set()
+    for row_num, fill_color in row_colors.items():
+        cell_fonts = row_fonts.get(row_num, {})
+        try:
+            if highlight_mode == 'row':
+                # The row style fills the empty cells; cells with a value or a
+                # font carry their own style and need the fill as well
+                style_cache.apply(output_ws.row_dimensions[row_num], fill_color)
+                for col_idx in range(1, max([data_columns] + list(cell_fonts)) + 1):
+                    cell = output_ws.cell(row=row_num, column=col_idx)
+                    if cell.value is not None or col_idx in cell_fonts:
+                        bold, italic = cell_fonts.get(col_idx, (False, False))
+                        style_cache.apply(cell, fill_color, bold, italic)
+            else:
+                # Apply background color to entire row (extend well beyond data columns)
+                for col_idx in range(1, fill_columns + 1):
+                    bold, italic = cell_fonts.get(col_idx, (False, False))
+                    style_cache.apply(output_ws.cell(row=row_num, column=col_idx),
+                                      fill_color, bold, italic)
+            filled_rows.add(row_num)
+
+        except Exception as e:
+            log(f"    Warning: Could not apply full-row color {fill_color} to row {row_num}: {e}")
+
+    # Apply font formatting to the remaining original cells
+    for row_num, cell_fonts in row_fonts.items():
+        if row_num > total_rows or row_num in filled_rows:
+            continue
+        for col_num, (bold, italic) in cell_fonts.items():
+            style_cache.apply(output_ws.cell(row=row_num, column=col_num),
+                              bold=bold, italic=italic)
+
+
+def write_output_workbook(output_path, combined_data, all_formatting, row_colors, log=print,
+                          progress=None, highlight_mode=DEFAULT_HIGHLIGHT_MODE, shards=None):
+    """
+    Write the combined data with a regular (random-access) workbook.
+
+    Args:
+        combined_data: Combined rows (see combine_table.CombinedTable.finish())
+        progress (callable): Called as progress(stage, done, total) while the
+            rows are written ('write', in rows) and the workbook is saved ('save')
+            The write is aborted if it raises (e.g. CombineCancelled)
+        highlight_mode (str): How highlighted rows are filled (see HIGHLIGHT_MODES)
+        shards (list): (start, stop) data rows of every sheet, each with its
+            own header row (see output_shards.plan_shards()); default: all
+            rows on one sheet
+
+    Returns:
+        StyleCache: The style cache used for the output, for its statistics
+    """
+    if progress is None:
+        progress = _ignore_progress
+    if shards is None:
+        shards = [(0, len(combined_data))]
+    total_output_rows = len(combined_data) + len(shards)
+    progress('write', 0, total_output_rows)
+
+    # Create a new workbook for output
+    output_wb = Workbook()
+    style_cache = StyleCache()
+
+    rows_written = 0
+    for index, (start, stop) in enumerate(shards):
+        output_ws = output_wb.active if index == 0 else output_wb.create_sheet()
+        output_ws.title = shard_sheet_title(OUTPUT_SHEET_TITLE, index, len(shards))
+        sheet_data, sheet_formatting, sheet_colors = _shard_content(combined_data, all_formatting, row_colors,
+                                                                    start, stop)
+        _fill_worksheet(output_ws, sheet_data, sheet_formatting, sheet_colors, style_cache, log,
+                        lambda rows: progress('write', rows_written + rows, total_output_rows),
+                        highlight_mode)
+        rows_written += stop - start + 1
+    progress('write', total_output_rows, total_output_rows)
+
+    progress('save', 0, 1)
+    output_wb.save(output_path)
+    progress('save', 1, 1)
+    return style_cache
+
+
+def _stream_worksheet(output_ws, combined_data, all_formatting, row_colors, style_cache, log, report_rows,
+                      highlight_mode):
+    """Append the rows of one sheet of write_output_streaming(), reporting written rows through report_rows."""
+    data_columns = len(output_columns(combined_data))
+    # Full-row fills span the same columns as the random-access writer
+    fill_columns = get_fill_columns(data_columns)
+    # Fonts are only applied within the sheet width (which highlighting extends)
+    font_columns = fill_columns if row_colors else data_columns
+    row_fonts = get_cell_fonts(all_formatting, font_columns)
+
+    # Row mode leaves the empty cells of a highlighted row to the row style
+    pad_fill = highlight_mode != 'row'
+
+    def build_row(values, fill_color, cell_fonts):
+        width = len(values)
+        if fill_color is not None and pad_fill:
+            width = max(width, fill_columns)
+        if cell_fonts:
+            width = max(width, max(cell_fonts))
+
+        row_cells = []
+        for c_idx in range(1, width + 1):
+            value = values[c_idx - 1] if c_idx <= len(values) else None
+            font_flags = cell_fonts.get(c_idx) if cell_fonts else None
+            if font_flags is None and (fill_color is None or (value is None and not pad_fill)):
+                row_cells.append(value)
+                continue
+
+            cell = WriteOnlyCell(output_ws, value=value)
+            bold, italic = font_flags or (False, False)
+            style_cache.apply(cell, fill_color, bold, italic)
+            row_cells.append(cell)
+        return row_cells
+
+    for r_idx, values in enumerate(iter_output_rows(combined_data), 1):
+        if r_idx % WRITE_PROGRESS_ROWS == 0:
+            report_rows(r_idx)
+        fill_color = row_colors.get(r_idx)
+        cell_fonts = row_fonts.get(r_idx)
+        if fill_color is None and not cell_fonts:
+            output_ws.append(values)
+            continue
+
+        row_style = False
+        try:
+            row_cells = build_row(values, fill_color, cell_fonts)
+            if fill_color is not None and not pad_fill:
+                # Written with the row by append(); dropped again right after
+                style_cache.apply(output_ws.row_dimensions[r_idx], fill_color)
+                row_style = True
+        except Exception as e:
+            log(f"    Warning: Could not apply full-row color {fill_color} to row {r_idx}: {e}")
+            row_cells = build_row(values, None, cell_fonts)
+
+        output_ws.append(row_cells)
+        if row_style:
+            del output_ws.row_dimensions[r_idx]
+
+
+def write_output_streaming(output_path, combined_data, all_formatting, row_colors, log=print,
+                           progress=None, highlight_mode=DEFAULT_HIGHLIGHT_MODE, shards=None):
+    """
+    Write the combined data with a write-only workbook.
+
+    Every row is emitted exactly once with its fill and fonts already attached,
+    so no Cell objects are kept in memory after a row has been written. The
+    result looks the same as write_output_workbook().
+
+    Args:
+        combined_data: Combined rows (see combine_table.CombinedTable.finish())
+        progress (callable): Called as progress(stage, done, total) while the
+            rows are written ('write', in rows) and the workbook is saved ('save')
+            The write is aborted if it raises (e.g. CombineCancelled)
+        highlight_mode (str): How highlighted rows are filled (see HIGHLIGHT_MODES)
+        shards (list): (start, stop) data rows of every sheet, each with its
+            own header row (see output_shards.plan_shards()); default: all
+            rows on one sheet
+
+    Returns:
+        StyleCache: The style cache used for the output, for its statistics
+    """
+    if progress is None:
+        progress = _ignore_progress
+    if shards is None:
+        shards = [(0, len(combined_data))]
+    total_output_rows = len(combined_data) + len(shards)
+    progress('write', 0, total_output_rows)
+
+    output_wb = Workbook(write_only=True)
+    style_cache = StyleCache()
+
+    rows_written = 0
+    try:
+        for index, (start, stop) in enumerate(shards):
+            output_ws = output_wb.create_sheet(shard_sheet_title(OUTPUT_SHEET_TITLE, index, len(shards)))
+            sheet_data, sheet_formatting, sheet_colors = _shard_content(combined_data, all_formatting,
+                                                                        row_colors, start, stop)
+            _stream_worksheet(output_ws, sheet_data, sheet_formatting, sheet_colors, style_cache, log,
+                              lambda rows: progress('write', rows_written + rows, total_output_rows),
+                              highlight_mode)
+            rows_written += stop - start + 1
+        progress('write', total_output_rows, total_output_rows)
+    except Exception:
+        # Close the worksheets' temporary files cleanly when the write is aborted
+        for output_ws in output_wb.worksheets:
+            output_ws.close()
+        raise
+
+    progress('save', 0, 1)
+    output_wb.save(output_path)
+    progress('save', 1, 1)
+    return style_cache
+
+
+def _write_shard_file(task):
+    """Write one shard file of write_output_files() (in a worker process); returns (style cache, log messages)."""
+    output_path, combined_data, all_formatting, row_colors, streaming, highlight_mode = task
+    messages = []
+    writer = write_output_streaming if streaming else write_output_workbook
+    style_cache = writer(output_path, combined_data, all_formatting, row_colors, messages.append,
+                         highlight_mode=highlight_mode)
+    return style_cache, messages
+
+
+def _map_in_order(call, tasks, workers):
+    """
+    Apply call to every task, in a process pool when workers > 1.
+
+    Tasks are taken from the iterable only as workers become free, so at most
+    workers of them (e.g. copies of shard rows) exist at a time. Results are
+    yielded in task order; tasks that have not started are cancelled when the
+    caller stops early.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield call(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(executor.submit(call, task))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def write_output_files(output_paths, combined_data, all_formatting, row_colors, shards, streaming=True,
+                       workers=1, log=print, progress=None, highlight_mode=DEFAULT_HIGHLIGHT_MODE):
+    """
+    Write every shard of the combined data as a workbook of its own.
+
+    The shard files are independent, so with more than one worker they are
+    written in parallel by a process pool, each worker receiving a compact
+    copy of its shard's rows and formats.
+
+    Args:
+        output_paths (list): Path of every shard file (see output_shards.shard_path())
+        combined_data: Combined rows (see combine_table.CombinedTable.finish())
+        shards (list): (start, stop) data rows of every shard file
+        streaming (bool): Write with the write-only workbook engine
+        workers (int): Number of processes writing shard files at a time
+        progress (callable): Called as progress(stage, done, total) after every
+            finished shard file ('write', in rows) and once all are saved ('save');
+            writing stops after the current shard files if it raises
+        highlight_mode (str): How highlighted rows are filled (see HIGHLIGHT_MODES)
+
+    Returns:
+        StyleCache: The statistics of the style caches of all shard files
+    """
+    if progress is None:
+        progress = _ignore_progress
+    total_output_rows = len(combined_data) + len(shards)
+    progress('write', 0, total_output_rows)
+
+    def shard_tasks():
+        for output_path, (start, stop) in zip(output_paths, shards):
+            yield ((output_path,) + _shard_content(combined_data, all_formatting, row_colors, start, stop,
+                                                   copy=workers > 1)
+                   + (streaming, highlight_mode))
+
+    style_cache = StyleCache()
+    rows_written = 0
+    results = _map_in_order(_write_shard_file, shard_tasks(), workers)
+    try:
+        for output_path, (start, stop), (shard_cache, messages) in zip(output_paths, shards, results):
+            for message in messages:
+                log(message)
+            log(f"  Wrote {stop - start} rows to {os.path.basename(output_path)}")
+            style_cache.merge(shard_cache)
+            rows_written += stop - start + 1
+            progress('write', rows_written, total_output_rows)
+    finally:
+        results.close()
+
+    progress('save', 1, 1)
+    return style_cache
+
+
+def write_data_file(df, output_path, output_format):
+    """
+    Write combined rows as a CSV, Parquet or Feather file.
+
+    For Parquet and Feather, mixed-type text columns are stored as strings
+    so Arrow can give them a single column type.
+
+    Args:
+        df (pandas.DataFrame): Combined rows
+        output_path (str): Path of the file to write
+        output_format (str): 'csv', 'parquet' or 'feather'
+    """
+    if output_format == 'csv':
+        df.to_csv(output_path, index=False)
+        return
+    arrow_df = df.copy()
+    for column in arrow_df.columns:
+        if arrow_df[column].dtype == object:
+            arrow_df[column] = arrow_df[column].astype('string')
+    if output_format == 'parquet':
+        arrow_df.to_parquet(output_path, index=False)
+    else:
+        arrow_df.to_feather(output_path)
+
+
+def combine_with_formatting(excel_files, output_path, workers=1, incremental=False, cache=None,
+                            streaming=True, log=print, progress=None, checkpoint=False,
+                            cancel_event=None, file_stats=None, reader_backend=DEFAULT_READER_BACKEND,
+                            highlight_mode=DEFAULT_HIGHLIGHT_MODE, sheets=None, sheet_column=False,
+                            dedup_columns=None, dedup_keep=DEFAULT_DEDUP_KEEP,
+                            dedup_memory_keys=DEFAULT_MAX_MEMORY_KEYS, shard_rows=DEFAULT_SHARD_ROWS,
+                            shard_mode=DEFAULT_SHARD_MODE, report=None, prescan=None, data_outputs=None):
+    """
+    Combine Excel files into one workbook with preserved formatting.
+
+    Follows the combiner's layout: the first file keeps its header, the first
+    data row of every later file is skipped, the source filename is added to
+    the first row of each file's group, and highlighted rows are filled across
+    the whole row. With a sheet selection, every selected sheet of a file is
+    a group of its own.
+
+    Args:
+        excel_files (list): Excel files to combine, in output order
+        output_path (str): Path of the combined workbook
+        workers (int): Number of processes used to read the files in parallel
+        incremental (bool): Only read new or changed files, reusing the blocks
+            recorded in the output's manifest for the rest
+        cache (ParseCache): Persistent parse cache to read through (optional)
+        streaming (bool): Write with the write-only workbook engine
+        log (callable): Called with each progress message
+        progress (callable): Called with the progress reports of a
+            combine_progress.ProgressTracker for the scan, read, format,
+            write and save stages (read progress is weighted by file size)
+        checkpoint (bool): Keep a checkpoint of the finished files next to the
+            output so an interrupted run resumes after the last finished file;
+            the checkpoint is removed once the output has been written (the
+            manifest of an incremental run is its checkpoint and is kept)
+        cancel_event (threading.Event): When set, the combine stops between
+            two files or two chunks of written rows
+        file_stats (dict): Optional {path: folder_scanner.ScannedFile} so files
+            found by the folder scan are not stat'ed again
+        reader_backend (str): Key of READER_BACKENDS; 'native' parses the xlsx
+            package directly instead of going through openpyxl
+        highlight_mode (str): 'row' fills highlighted rows with a row-level
+            style plus their populated cells, 'cells' fills every cell up to
+            get_fill_columns() like earlier versions (see HIGHLIGHT_MODES)
+        sheets (combine_options.SheetSelection): Sheets of every file to combine,
+            each read as a separate task (default: the active sheet only)
+        sheet_column (bool): Add a Source_Sheet column after Source_File with
+            the sheet name on the first row of each sheet's group
+        dedup_columns (list): Output columns (of row_dedup.DEDUP_KEY_COLUMNS)
+            whose values identify duplicate rows; duplicates are dropped
+            across all files when given
+        dedup_keep (str): Which duplicate survives with its formatting, 'first'
+            (duplicates are dropped as every file is read) or 'last' (dropped
+            once all files are read, in the dedup stage)
+        dedup_memory_keys (int): Row keys held in memory before the
+            deduplication spills them to a temporary file
+        shard_rows (int): Most data rows written to one sheet; a larger
+            output is split, keeping each source file's rows together where
+            they fit (default: as many as an Excel sheet holds)
+        shard_mode (str): Where the shards of a split output go: 'sheets' of
+            the output workbook, or numbered 'files' next to it that are
+            written in parallel by the workers (see output_shards.SHARD_MODES)
+        report (run_report.RunReport): Receives the time of every stage
+            (scan, read, dedup, concat, format, write, save), the counters of
+            every input file and the run totals
+        prescan (dict): Optional {path: workbook_prescan.WorkbookPrescan} of a
+            pre-scan with the same sheet selection; its file sizes are reused
+            and a split of the output is announced before any file is read
+        data_outputs (dict): {format: path} of further 'csv', 'parquet' or
+            'feather' files written from the same combined rows, with the
+            highlight color of every row (or '') in a last Highlight column;
+            they are never split
+
+    Returns:
+        dict: Summary with 'output_path', 'output_paths' (every file written:
+            the shard files of a split into files, otherwise output_path),
+            'shards', 'files', 'rows', 'columns', 'highlighted_rows',
+            'dropped_rows' ({source file: duplicate rows dropped}, empty
+            without deduplication) and 'style_cache', or None if there was no data
+
+    Raises:
+        CombineCancelled: If cancel_event was set
+        Exception: Any error raised while writing the output
+    """
+    tracker = ProgressTracker(progress or _ignore_progress)
+    if report is None:
+        report = RunReport()
+
+    # Size up the inputs so read progress can be weighted by bytes
+    report.begin('scan')
+    if file_stats is None and prescan:
+        file_stats = {path: workbook for path, workbook in prescan.items() if workbook.size is not None}
+    file_sizes = scan_file_sizes(excel_files, tracker, file_stats)
+    if prescan:
+        expected_shards = plan_shards(prescan_group_rows(prescan), shard_rows)
+        if len(expected_shards) > 1:
+            log(f"Pre-scan: about {expected_shards[-1][1]} rows, more than {shard_rows} per sheet; "
+                f"expect the output to be split into {len(expected_shards)} {shard_mode}")
+    report.begin('read')
+
+    # Initialize variables for combining data. Keeping the first duplicate
+    # drops rows as every block is added; keeping the last one needs all blocks
+    deduplicator = None
+    if dedup_columns:
+        deduplicator = RowDeduplicator(dedup_memory_keys)
+    stream_dedup = deduplicator if dedup_keep == 'first' else None
+    combined_table = CombinedTable(sheet_column=sheet_column, dedup_columns=dedup_columns, deduplicator=stream_dedup)
+    all_formatting = []
+    current_row = 1
+    header_added = False
+
+    workers = max(1, workers)
+    if workers > 1:
+        log(f"Reading files with {workers} worker processes")
+
+    backend_reader, reader_name, reader_version = READER_BACKENDS[reader_backend]
+    reader = backend_reader
+    if cache is not None:
+        reader = CachedReader(backend_reader, reader_name, reader_version, cache)
+
+    manifest = None
+    # Seconds the reader took on every file that was not reused
+    read_seconds = {}
+    if incremental or checkpoint:
+        # The manifest of an incremental run is also its checkpoint; other runs
+        # checkpoint to files of their own, which are removed once the output is
+        # written. Blocks hold the selected sheets, so the selection is part of
+        # the reader name
+        manifest_name = reader_name if sheets is None else f"{reader_name}[{sheets.describe()}]"
+        manifest = InputManifest(output_path, manifest_name, checkpoint_only=not incremental)
+        file_results = manifest.read_files(reader, excel_files, workers, file_stats=file_stats, sheets=sheets,
+                                           timings=read_seconds, log=log)
+    else:
+        file_results = read_excel_files(reader, excel_files, workers, sheets, read_seconds)
+    file_results = _until_cancelled(file_results, cancel_event)
+
+    bytes_read = 0
+    rows_read = 0
+    tracker.update('read', 0, tracker.total_bytes, rows=0)
+    try:
+        for file_path, result, error in file_results:
+            log(f"Processing: {os.path.basename(file_path)}")
+            # (sheet name, result) of every sheet read from the file
+            sheet_results = result if sheets is not None or result is None else [(None, result)]
+            bytes_read += file_sizes[file_path]
+            if sheet_results:
+                rows_read += sum(len(sheet_result[0]) for _, sheet_result in sheet_results)
+            tracker.update('read', bytes_read, tracker.total_bytes, rows=rows_read)
+            file_counters = report.add_file(file_path, bytes=file_sizes[file_path],
+                                            read_seconds=read_seconds.get(file_path),
+                                            rows=sum(len(sheet_result[0]) for _, sheet_result in sheet_results or []),
+                                            added_rows=0, formatted_rows=0, error=error)
+
+            if error is not None:
+                log(f"Error reading file {file_path}: {error}")
+                continue
+
+            if not sheet_results:
+                log(f"  No matching sheets in {os.path.basename(file_path)}")
+                continue
+
+            for sheet_name, (df, source_filename, row_formats, phantom_rows) in sheet_results:
+                if sheet_name is not None:
+                    log(f"  Sheet: {sheet_name}")
+
+                if phantom_rows:
+                    log(f"  Skipped {phantom_rows} phantom trailing row(s) without data (stray formatting)")
+
+                # Skip empty files (or sheets)
+                if df.empty:
+                    if sheet_name is not None:
+                        log(f"  Skipping empty sheet: {sheet_name}")
+                    else:
+                        log(f"  Skipping empty file: {source_filename}")
+                    continue
+
+                # Ensure we have standard column names
+                if len(df.columns) < 3:
+                    log(f"  Warning: File {source_filename} has fewer than 3 columns. Skipping.")
+                    continue
+
+                # Keep columns A-C with the source filename on the block's first row;
+                # blocks after the first one lose their header row
+                first_block = not header_added
+                added_rows = combined_table.add_file(df, source_filename, first_file=first_block,
+                                                     source_sheet=sheet_name)
+                header_added = True
+                del df
+
+                # Adjust row formatting indices for the combined file
+                if row_formats:
+                    adjusted_formats = adjust_row_formats(row_formats, current_row, first_block)
+                    if combined_table.last_keep_mask is not None:
+                        # Duplicate rows were dropped from the block, which starts at output row current_row + 1
+                        all_formatting.extend(remap_row_formats([adjusted_formats], combined_table.last_keep_mask,
+                                                                current_row + 1))
+                    else:
+                        all_formatting.append(adjusted_formats)
+
+                file_counters['added_rows'] += added_rows
+                file_counters['formatted_rows'] += len(row_formats)
+                current_row += added_rows
+                log(f"  Added {added_rows} rows with formatting")
+            del result, sheet_results
+
+        if incremental:
+            log(manifest.summary())
+        elif manifest is not None and manifest.reused:
+            log(f"Resumed from checkpoint: reused {manifest.reused} file(s) finished by an interrupted run")
+
+        if cache is not None:
+            evicted = cache.evict()
+            if evicted:
+                log(f"Evicted {evicted} least recently used parse cache entries")
+
+        dropped_rows = combined_table.dropped_rows
+        if deduplicator is not None and stream_dedup is None:
+            report.begin('dedup')
+            keep_mask, dropped_rows = combined_table.deduplicate(dedup_columns, deduplicator, dedup_keep)
+            all_formatting = remap_row_formats(all_formatting, keep_mask)
+            del keep_mask
+        if deduplicator is not None:
+            if deduplicator.spilled_keys:
+                log(f"Deduplication spilled {deduplicator.spilled_keys} row keys to disk")
+            log(format_dropped_rows(dropped_rows))
+    finally:
+        if deduplicator is not None:
+            deduplicator.close()
+
+    tracker.update('format', 0, 1)
+
+    # Check the rows against the sheet limit before anything is written
+    report.begin('concat')
+    shards = plan_shards(combined_table.group_rows(), shard_rows)
+
+    # Combine all blocks (zero-copy when they are Arrow tables)
+    combined_data = combined_table.finish()
+    if combined_data is None:
+        report.end()
+        log("No data to combine!")
+        return None
+    if len(shards) > 1:
+        log(format_shard_plan(shards, shard_mode, shard_rows))
+
+    # Identify rows that need full-row formatting and determine their colors
+    report.begin('format')
+    total_rows = len(combined_data) + 1  # Header row plus data rows
+    formatted_rows, row_colors = get_row_highlight_colors(all_formatting, total_rows)
+    tracker.update('format', 1, 1)
+
+    def write_progress(stage, done, total):
+        # Called between chunks of written rows, so this is also where a write is cancelled
+        if stage == 'write':
+            check_cancelled(cancel_event)
+        elif report.current_stage != 'save':
+            report.begin('save')
+        tracker.update(stage, done, total, rows=done if stage == 'write' else None)
+
+    # Save the output
+    report.begin('write')
+    output_paths = [output_path]
+    if streaming:
+        log("Writing output with the streaming (write-only) engine...")
+    if len(shards) > 1 and shard_mode == 'files':
+        output_paths = [shard_path(output_path, index) for index in range(len(shards))]
+        if workers > 1:
+            log(f"Writing {len(shards)} files with {min(workers, len(shards))} worker processes")
+        style_cache = write_output_files(output_paths, combined_data, all_formatting, row_colors, shards,
+                                         streaming, workers, log, write_progress, highlight_mode)
+    elif streaming:
+        style_cache = write_output_streaming(output_path, combined_data, all_formatting, row_colors, log,
+                                             write_progress, highlight_mode, shards)
+    else:
+        style_cache = write_output_workbook(output_path, combined_data, all_formatting, row_colors, log,
+                                            write_progress, highlight_mode, shards)
+
+    if data_outputs:
+        data_df = to_frame(combined_data)
+        # Data row i is output row i + 2 (row 1 is the header)
+        data_df[HIGHLIGHT_COLUMN] = pd.Series(row_colors, dtype=object).reindex(
+            range(2, len(data_df) + 2), fill_value='').to_numpy()
+        for output_format, data_path in data_outputs.items():
+            check_cancelled(cancel_event)
+            write_data_file(data_df, data_path, output_format)
+            log(f"  Wrote {len(data_df)} rows to {os.path.basename(data_path)}")
+            output_paths.append(data_path)
+        del data_df
+
+    report.end()
+
+    if checkpoint and not incremental:
+        # The output is complete, so the checkpoint is no longer needed
+        manifest.remove()
+
+    report.count(files=len(excel_files), rows=len(combined_data), highlighted_rows=len(formatted_rows),
+                 dropped_rows=sum(dropped_rows.values()), shards=len(shards), output_paths=output_paths,
+                 style_cache_hits=style_cache.hits, style_cache_misses=style_cache.misses,
+                 workers=workers, reader_backend=reader_backend, streaming=streaming)
+
+    return {
+        'output_path': output_path,
+        'output_paths': output_paths,
+        'shards': len(shards),
+        'files': len(excel_files),
+        'rows': len(combined_data),
+        'columns': output_columns(combined_data),
+        'highlighted_rows': len(formatted_rows),
+        'dropped_rows': dropped_rows,
+        'style_cache': style_cache,
+    }
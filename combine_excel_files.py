@@ -13,19 +13,62 @@ If no folder_path is provided, the script will look for Excel files in the same
 """
 
 import os
+import re
 import sys
-import glob
+import time
 import pandas as pd
 from pathlib import Path
 import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import Workbook, load_workbook
 
-def get_excel_files(folder_path, exclude_files=None):
+from excel_reader import read_excel_files, row_highlight_color
+from combine_options import SheetSelection
+from combine_manifest import InputManifest
+from parse_cache import ParseCache, CachedReader, DEFAULT_MAX_BYTES, format_cache_info
+from combine_engine import (combine_with_formatting, write_data_file, READER_BACKENDS, DEFAULT_READER_BACKEND,
+                            HIGHLIGHT_MODES, DEFAULT_HIGHLIGHT_MODE, HIGHLIGHT_COLUMN)
+from combine_table import SHEET_COLUMN, HAS_PYARROW
+from combine_progress import ProgressTracker, scan_file_sizes, json_lines_progress
+from folder_scanner import scan_excel_files, parse_size, parse_timestamp
+from folder_watcher import watch_folder, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, DEFAULT_QUIET_SECONDS
+from row_dedup import (RowDeduplicator, block_keep_mask, deduplicate_blocks, filter_frame, format_dropped_rows,
+                       DEDUP_KEY_COLUMNS, DEFAULT_DEDUP_COLUMNS, DEDUP_KEEP_POLICIES, DEFAULT_DEDUP_KEEP,
+                       DEFAULT_MAX_MEMORY_KEYS)
+from output_shards import (plan_shards, source_group_rows, shard_path, shard_file_regex, format_shard_plan,
+                           DEFAULT_SHARD_ROWS, SHARD_MODES, DEFAULT_SHARD_MODE)
+from run_report import RunReport
+from workbook_prescan import prescan_files, summarize_prescan, format_prescan
+
+# Bump whenever the result of read_columns_a_to_c() changes (parse cache key)
+COLUMNS_READER_VERSION = 1
+
+# Rows held in memory at a time by the streaming pipeline
+DEFAULT_CHUNK_SIZE = 10000
+
+OUTPUT_COLUMNS = ['Filename', 'Transcription', 'Status', 'Source_File']
+
+# Supported output formats and their file extensions
+OUTPUT_FORMATS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+# Output formats written through pyarrow
+ARROW_FORMATS = ('parquet', 'feather')
+
+def get_excel_files(folder_path, exclude_files=None, **scan_options):
     """
     Get all Excel files from the specified folder.
     
     Args:
         folder_path (str): Path to the folder containing Excel files
         exclude_files (list): List of filenames to exclude
+        **scan_options: Further folder_scanner.scan_excel_files() options
+            (recursive, include/exclude patterns, size and date filters)
         
     Returns:
         list: Sorted list of Excel file paths
@@ -33,23 +76,56 @@ def get_excel_files(folder_path, exclude_files=None):
     if exclude_files is None:
         exclude_files = ['combined_excel_files.xlsx', 'test_combined.xlsx']
     
-    # Look for both .xlsx and .xls files
-    xlsx_pattern = os.path.join(folder_path, "*.xlsx")
-    xls_pattern = os.path.join(folder_path, "*.xls")
+    scanned_files = scan_excel_files(folder_path, exclude_files=exclude_files, **scan_options)
+    return [scanned_file.path for scanned_file in scanned_files]
+
+def read_columns_a_to_c(file_path, reader_backend=DEFAULT_READER_BACKEND, sheet_name=None):
+    """
+    Read columns A through C of an Excel file.
     
-    excel_files = glob.glob(xlsx_pattern) + glob.glob(xls_pattern)
+    Unlike read_excel_data(), errors are raised rather than printed, so this
+    function can be used as a process pool reader.
     
-    # Filter out excluded files
-    filtered_files = []
-    for file_path in excel_files:
-        filename = os.path.basename(file_path)
-        if filename not in exclude_files:
-            filtered_files.append(file_path)
+    Args:
+        file_path (str): Path to the Excel file
+        reader_backend (str): Reader backend (a key of READER_BACKENDS); the
+            default reads through pandas
+        sheet_name (str): Name of the sheet to read (default: the first sheet,
+            or the active sheet for the other backends)
+        
+    Returns:
+        pandas.DataFrame: DataFrame containing the data from columns A-C
+    """
+    if reader_backend != DEFAULT_READER_BACKEND:
+        df = READER_BACKENDS[reader_backend][0](file_path, sheet_name=sheet_name)[0]
+        return df.iloc[:, :3]
+    
+    # Read the Excel file, focusing on columns A, B, C (0, 1, 2)
+    return pd.read_excel(file_path, sheet_name=0 if sheet_name is None else sheet_name, usecols=[0, 1, 2])
+
+def read_columns_a_to_c_with_highlights(file_path, reader_backend=DEFAULT_READER_BACKEND, sheet_name=None):
+    """
+    Read columns A through C of an Excel file plus each row's highlight color.
     
-    # Sort files to ensure consistent order
-    filtered_files.sort()
+    The values and the formatting come from a single pass over the workbook.
+    The highlight color of every data row (six hex digits, or an empty string
+    if the row is not highlighted) is added as a fourth column.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        reader_backend (str): Reader backend (a key of READER_BACKENDS)
+        sheet_name (str): Name of the sheet to read (default: the active sheet)
+        
+    Returns:
+        pandas.DataFrame: DataFrame with columns A-C and the highlight column
+    """
+    df, _, row_formats, _ = READER_BACKENDS[reader_backend][0](file_path, sheet_name=sheet_name)
+    df = df.iloc[:, :3].copy()
     
-    return filtered_files
+    # Data row i of the frame is worksheet row i + 2 (row 1 is the header)
+    df[HIGHLIGHT_COLUMN] = [row_highlight_color(row_formats.get(i + 2, {})) or ''
+                            for i in range(len(df))]
+    return df
 
 def read_excel_data(file_path):
     """
@@ -62,8 +138,7 @@ def read_excel_data(file_path):
         pandas.DataFrame: DataFrame containing the data from columns A-C
     """
     try:
-        # Read the Excel file, focusing on columns A, B, C (0, 1, 2)
-        df = pd.read_excel(file_path, usecols=[0, 1, 2])
+        df = read_columns_a_to_c(file_path)
         
         # Get the filename without extension for the source column
         filename = os.path.basename(file_path)
@@ -74,94 +149,857 @@ def read_excel_data(file_path):
         print(f"Error reading file {file_path}: {str(e)}")
         return None, None
 
-def combine_excel_files(folder_path, output_filename="combined_excel_files.xlsx"):
+def read_row_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
     """
-    Combine multiple Excel files into one.
+    Read the data rows of columns A through C of an Excel file in chunks.
+    
+    The header row is not included. Like pd.read_excel, empty rows inside the
+    data are kept and trailing empty rows are dropped; empty rows are only
+    counted until a later row with data shows they belong to the table.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        chunk_size (int): Maximum number of rows per chunk
+        
+    Yields:
+        list: Up to chunk_size rows, each a list of three values
+    """
+    if file_path.lower().endswith('.xls'):
+        # Legacy .xls files have no streaming reader, so read them whole
+        df = read_columns_a_to_c(file_path).astype(object)
+        rows = df.where(df.notna(), None).values.tolist()
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+        return
+    
+    wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.active
+        # The dimension tag may be stale; let the row stream define the extent
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        if len(header) < 3:
+            raise ValueError(f"Expected at least 3 columns but found {len(header)}")
+        
+        chunk = []
+        pending_empty_rows = 0
+        for row in rows:
+            if not any(value is not None for value in row):
+                pending_empty_rows += 1
+                continue
+            
+            for _ in range(pending_empty_rows):
+                chunk.append([None, None, None])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            pending_empty_rows = 0
+            
+            values = list(row[:3])
+            chunk.append(values + [None] * (3 - len(values)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
+
+def stream_combined_rows(excel_files, chunk_size=DEFAULT_CHUNK_SIZE, stats=None, progress=None,
+                         deduplicator=None, dedup_columns=DEFAULT_DEDUP_COLUMNS):
+    """
+    Generate the rows of the combined output, one chunk at a time.
+    
+    Header skipping and the Source_File marker follow combine_excel_files():
+    all data rows of the first file are used, the first data row of every
+    later file is skipped, and the source filename is added to the first
+    row of each file's group.
+    
+    Args:
+        excel_files (list): Excel files to combine, in output order
+        chunk_size (int): Maximum number of rows per chunk
+        stats (dict): Optional dict that receives 'rows' and 'files' counts
+            and the 'dropped_rows' of every source file
+        progress (callable): Optional callback called as progress(file_path)
+            after each input file has been streamed
+        deduplicator (RowDeduplicator): When given, rows whose dedup_columns
+            were seen before are dropped (the first occurrence is kept)
+        dedup_columns (list): Output columns that identify duplicate rows
+        
+    Yields:
+        list: Up to chunk_size output rows of four values
+    """
+    if stats is None:
+        stats = {}
+    stats.update(rows=0, files=0, dropped_rows={})
+    key_indexes = [OUTPUT_COLUMNS.index(column) for column in dedup_columns]
+    header_added = False
+    
+    for file_path in excel_files:
+        source_filename = os.path.basename(file_path)
+        print(f"\nProcessing: {source_filename}")
+        
+        rows_to_skip = 1 if header_added else 0
+        marker_pending = True
+        file_rows = 0
+        seen_rows = 0
+        
+        try:
+            for chunk in read_row_chunks(file_path, chunk_size):
+                seen_rows += len(chunk)
+                if rows_to_skip:
+                    # For subsequent files, skip the first row (assuming first row is header)
+                    chunk = chunk[rows_to_skip:]
+                    rows_to_skip = 0
+                if deduplicator is not None and chunk:
+                    keep = deduplicator.filter([[values[i] for i in key_indexes] for values in chunk])
+                    dropped = len(keep) - sum(keep)
+                    if dropped:
+                        chunk = [values for values, kept in zip(chunk, keep) if kept]
+                        stats['dropped_rows'][source_filename] = stats['dropped_rows'].get(source_filename, 0) + dropped
+                if not chunk:
+                    continue
+                
+                output_chunk = [values + [''] for values in chunk]
+                if marker_pending:
+                    # Add source filename only to the first row of this batch
+                    output_chunk[0][3] = source_filename
+                    marker_pending = False
+                
+                file_rows += len(output_chunk)
+                yield output_chunk
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            if file_rows:
+                print(f"  Warning: {file_rows} rows of {source_filename} were already written")
+            stats['rows'] += file_rows
+            if progress is not None:
+                progress(file_path)
+            continue
+        
+        stats['rows'] += file_rows
+        if progress is not None:
+            progress(file_path)
+        if seen_rows == 0:
+            print(f"  Skipping empty file: {source_filename}")
+        elif not header_added:
+            header_added = True
+            stats['files'] += 1
+            print(f"  Added header and {file_rows} rows")
+        elif file_rows:
+            stats['files'] += 1
+            print(f"  Added {file_rows} data rows (skipped header)")
+        else:
+            print(f"  No data rows to add from {source_filename}")
+
+def write_rows_streaming(output_path, row_chunks, columns=OUTPUT_COLUMNS, progress=None,
+                         shard_rows=DEFAULT_SHARD_ROWS, shard_mode=DEFAULT_SHARD_MODE):
+    """
+    Write row chunks to an Excel file incrementally.
+    
+    Uses openpyxl's write-only mode, so each row is serialized as soon as it
+    is appended and only the current chunk is held in memory.
+    
+    The row total is not known while streaming, so once a sheet holds
+    shard_rows data rows the output simply continues on a new sheet (Sheet2,
+    Sheet3, ...) or, in 'files' mode, in the next numbered file; each one
+    repeats the header row.
+    
+    Args:
+        output_path (str): Path of the Excel file to write
+        row_chunks (iterable): Chunks (lists) of rows
+        columns (list): Header row
+        progress (callable): Optional callback called as progress('save', done, total)
+            around the final save
+        shard_rows (int): Most data rows written to one sheet
+        shard_mode (str): Where further rows go once a sheet is full: 'sheets' or 'files'
+    
+    Returns:
+        list: Paths of the written files (the numbered shard files after a split into files)
+    """
+    output_paths = []
+    output_wb = Workbook(write_only=True)
+    output_ws = output_wb.create_sheet("Sheet1")
+    output_ws.append(columns)
+    sheet_rows = 0
+    
+    for chunk in row_chunks:
+        for row in chunk:
+            if sheet_rows == shard_rows:
+                if shard_mode == 'files':
+                    # The full file is done; the next one starts with a fresh workbook
+                    output_paths.append(shard_path(output_path, len(output_paths)))
+                    output_wb.save(output_paths[-1])
+                    output_wb = Workbook(write_only=True)
+                    output_ws = output_wb.create_sheet("Sheet1")
+                else:
+                    output_ws = output_wb.create_sheet(f"Sheet{len(output_wb.worksheets) + 1}")
+                output_ws.append(columns)
+                sheet_rows = 0
+            output_ws.append(row)
+            sheet_rows += 1
+    
+    output_paths.append(shard_path(output_path, len(output_paths)) if output_paths else output_path)
+    if progress is not None:
+        progress('save', 0, 1)
+    output_wb.save(output_paths[-1])
+    if progress is not None:
+        progress('save', 1, 1)
+    return output_paths
+
+def get_output_filenames(output_filename, formats):
+    """
+    Get the output filename of every requested format.
+    
+    The extension of output_filename is replaced by the extension of each format.
+    
+    Args:
+        output_filename (str): Output filename given by the user
+        formats (list): Output formats (keys of OUTPUT_FORMATS)
+        
+    Returns:
+        dict: Output filename per format, in the order of formats
+    """
+    stem, ext = os.path.splitext(output_filename)
+    if ext.lower() not in OUTPUT_FORMATS.values():
+        stem = output_filename
+    return {output_format: stem + OUTPUT_FORMATS[output_format] for output_format in formats}
+
+def infer_output_format(output_filename):
+    """Get the output format that matches a filename's extension (xlsx by default)."""
+    ext = os.path.splitext(output_filename)[1].lower()
+    for output_format, format_ext in OUTPUT_FORMATS.items():
+        if ext == format_ext:
+            return output_format
+    return 'xlsx'
+
+def _write_excel_shard(task):
+    """Write the rows of one shard file (in a worker process); see write_output()."""
+    shard_df, output_path = task
+    shard_df.to_excel(output_path, index=False)
+
+def write_output(final_df, output_path, output_format, shards=None, shard_mode=DEFAULT_SHARD_MODE, workers=1):
+    """
+    Write the combined data in one output format.
+    
+    The highlight column is only written to the non-Excel formats, which
+    are written by combine_engine.write_data_file().
+    
+    Excel output split into several shards (see output_shards.plan_shards())
+    is written to one sheet per shard (Sheet1, Sheet2, ...) or, in 'files'
+    mode, to numbered files that are written in parallel by the workers.
+    
+    Args:
+        final_df (pandas.DataFrame): Combined data
+        output_path (str): Path of the file to write
+        output_format (str): Output format (a key of OUTPUT_FORMATS)
+        shards (list): (start, stop) rows of every Excel sheet or file
+            (default: all rows on one sheet)
+        shard_mode (str): Where the shards go: 'sheets' or 'files'
+        workers (int): Number of processes writing shard files at a time
+    
+    Returns:
+        list: Paths of the written files
+    """
+    if output_format == 'xlsx' and shards is not None and len(shards) > 1:
+        excel_df = final_df.drop(columns=[HIGHLIGHT_COLUMN], errors='ignore')
+        if shard_mode == 'files':
+            output_paths = [shard_path(output_path, index) for index in range(len(shards))]
+            tasks = [(excel_df.iloc[start:stop], path) for (start, stop), path in zip(shards, output_paths)]
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                    list(executor.map(_write_excel_shard, tasks))
+            else:
+                for task in tasks:
+                    _write_excel_shard(task)
+            return output_paths
+        with pd.ExcelWriter(output_path) as writer:
+            for index, (start, stop) in enumerate(shards, 1):
+                excel_df.iloc[start:stop].to_excel(writer, sheet_name=f"Sheet{index}", index=False)
+        return [output_path]
+    
+    if output_format == 'xlsx':
+        final_df.drop(columns=[HIGHLIGHT_COLUMN], errors='ignore').to_excel(output_path, index=False)
+    else:
+        write_data_file(final_df, output_path, output_format)
+    return [output_path]
+
+def combine_excel_files_streaming(excel_files, output_path, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                                  file_stats=None, dedup_columns=None, dedup_memory_keys=DEFAULT_MAX_MEMORY_KEYS,
+                                  shard_rows=DEFAULT_SHARD_ROWS, shard_mode=DEFAULT_SHARD_MODE, report=None):
+    """
+    Combine Excel files with constant memory.
+    
+    Rows flow from read_row_chunks() through stream_combined_rows() into
+    write_rows_streaming(), so no more than one chunk of rows is held at any
+    time regardless of the total input size.
+    
+    Args:
+        excel_files (list): Excel files to combine, in output order
+        output_path (str): Path of the combined output file
+        chunk_size (int): Maximum number of rows held in memory
+        progress (callable): Optional callback for ProgressTracker reports
+        file_stats (dict): Optional {path: folder_scanner.ScannedFile} from the folder scan
+        dedup_columns (list): Drop rows whose values in these columns were
+            seen before (the first occurrence is kept)
+        dedup_memory_keys (int): Row keys held in memory before they are spilled to disk
+        shard_rows (int): Most data rows written to one sheet before the output continues on the next
+        shard_mode (str): Where the rows beyond a full sheet go: 'sheets' or 'files'
+        report (RunReport): Receives the stage times ('stream' covers the
+            interleaved reading and writing) and the counters of every file
+    """
+    stats = {}
+    if report is None:
+        report = RunReport()
+    # Rows are written while they are read, so reading and writing share one stage
+    tracker = ProgressTracker(progress or (lambda report: None), stages=('scan', 'read', 'save'))
+    report.begin('scan')
+    file_sizes = scan_file_sizes(excel_files, tracker, file_stats)
+    report.begin('stream')
+    bytes_read = [0]
+    # Rows and time at the end of the previous file
+    file_start = [0, time.perf_counter()]
+    
+    def file_progress(file_path):
+        bytes_read[0] += file_sizes[file_path]
+        tracker.update('read', bytes_read[0], tracker.total_bytes, rows=stats['rows'])
+        now = time.perf_counter()
+        report.add_file(file_path, bytes=file_sizes[file_path], rows=stats['rows'] - file_start[0],
+                        seconds=now - file_start[1])
+        file_start[:] = [stats['rows'], now]
+    
+    def save_progress(stage, done, total):
+        if report.current_stage != 'save':
+            report.begin('save')
+        tracker.update(stage, done, total)
+    
+    try:
+        tracker.update('read', 0, tracker.total_bytes, rows=0)
+        with RowDeduplicator(dedup_memory_keys) as deduplicator:
+            row_chunks = stream_combined_rows(excel_files, chunk_size, stats, file_progress,
+                                              deduplicator if dedup_columns else None,
+                                              dedup_columns or DEFAULT_DEDUP_COLUMNS)
+            output_paths = write_rows_streaming(output_path, row_chunks, progress=save_progress,
+                                                shard_rows=shard_rows, shard_mode=shard_mode)
+    except Exception as e:
+        print(f"Error saving combined file: {str(e)}")
+        return
+    report.end()
+    report.count(files=len(excel_files), rows=stats['rows'], dropped_rows=sum(stats['dropped_rows'].values()),
+                 output_paths=output_paths)
+    
+    if dedup_columns:
+        print(format_dropped_rows(stats['dropped_rows']))
+    
+    if stats['files'] == 0:
+        print("No data to combine!")
+        return
+    
+    print(f"\nSuccessfully combined {len(excel_files)} files!")
+    for saved_path in output_paths:
+        print(f"Output saved to: {saved_path}")
+    print(f"Total rows in combined file: {stats['rows']}")
+    print(f"Columns: {OUTPUT_COLUMNS}")
+
+def combine_excel_files_formatted(excel_files, output_path, workers=1, incremental=False, cache=None,
+                                  progress=None, checkpoint=False, file_stats=None,
+                                  reader_backend=DEFAULT_READER_BACKEND, highlight_mode=DEFAULT_HIGHLIGHT_MODE,
+                                  sheets=None, sheet_column=False, dedup_columns=None,
+                                  dedup_keep=DEFAULT_DEDUP_KEEP, dedup_memory_keys=DEFAULT_MAX_MEMORY_KEYS,
+                                  shard_rows=DEFAULT_SHARD_ROWS, shard_mode=DEFAULT_SHARD_MODE, report=None,
+                                  data_outputs=None, prescan=None):
+    """
+    Combine Excel files with preserved formatting using the shared combine engine.
+    
+    The CSV, Parquet and Feather outputs of data_outputs are written from the
+    same combined rows as the workbook, with each row's highlight color in a
+    Highlight column.
+    
+    Args:
+        excel_files (list): Excel files to combine, in output order
+        output_path (str): Path of the combined output file
+        workers (int): Number of processes used to read the files in parallel
+        incremental (bool): Only read new or changed files
+        cache (ParseCache): Persistent parse cache to read through (optional)
+        progress (callable): Optional callback for ProgressTracker reports
+        checkpoint (bool): Checkpoint finished files so an interrupted run can resume
+        file_stats (dict): Optional {path: folder_scanner.ScannedFile} from the folder scan
+        reader_backend (str): Reader backend (a key of READER_BACKENDS)
+        highlight_mode (str): How highlighted rows are filled (one of HIGHLIGHT_MODES)
+        sheets (SheetSelection): Sheets of every file to combine (default: the active sheet)
+        sheet_column (bool): Add the Source_Sheet column
+        dedup_columns (list): Drop rows whose values in these columns were seen before
+        dedup_keep (str): Which duplicate survives with its formatting, 'first' or 'last'
+        dedup_memory_keys (int): Row keys held in memory before they are spilled to disk
+        shard_rows (int): Most data rows written to one sheet; larger output is split
+        shard_mode (str): Where the shards of a split output go: 'sheets' or 'files'
+        report (RunReport): Receives the stage times and counters of the combine
+        data_outputs (dict): {format: path} of further csv, parquet or feather outputs
+        prescan (dict): Optional {path: WorkbookPrescan} of the files with the same sheets
+    """
+    try:
+        summary = combine_with_formatting(excel_files, output_path, workers=workers,
+                                          incremental=incremental, cache=cache, log=print,
+                                          progress=progress, checkpoint=checkpoint,
+                                          file_stats=file_stats, reader_backend=reader_backend,
+                                          highlight_mode=highlight_mode, sheets=sheets,
+                                          sheet_column=sheet_column, dedup_columns=dedup_columns,
+                                          dedup_keep=dedup_keep, dedup_memory_keys=dedup_memory_keys,
+                                          shard_rows=shard_rows, shard_mode=shard_mode, report=report,
+                                          data_outputs=data_outputs, prescan=prescan)
+    except Exception as e:
+        print(f"Error saving combined file: {str(e)}")
+        return
+    
+    if summary is None:
+        return
+    
+    print(f"\nSuccessfully combined {summary['files']} files with preserved formatting!")
+    for saved_path in summary['output_paths']:
+        print(f"Output saved to: {saved_path}")
+    print(f"Total rows in combined file: {summary['rows']}")
+    print(f"Columns: {summary['columns']}")
+    print(f"Applied full-row highlighting to {summary['highlighted_rows']} row(s)")
+    print(summary['style_cache'].summary())
+
+def drop_duplicate_rows(df, mask, dropped_rows):
+    """
+    Apply a deduplication keep mask to one combined block of combine_excel_files().
+    
+    Args:
+        df (pandas.DataFrame): Block with its Source_File (and Source_Sheet)
+            marker on the first row
+        mask (numpy.ndarray): Keep mask, one bool per row
+        dropped_rows (dict): {source file: rows dropped from it}, updated in place
+        
+    Returns:
+        pandas.DataFrame: The remaining rows, or None if every row was dropped
+    """
+    dropped = len(mask) - int(mask.sum())
+    if not dropped:
+        return df
+    markers = {column: df[column].iloc[0] for column in ('Source_File', SHEET_COLUMN) if column in df.columns}
+    source_filename = markers['Source_File']
+    dropped_rows[source_filename] = dropped_rows.get(source_filename, 0) + dropped
+    if dropped == len(mask):
+        return None
+    return filter_frame(df, mask, markers)
+
+def deduplicate_frames(frames, key_columns, keep=DEFAULT_DEDUP_KEEP, max_memory_keys=DEFAULT_MAX_MEMORY_KEYS):
+    """
+    Drop duplicate rows across the collected blocks of combine_excel_files().
+    
+    combine_excel_files() drops the duplicates of keep='first' from every
+    block as it is read; keep='last' needs every block and is done here.
+    
+    Args:
+        frames (list): DataFrame blocks, in output order, each with its
+            Source_File (and Source_Sheet) marker on the first row
+        key_columns (list): Columns whose values identify duplicate rows
+        keep (str): Which duplicate survives, 'first' or 'last'
+        max_memory_keys (int): Row keys held in memory before they are spilled to disk
+        
+    Returns:
+        tuple: (remaining blocks, {source file: rows dropped from it})
+    """
+    with RowDeduplicator(max_memory_keys) as deduplicator:
+        masks = deduplicate_blocks(frames, key_columns, deduplicator, keep)
+    
+    kept_frames = []
+    dropped_rows = {}
+    for df, mask in zip(frames, masks):
+        df = drop_duplicate_rows(df, mask, dropped_rows)
+        if df is not None:
+            kept_frames.append(df)
+    return kept_frames, dropped_rows
+
+def scan_input_files(folder_path, output_filename="combined_excel_files.xlsx", formats=None, scan_options=None):
+    """
+    Scan a folder for the Excel files to combine, excluding the output files.
     
     Args:
         folder_path (str): Path to folder containing Excel files
         output_filename (str): Name of the output file
+        formats (list): Output formats (keys of OUTPUT_FORMATS); defaults to
+            the format matching output_filename
+        scan_options (dict): Further folder_scanner.scan_excel_files() options
+        
+    Returns:
+        list: folder_scanner.ScannedFile entries sorted by path
     """
+    if not formats:
+        formats = [infer_output_format(output_filename)]
     
-    # Get all Excel files in the folder, excluding output files
+    # Never pick up an output file, whatever format it was written in
     exclude_files = [output_filename, 'combined_excel_files.xlsx', 'test_combined.xlsx', 'updated_combined.xlsx', 'final_combined.xlsx', 'final_updated_combined.xlsx']
-    excel_files = get_excel_files(folder_path, exclude_files)
+    exclude_files += list(get_output_filenames(output_filename, formats).values())
+    # ... including the numbered files of an output split into several files
+    scan_options = dict(scan_options or {})
+    scan_options['exclude_regex'] = list(scan_options.get('exclude_regex') or [])
+    if 'xlsx' in formats:
+        scan_options['exclude_regex'].append(shard_file_regex(get_output_filenames(output_filename, ['xlsx'])['xlsx']))
+    return scan_excel_files(folder_path, exclude_files=exclude_files,
+                            on_error=lambda path, e: print(f"Warning: Cannot read {path}: {e}"),
+                            **scan_options)
+
+def combine_excel_files(folder_path, output_filename="combined_excel_files.xlsx", workers=1,
+                        incremental=False, cache=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                        formats=None, preserve_formatting=False, progress=None, checkpoint=False,
+                        scan_options=None, scanned_files=None, reader_backend=DEFAULT_READER_BACKEND,
+                        highlight_mode=DEFAULT_HIGHLIGHT_MODE, sheets=None, sheet_column=False,
+                        dedup_columns=None, dedup_keep=DEFAULT_DEDUP_KEEP,
+                        dedup_memory_keys=DEFAULT_MAX_MEMORY_KEYS, shard_rows=DEFAULT_SHARD_ROWS,
+                        shard_mode=DEFAULT_SHARD_MODE, report=None):
+    """
+    Combine multiple Excel files into one.
+    
+    Args:
+        folder_path (str): Path to folder containing Excel files
+        output_filename (str): Name of the output file
+        workers (int): Number of processes used to read the files in parallel
+        incremental (bool): Only read new or changed files, reusing the blocks
+            recorded in the output's manifest for the rest
+        cache (ParseCache): Persistent parse cache to read through (optional)
+        stream (bool): Stream rows straight from the inputs to the output with
+            constant memory instead of collecting DataFrames
+        chunk_size (int): Maximum number of rows held in memory when streaming
+        formats (list): Output formats (keys of OUTPUT_FORMATS) written from the
+            same read; defaults to the format matching output_filename
+        preserve_formatting (bool): Write the xlsx output with full-row
+            highlighting and bold/italic fonts, like the GUI (formats must
+            include xlsx; the other formats are written from the same rows).
+            The inputs are pre-scanned first (see workbook_prescan)
+        progress (callable): Optional callback for the progress reports of
+            each stage (see combine_progress.ProgressTracker)
+        checkpoint (bool): Keep a checkpoint of the finished files next to the
+            output while combining, so an interrupted run resumes after the
+            last finished file; the checkpoint is removed once the output has
+            been written (the manifest of an incremental run is its checkpoint
+            and is kept)
+        scan_options (dict): Further folder_scanner.scan_excel_files() options
+            (recursive, include/exclude patterns, size and date filters)
+        scanned_files (list): Inputs as folder_scanner.ScannedFile entries; the
+            folder is scanned when omitted
+        reader_backend (str): Reader backend (a key of READER_BACKENDS);
+            'native' parses the xlsx packages directly instead of using openpyxl
+        highlight_mode (str): How --preserve-formatting fills highlighted rows:
+            'row' (row-level style) or 'cells' (every cell up to the fill width)
+        sheets (SheetSelection): Sheets of every file to combine, read in
+            parallel as separate tasks; by default only the first sheet is read
+            (the active sheet with --preserve-formatting or another backend)
+        sheet_column (bool): Add a Source_Sheet column after Source_File with
+            the sheet name on the first row of each sheet's group
+        dedup_columns (list): Drop rows whose values in these columns (of
+            DEDUP_KEY_COLUMNS) were already combined from an earlier row
+        dedup_keep (str): Which duplicate survives, 'first' or 'last' (the
+            streaming combine only keeps the first)
+        dedup_memory_keys (int): Row keys held in memory before the
+            deduplication spills them to a temporary file
+        shard_rows (int): Most data rows written to one Excel sheet; larger
+            xlsx output is split, keeping each source file's rows together
+            where they fit (default: as many as an Excel sheet holds)
+        shard_mode (str): Where the shards of split xlsx output go: further
+            'sheets' of the output, or numbered 'files' next to it (written
+            in parallel by the workers)
+        report (RunReport): Receives the time of every stage (folder scan,
+            reading, deduplication, concatenation, writing and saving), the
+            counters of every input file and the run totals
+    """
+    
+    if not formats:
+        formats = [infer_output_format(output_filename)]
+    output_filenames = get_output_filenames(output_filename, formats)
+    # Highlight colors are only needed for the non-Excel formats
+    with_highlights = any(output_format != 'xlsx' for output_format in formats)
+    if report is None:
+        report = RunReport()
+    
+    if scanned_files is None:
+        with report.stage('scan'):
+            scanned_files = scan_input_files(folder_path, output_filename, formats, scan_options)
+    excel_files = [scanned_file.path for scanned_file in scanned_files]
+    # Keep the scan's stat information so later stages never stat the files again
+    file_stats = {scanned_file.path: scanned_file for scanned_file in scanned_files}
     
     if not excel_files:
         print(f"No Excel files found in folder: {folder_path}")
         return
     
     print(f"Found {len(excel_files)} Excel files to combine:")
-    for file in excel_files:
-        print(f"  - {os.path.basename(file)}")
+    for scanned_file in scanned_files:
+        print(f"  - {scanned_file.relative_path}")
+    
+    # Create output file path
+    output_path = os.path.join(folder_path, output_filename)
+    
+    if stream:
+        combine_excel_files_streaming(excel_files, os.path.join(folder_path, output_filenames['xlsx']),
+                                      chunk_size, progress, file_stats, dedup_columns, dedup_memory_keys,
+                                      shard_rows, shard_mode, report)
+        return
+    
+    if preserve_formatting:
+        # Pre-scan the inputs like the GUI does when a folder is picked, so the
+        # combine announces a split of the output before any file is read
+        with report.stage('scan'):
+            prescan = prescan_files(excel_files, sheets, file_stats)
+        combine_excel_files_formatted(excel_files, os.path.join(folder_path, output_filenames['xlsx']),
+                                      workers, incremental, cache, progress, checkpoint, file_stats,
+                                      reader_backend, highlight_mode, sheets, sheet_column,
+                                      dedup_columns, dedup_keep, dedup_memory_keys, shard_rows, shard_mode,
+                                      report, {output_format: os.path.join(folder_path, filename)
+                                               for output_format, filename in output_filenames.items()
+                                               if output_format != 'xlsx'},
+                                      prescan)
+        return
+    
+    tracker = ProgressTracker(progress or (lambda report: None), stages=('scan', 'read', 'write'))
+    report.begin('scan')
+    file_sizes = scan_file_sizes(excel_files, tracker, file_stats)
+    report.begin('read')
     
     # Initialize variables for combining data
     combined_data = []
     header_added = False
+    # Keeping the first duplicate drops rows as every block is read; keeping the last one needs all blocks
+    dropped_rows = {}
+    deduplicator = None
+    if dedup_columns and dedup_keep == 'first':
+        deduplicator = RowDeduplicator(dedup_memory_keys)
     
-    for file_path in excel_files:
-        print(f"\nProcessing: {os.path.basename(file_path)}")
-        
-        df, source_filename = read_excel_data(file_path)
-        
-        if df is None:
-            continue
-            
-        # Skip empty files
-        if df.empty:
-            print(f"  Skipping empty file: {source_filename}")
-            continue
+    if workers > 1:
+        print(f"\nReading files with {workers} worker processes")
+    
+    if with_highlights:
+        reader, reader_name = read_columns_a_to_c_with_highlights, 'columns_a_to_c_highlights'
+    else:
+        reader, reader_name = read_columns_a_to_c, 'columns_a_to_c'
+    if reader_backend != DEFAULT_READER_BACKEND:
+        reader = partial(reader, reader_backend=reader_backend)
+        reader_name += '_' + reader_backend
+    if cache is not None:
+        reader = CachedReader(reader, reader_name, COLUMNS_READER_VERSION, cache)
+    
+    manifest = None
+    # Seconds the reader took on every file that was not reused
+    read_seconds = {}
+    if incremental or checkpoint:
+        # The manifest of an incremental run is also its checkpoint; other runs
+        # checkpoint to files of their own, which are removed once the output is
+        # written. Blocks hold the selected sheets, so the selection is part of
+        # the reader name
+        manifest_name = reader_name if sheets is None else f"{reader_name}[{sheets.describe()}]"
+        manifest = InputManifest(output_path, manifest_name, checkpoint_only=not incremental)
+        file_results = manifest.read_files(reader, excel_files, workers, file_stats=file_stats, sheets=sheets,
+                                           timings=read_seconds, log=print)
+    else:
+        file_results = read_excel_files(reader, excel_files, workers, sheets, read_seconds)
+    
+    bytes_read = 0
+    rows_read = 0
+    tracker.update('read', 0, tracker.total_bytes, rows=0)
+    try:
+        for file_path, result, error in file_results:
+            print(f"\nProcessing: {os.path.basename(file_path)}")
+            # (sheet name, DataFrame) of every sheet read from the file
+            sheet_frames = result if sheets is not None or result is None else [(None, result)]
+            bytes_read += file_sizes[file_path]
+            if sheet_frames:
+                rows_read += sum(len(df) for _, df in sheet_frames)
+            tracker.update('read', bytes_read, tracker.total_bytes, rows=rows_read)
+            report.add_file(file_path, bytes=file_sizes[file_path], read_seconds=read_seconds.get(file_path),
+                            rows=sum(len(df) for _, df in sheet_frames or []), error=error)
         
-        # Ensure we have the expected column names or use default ones
-        if len(df.columns) >= 3:
-            # Rename columns to ensure consistency
-            df.columns = ['Filename', 'Transcription', 'Status'] + list(df.columns[3:])
-        else:
-            print(f"  Warning: File {source_filename} has fewer than 3 columns. Skipping.")
-            continue
+            if error is not None:
+                print(f"Error reading file {file_path}: {error}")
+                continue
         
-        # Add source filename as column D, but only for the first row
-        df['Source_File'] = ''  # Initialize with empty strings
+            source_filename = os.path.basename(file_path)
+            if not sheet_frames:
+                print(f"  No matching sheets in {source_filename}")
+                continue
         
-        # If this is the first file, include the header
-        if not header_added:
-            df.iloc[0, df.columns.get_loc('Source_File')] = source_filename  # Add source to first data row
-            combined_data.append(df)
-            header_added = True
-            print(f"  Added header and {len(df)} rows")
-        else:
-            # For subsequent files, skip the header row (assuming first row is header)
-            if len(df) > 1:
-                data_rows = df.iloc[1:].copy()  # Skip first row (header) and make a copy
-                data_rows['Source_File'] = ''  # Initialize with empty strings
-                # Add source filename only to the first row of this batch
-                if len(data_rows) > 0:
-                    data_rows.iloc[0, data_rows.columns.get_loc('Source_File')] = source_filename
-                combined_data.append(data_rows)
-                print(f"  Added {len(data_rows)} data rows (skipped header)")
-            else:
-                print(f"  No data rows to add from {source_filename}")
+            for sheet_name, df in sheet_frames:
+                if sheet_name is not None:
+                    print(f"  Sheet: {sheet_name}")
+            
+                # Skip empty files (or sheets)
+                if df.empty:
+                    if sheet_name is not None:
+                        print(f"  Skipping empty sheet: {sheet_name}")
+                    else:
+                        print(f"  Skipping empty file: {source_filename}")
+                    continue
+            
+                # Ensure we have the expected column names or use default ones
+                if len(df.columns) >= 3:
+                    # Rename columns to ensure consistency
+                    df.columns = ['Filename', 'Transcription', 'Status'] + list(df.columns[3:])
+                else:
+                    print(f"  Warning: File {source_filename} has fewer than 3 columns. Skipping.")
+                    continue
+            
+                # If this is the first block, include the header
+                if not header_added:
+                    block = df
+                    header_added = True
+                elif len(df) > 1:
+                    # For subsequent blocks, skip the header row (assuming first row is header)
+                    block = df.iloc[1:].copy()
+                else:
+                    print(f"  No data rows to add from {source_filename}")
+                    continue
+            
+                # Add source filename as column D (and the sheet name after it), but only for the first row
+                block['Source_File'] = ''  # Initialize with empty strings
+                block.iloc[0, block.columns.get_loc('Source_File')] = source_filename
+                if sheet_column:
+                    block[SHEET_COLUMN] = ''
+                    block.iloc[0, block.columns.get_loc(SHEET_COLUMN)] = sheet_name or ''
+                is_first_block = block is df
+                if deduplicator is not None:
+                    block = drop_duplicate_rows(block, block_keep_mask(block, dedup_columns, deduplicator),
+                                                dropped_rows)
+                    if block is None:
+                        print(f"  No rows left from {source_filename} after dropping duplicates")
+                        continue
+                combined_data.append(block)
+                if is_first_block:
+                    print(f"  Added header and {len(block)} rows")
+                else:
+                    print(f"  Added {len(block)} data rows (skipped header)")
+    finally:
+        if deduplicator is not None:
+            deduplicator.close()
+    
+    if incremental:
+        print(f"\n{manifest.summary()}")
+    elif manifest is not None and manifest.reused:
+        print(f"\nResumed from checkpoint: reused {manifest.reused} file(s) finished by an interrupted run")
+    
+    if cache is not None:
+        evicted = cache.evict()
+        if evicted:
+            print(f"Evicted {evicted} least recently used parse cache entries")
+    
+    if combined_data and dedup_columns and deduplicator is None:
+        report.begin('dedup')
+        combined_data, dropped_rows = deduplicate_frames(combined_data, dedup_columns, dedup_keep,
+                                                         dedup_memory_keys)
+    if dedup_columns:
+        print(format_dropped_rows(dropped_rows))
     
     if not combined_data:
+        report.end()
         print("No data to combine!")
         return
     
+    # Check the rows against the Excel sheet limit before anything is written
+    report.begin('concat')
+    shards = None
+    if 'xlsx' in formats:
+        shards = plan_shards(source_group_rows((df['Source_File'].iloc[0], len(df)) for df in combined_data),
+                             shard_rows)
+        if len(shards) > 1:
+            print(format_shard_plan(shards, shard_mode, shard_rows))
+    
     # Combine all DataFrames
     final_df = pd.concat(combined_data, ignore_index=True)
     
-    # Create output file path
-    output_path = os.path.join(folder_path, output_filename)
+    if HIGHLIGHT_COLUMN in final_df.columns:
+        # Keep the highlight color as the last column
+        final_df = final_df[[c for c in final_df.columns if c != HIGHLIGHT_COLUMN] + [HIGHLIGHT_COLUMN]]
     
-    # Save to Excel
-    try:
-        final_df.to_excel(output_path, index=False)
+    # Save every requested format from the same combined data
+    saved_paths = []
+    report.begin('write')
+    tracker.update('write', 0, len(output_filenames))
+    for format_index, (output_format, format_filename) in enumerate(output_filenames.items(), 1):
+        format_path = os.path.join(folder_path, format_filename)
+        try:
+            saved_paths.extend(write_output(final_df, format_path, output_format, shards, shard_mode, workers))
+        except Exception as e:
+            print(f"Error saving combined file: {str(e)}")
+        tracker.update('write', format_index, len(output_filenames))
+    report.end()
+    report.count(files=len(excel_files), rows=len(final_df), output_paths=saved_paths)
+    
+    if saved_paths and checkpoint and not incremental:
+        # The output is complete, so the checkpoint is no longer needed
+        manifest.remove()
+    
+    if saved_paths:
         print(f"\nSuccessfully combined {len(excel_files)} files!")
-        print(f"Output saved to: {output_path}")
+        for saved_path in saved_paths:
+            print(f"Output saved to: {saved_path}")
         print(f"Total rows in combined file: {len(final_df)}")
         print(f"Columns: {list(final_df.columns)}")
-        
-    except Exception as e:
-        print(f"Error saving combined file: {str(e)}")
+
+def watch_excel_files(folder_path, output_filename="combined_excel_files.xlsx", formats=None, scan_options=None,
+                      poll_interval=DEFAULT_POLL_INTERVAL, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                      use_inotify=True, stop_event=None, quiet_seconds=DEFAULT_QUIET_SECONDS, **combine_options):
+    """
+    Keep the combined output current while new files arrive in the folder.
+    
+    Each time the settled inputs change, the output is rebuilt with an
+    incremental combine: only the files that arrived or changed since the
+    last combine are read, but the blocks of all other files are loaded from
+    the manifest and the whole output is written again. A rebuild therefore
+    costs about as much as combining every input from parsed blocks, which
+    is why changes are batched until the folder has been quiet for
+    quiet_seconds. The output files are excluded from the scan like in
+    combine_excel_files(), so the watcher never ingests its own output.
+    
+    Args:
+        folder_path (str): Path to the watched folder
+        output_filename (str): Name of the output file
+        formats (list): Output formats (keys of OUTPUT_FORMATS)
+        scan_options (dict): Further folder_scanner.scan_excel_files() options
+        poll_interval (float): Maximum seconds between two folder scans
+        settle_seconds (float): Seconds a file must stay unchanged before it is combined
+        use_inotify (bool): Wake up on inotify change events where available
+        stop_event (threading.Event): When set, watching stops
+        quiet_seconds (float): Seconds without any change in the folder before a rebuild
+        **combine_options: Further combine_excel_files() options
+            (workers, cache, preserve_formatting, progress, reader_backend, highlight_mode,
+            sheets, sheet_column, dedup_columns, dedup_keep, dedup_memory_keys, shard_rows, shard_mode)
+    """
+    scan_options = scan_options or {}
+    
+    def scan():
+        return scan_input_files(folder_path, output_filename, formats, scan_options)
+    
+    def combine(scanned_files):
+        print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Inputs changed, updating the combined output")
+        combine_excel_files(folder_path, output_filename, incremental=True, formats=formats,
+                            scan_options=scan_options, scanned_files=scanned_files, **combine_options)
+    
+    watch_folder(folder_path, scan, combine, recursive=scan_options.get('recursive', False),
+                 poll_interval=poll_interval, settle_seconds=settle_seconds,
+                 use_inotify=use_inotify, stop_event=stop_event, quiet_seconds=quiet_seconds)
+
+def compile_regex(pattern):
+    """argparse type for regular expression options; invalid patterns become usage errors."""
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"invalid regular expression {pattern!r}: {e}")
+
+def save_run_report(report, report_path=None, profile_path=None):
+    """Finish a run report and save it as JSON and/or the cProfile statistics."""
+    report.finish()
+    print(f"\n{report.summary()}")
+    if report_path:
+        report.save(report_path)
+        print(f"Run report saved to: {report_path}")
+    if profile_path:
+        report.save_profile(profile_path)
+        print(f"cProfile statistics saved to: {profile_path}")
 
 def main():
     """Main function to handle command line arguments and execute the script."""
@@ -169,11 +1007,200 @@ def main():
     parser = argparse.ArgumentParser(description='Combine multiple Excel files into one')
     parser.add_argument('folder_path', nargs='?', default='.', 
                        help='Path to folder containing Excel files (default: current directory)')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                       help='Also combine Excel files in all subfolders')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                       help='Only combine files matching this glob (matched against the file name, or the '
+                            'relative path if it contains a /); can be repeated')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                       help='Skip files matching this glob; can be repeated')
+    parser.add_argument('--include-regex', action='append', metavar='REGEX', type=compile_regex,
+                       help='Only combine files whose relative path matches this regular expression')
+    parser.add_argument('--exclude-regex', action='append', metavar='REGEX', type=compile_regex,
+                       help='Skip files whose relative path matches this regular expression')
+    parser.add_argument('--min-size', type=parse_size, metavar='SIZE',
+                       help='Skip files smaller than SIZE (e.g. 10K, 5MB)')
+    parser.add_argument('--max-size', type=parse_size, metavar='SIZE',
+                       help='Skip files larger than SIZE (e.g. 500MB)')
+    parser.add_argument('--modified-after', type=parse_timestamp, metavar='DATE',
+                       help='Only combine files modified at or after DATE (e.g. 2025-09-15 or 2025-09-15T08:00)')
+    parser.add_argument('--modified-before', type=parse_timestamp, metavar='DATE',
+                       help='Only combine files modified before DATE')
     parser.add_argument('-o', '--output', default='combined_excel_files.xlsx',
                        help='Output filename (default: combined_excel_files.xlsx)')
+    parser.add_argument('-f', '--format', action='append', default=None,
+                       help='Output format(s): ' + ', '.join(OUTPUT_FORMATS) +
+                            '. Repeat or separate with commas to write several formats from one read '
+                            '(default: from the output filename extension)')
+    parser.add_argument('-p', '--preserve-formatting', action='store_true',
+                       help='Keep highlighting (extended across the full row) and bold/italic fonts, like the GUI; '
+                            'needs xlsx among the formats, and the other formats get a Highlight column')
+    parser.add_argument('--reader', choices=sorted(READER_BACKENDS), default=DEFAULT_READER_BACKEND,
+                       help='Reader backend: openpyxl, or native to parse the xlsx files directly '
+                            f'with a streaming XML parser (default: {DEFAULT_READER_BACKEND})')
+    parser.add_argument('--highlight-mode', choices=HIGHLIGHT_MODES, default=DEFAULT_HIGHLIGHT_MODE,
+                       help='With --preserve-formatting: fill highlighted rows with a row-level style (row) '
+                            f'or by styling every cell up to the fill width like earlier versions (cells) '
+                            f'(default: {DEFAULT_HIGHLIGHT_MODE})')
+    parser.add_argument('--all-sheets', action='store_true',
+                       help='Combine every sheet of each workbook instead of only the first one')
+    parser.add_argument('--sheet', action='append', metavar='NAME',
+                       help='Combine the sheet with this name from each workbook; can be repeated')
+    parser.add_argument('--sheet-regex', action='append', metavar='REGEX', type=compile_regex,
+                       help='Combine the sheets whose name matches this regular expression; can be repeated')
+    parser.add_argument('--sheet-column', action='store_true',
+                       help=f'Add a {SHEET_COLUMN} column next to Source_File with the sheet name '
+                            'on the first row of each sheet')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Drop rows whose key columns repeat a row that was already combined, across all files')
+    parser.add_argument('--dedup-columns', default=','.join(DEFAULT_DEDUP_COLUMNS), metavar='COLUMNS',
+                       help=f'Comma-separated key columns for --dedup, of {", ".join(DEDUP_KEY_COLUMNS)} '
+                            f'(default: {",".join(DEFAULT_DEDUP_COLUMNS)})')
+    parser.add_argument('--dedup-keep', choices=DEDUP_KEEP_POLICIES, default=DEFAULT_DEDUP_KEEP,
+                       help='Which duplicate survives (with its highlighting): the first or the last one '
+                            'in output order. first drops duplicates as each file is read; last needs '
+                            f'every file read first (default: {DEFAULT_DEDUP_KEEP})')
+    parser.add_argument('--dedup-memory-keys', type=int, default=DEFAULT_MAX_MEMORY_KEYS, metavar='N',
+                       help='Row keys held in memory before --dedup spills them to a temporary file '
+                            f'(default: {DEFAULT_MAX_MEMORY_KEYS})')
+    parser.add_argument('--shard-rows', type=int, default=DEFAULT_SHARD_ROWS, metavar='N',
+                       help='Most data rows written to one Excel sheet; larger output is split, keeping each '
+                            f'source file\'s rows together where they fit (default: {DEFAULT_SHARD_ROWS}, the '
+                            'most a sheet holds next to its header)')
+    parser.add_argument('--shard-mode', choices=SHARD_MODES, default=DEFAULT_SHARD_MODE,
+                       help='Write the parts of split output as further sheets of the output workbook, or as '
+                            'numbered files next to it (written in parallel with --workers) '
+                            f'(default: {DEFAULT_SHARD_MODE})')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                       help='Number of processes used to read files in parallel (default: 1)')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                       help='Only read new or changed files, reusing the manifest kept next to the output')
+    parser.add_argument('-c', '--checkpoint', action='store_true',
+                       help='Checkpoint finished files next to the output so an interrupted run '
+                            '(e.g. Ctrl+C) resumes after the last finished file; the checkpoint is '
+                            'removed once the output is written (with --incremental the manifest '
+                            'is the checkpoint and is kept)')
+    parser.add_argument('--watch', action='store_true',
+                       help='Keep running and update the output incrementally whenever files arrive, '
+                            'change or are removed (stop with Ctrl+C). Only new or changed files are '
+                            'read, but every update rewrites the whole output from all parsed files, '
+                            'so changes are batched (see --quiet-period)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                       help=f'Watch mode: maximum seconds between two folder scans (default: {DEFAULT_POLL_INTERVAL:g})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                       help='Watch mode: seconds a file must stay unchanged before it is combined, so '
+                            f'partially written files are skipped (default: {DEFAULT_SETTLE_SECONDS:g})')
+    parser.add_argument('--quiet-period', type=float, default=DEFAULT_QUIET_SECONDS, metavar='SECONDS',
+                       help='Watch mode: seconds without any change in the folder before the output is '
+                            'updated, so a burst of saves causes one update '
+                            f'(default: {DEFAULT_QUIET_SECONDS:g})')
+    parser.add_argument('--no-inotify', action='store_true',
+                       help='Watch mode: only poll, e.g. for network shares written by other machines')
+    parser.add_argument('-s', '--stream', action='store_true',
+                       help='Stream rows from the inputs to the output with constant memory')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                       help=f'Rows held in memory at a time when streaming (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--progress-json', action='store_true',
+                       help='Write machine-readable progress (one JSON object per line) to stderr')
+    parser.add_argument('--estimate', action='store_true',
+                       help='Pre-scan the input files (sheet dimensions, header rows, approximate row '
+                            'counts) and print the estimated runtime and peak memory, then exit')
+    parser.add_argument('--profile', metavar='REPORT.json',
+                       help='Write a JSON run report: time and peak traced memory of every stage, per-file '
+                            'bytes, rows, formatted rows and read seconds, and the run totals')
+    parser.add_argument('--cprofile', metavar='FILE.prof',
+                       help='Profile the run with cProfile, dump the statistics to FILE.prof (for pstats or '
+                            'snakeviz) and list the hot paths in the --profile report')
+    parser.add_argument('--cache', action='store_true',
+                       help='Cache parse results on disk and reuse them for unchanged files')
+    parser.add_argument('--cache-dir', default=None,
+                       help='Parse cache directory (default: per-user cache directory)')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                       help='Parse cache size cap in MB; least recently used entries are evicted (default: 1024)')
+    parser.add_argument('--cache-info', action='store_true',
+                       help='Show the parse cache location and size, then exit')
+    parser.add_argument('--cache-clear', action='store_true',
+                       help='Remove all parse cache entries, then exit')
     
     args = parser.parse_args()
     
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    
+    if not 1 <= args.shard_rows <= DEFAULT_SHARD_ROWS:
+        parser.error(f"--shard-rows must be between 1 and {DEFAULT_SHARD_ROWS}")
+    
+    formats = []
+    for value in args.format or []:
+        for output_format in value.split(','):
+            output_format = output_format.strip().lower()
+            if output_format not in OUTPUT_FORMATS:
+                parser.error(f"Unknown output format: {output_format} (choose from {', '.join(OUTPUT_FORMATS)})")
+            if output_format not in formats:
+                formats.append(output_format)
+    
+    arrow_formats = [f for f in formats or [infer_output_format(args.output)] if f in ARROW_FORMATS]
+    if arrow_formats and not HAS_PYARROW:
+        parser.error(f"Writing {' and '.join(arrow_formats)} output needs pyarrow (pip install pyarrow)")
+    
+    if args.stream and (args.workers > 1 or args.incremental or args.cache or args.checkpoint):
+        parser.error("--stream cannot be combined with --workers, --incremental, --checkpoint or --cache")
+    
+    if args.stream and (formats or [infer_output_format(args.output)]) != ['xlsx']:
+        parser.error("--stream only writes xlsx output")
+    
+    if args.stream and args.reader != DEFAULT_READER_BACKEND:
+        parser.error("--stream always reads with openpyxl and cannot be combined with --reader")
+    
+    sheets = None
+    if args.all_sheets and (args.sheet or args.sheet_regex):
+        parser.error("--all-sheets cannot be combined with --sheet or --sheet-regex")
+    if args.all_sheets or args.sheet or args.sheet_regex:
+        sheets = SheetSelection(tuple(args.sheet or ()), tuple(p.pattern for p in args.sheet_regex or ()))
+    
+    if args.sheet_column and sheets is None:
+        parser.error("--sheet-column requires --all-sheets, --sheet or --sheet-regex")
+    
+    if args.stream and sheets is not None:
+        parser.error("--stream only reads the first sheet and cannot be combined with sheet selection")
+    
+    dedup_columns = None
+    if args.dedup:
+        dedup_columns = [column.strip() for column in args.dedup_columns.split(',') if column.strip()]
+        unknown = [column for column in dedup_columns if column not in DEDUP_KEY_COLUMNS]
+        if unknown or not dedup_columns:
+            parser.error(f"--dedup-columns must name columns of {', '.join(DEDUP_KEY_COLUMNS)}")
+        if args.dedup_memory_keys < 1:
+            parser.error("--dedup-memory-keys must be at least 1")
+    
+    if args.stream and args.dedup and args.dedup_keep != 'first':
+        parser.error("--stream writes rows as they are read and can only keep the first duplicate")
+    
+    if args.watch and args.stream:
+        parser.error("--watch cannot be combined with --stream")
+    
+    if args.watch and (args.profile or args.cprofile):
+        parser.error("--profile and --cprofile report a single run and cannot be combined with --watch")
+    
+    if args.poll_interval <= 0 or args.settle < 0 or args.quiet_period < 0:
+        parser.error("--poll-interval must be positive and --settle and --quiet-period cannot be negative")
+    
+    if args.preserve_formatting and args.stream:
+        parser.error("--preserve-formatting cannot be combined with --stream")
+    
+    if args.preserve_formatting and 'xlsx' not in (formats or [infer_output_format(args.output)]):
+        parser.error("--preserve-formatting needs xlsx among the output formats")
+    
+    cache = ParseCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+    if args.cache_info or args.cache_clear:
+        if args.cache_clear:
+            print(f"Removed {cache.clear()} parse cache entries")
+        print(format_cache_info(cache.info()))
+        return
+    
     # Convert to absolute path
     folder_path = os.path.abspath(args.folder_path)
     
@@ -188,8 +1215,72 @@ def main():
     
     print(f"Looking for Excel files in: {folder_path}")
     
+    scan_options = {
+        'recursive': args.recursive,
+        'include': args.include,
+        'exclude': args.exclude,
+        'include_regex': args.include_regex,
+        'exclude_regex': args.exclude_regex,
+        'min_size': args.min_size,
+        'max_size': args.max_size,
+        'modified_after': args.modified_after,
+        'modified_before': args.modified_before,
+    }
+    
+    if args.estimate:
+        scanned_files = scan_input_files(folder_path, args.output, formats, scan_options)
+        print(f"Found {len(scanned_files)} Excel files to combine")
+        workbooks = prescan_files([scanned_file.path for scanned_file in scanned_files], sheets,
+                                  {scanned_file.path: scanned_file for scanned_file in scanned_files})
+        # The plain combine builds the whole workbook in memory; -p and --stream stream it out
+        print(format_prescan(summarize_prescan(workbooks, reader_backend=args.reader, workers=args.workers,
+                                               streaming=args.stream or args.preserve_formatting,
+                                               shard_rows=args.shard_rows)))
+        return
+    
+    if args.watch:
+        try:
+            watch_excel_files(folder_path, args.output, formats=formats, scan_options=scan_options,
+                              poll_interval=args.poll_interval, settle_seconds=args.settle,
+                              quiet_seconds=args.quiet_period,
+                              use_inotify=not args.no_inotify, workers=args.workers,
+                              cache=cache if args.cache else None,
+                              preserve_formatting=args.preserve_formatting,
+                              progress=json_lines_progress() if args.progress_json else None,
+                              reader_backend=args.reader, highlight_mode=args.highlight_mode,
+                              sheets=sheets, sheet_column=args.sheet_column, dedup_columns=dedup_columns,
+                              dedup_keep=args.dedup_keep, dedup_memory_keys=args.dedup_memory_keys,
+                              shard_rows=args.shard_rows, shard_mode=args.shard_mode)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+        return
+    
+    report = None
+    if args.profile or args.cprofile:
+        report = RunReport(trace_memory=bool(args.profile), profile=bool(args.cprofile))
+        report.start()
+    
     # Combine the files
-    combine_excel_files(folder_path, args.output)
+    try:
+        combine_excel_files(folder_path, args.output, workers=args.workers,
+                            incremental=args.incremental,
+                            cache=cache if args.cache else None,
+                            stream=args.stream, chunk_size=args.chunk_size,
+                            formats=formats, preserve_formatting=args.preserve_formatting,
+                            progress=json_lines_progress() if args.progress_json else None,
+                            checkpoint=args.checkpoint, scan_options=scan_options,
+                            reader_backend=args.reader, highlight_mode=args.highlight_mode,
+                            sheets=sheets, sheet_column=args.sheet_column, dedup_columns=dedup_columns,
+                            dedup_keep=args.dedup_keep, dedup_memory_keys=args.dedup_memory_keys,
+                            shard_rows=args.shard_rows, shard_mode=args.shard_mode, report=report)
+    except KeyboardInterrupt:
+        print("\nCancelled.")
+        if args.checkpoint or args.incremental:
+            print("Finished files were checkpointed; run the same command again to resume.")
+        sys.exit(130)
+    finally:
+        if report is not None:
+            save_run_report(report, args.profile, args.cprofile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Combine Manifest
+
+Support for incremental combines. A manifest stored next to the combined
+output records every input's path, size, modification time and content hash
+together with the parsed block that was read from it. On the next run only
+new or changed inputs are read again; the blocks of unchanged inputs are
+reused, and the blocks of removed or changed inputs are dropped. Blocks are
+stored as Feather frames plus JSON (see block_store), never pickled, so a
+manifest in a shared folder cannot run code, and a block that fails to load
+for any reason is simply read again.
+
+The same manifest doubles as the checkpoint of a combine: it is saved
+periodically while files are read and whenever reading stops early, so an
+interrupted or cancelled run can resume after the last finished file. A
+checkpoint of a run that is not incremental is kept in files of its own
+(<output>.checkpoint.json and <output>.checkpoint-blocks), so removing it
+once the output is written never touches the incremental manifest.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from collections import namedtuple
+
+from block_store import save_block, load_block
+from excel_reader import read_excel_files
+
+MANIFEST_VERSION = 2
+
+# Seconds between two checkpoint saves of the manifest while files are read
+DEFAULT_CHECKPOINT_INTERVAL = 10
+
+# Suffixes of the manifest file and blocks folder next to the output
+MANIFEST_SUFFIXES = ('.manifest.json', '.blocks')
+# The same for the checkpoint of a run that is not incremental
+CHECKPOINT_SUFFIXES = ('.checkpoint.json', '.checkpoint-blocks')
+
+# Size and modification time of an input taken before it is read, for inputs
+# without a folder scan result (folder_scanner.ScannedFile has the same fields)
+FileStat = namedtuple('FileStat', ['size', 'mtime'])
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 hash of a file's content.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Number of bytes read at a time
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _size_and_mtime(file_path, file_stat=None):
+    """Get (size, modification time) of a file, from scan results when available."""
+    if file_stat is not None:
+        return file_stat.size, file_stat.mtime
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+
+def _stat_before_read(file_path, file_stat=None):
+    """Get the FileStat (or scan result) of an input about to be read; None if it cannot be stat'ed."""
+    if file_stat is not None:
+        return file_stat
+    try:
+        return FileStat(*_size_and_mtime(file_path))
+    except OSError:
+        return None
+
+
+class InputManifest:
+    """Manifest of the inputs of one combined output file and their parsed blocks."""
+
+    def __init__(self, output_path, reader_name, checkpoint_only=False):
+        """
+        Load the manifest that belongs to an output file (if there is one).
+
+        Args:
+            output_path (str): Path of the combined output file
+            reader_name (str): Name of the reader that produces the blocks; blocks
+                written by a different reader are never reused
+            checkpoint_only (bool): Use the checkpoint files of a run that is not
+                incremental instead of the incremental manifest
+        """
+        manifest_suffix, blocks_suffix = CHECKPOINT_SUFFIXES if checkpoint_only else MANIFEST_SUFFIXES
+        self.manifest_path = output_path + manifest_suffix
+        self.blocks_dir = output_path + blocks_suffix
+        self.reader_name = reader_name
+        self.entries = {}
+        self.reused = 0
+        self.read = 0
+        self.dropped = 0
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            # Blocks written in an older layout can never be loaded again
+            shutil.rmtree(self.blocks_dir, ignore_errors=True)
+        elif manifest.get('reader') == reader_name:
+            self.entries = manifest.get('files', {})
+
+    def _block_path(self, sha256):
+        return os.path.join(self.blocks_dir, sha256)
+
+    def _drop(self, file_path):
+        """Forget an input and delete its block unless another input shares it."""
+        entry = self.entries.pop(file_path, None)
+        if entry is None:
+            return
+        self.dropped += 1
+        if not any(e['sha256'] == entry['sha256'] for e in self.entries.values()):
+            shutil.rmtree(self._block_path(entry['sha256']), ignore_errors=True)
+
+    def prune(self, file_paths):
+        """
+        Drop the entries of inputs that are no longer part of the combine.
+
+        Args:
+            file_paths (list): Current input files
+
+        Returns:
+            list: Paths of the inputs that were dropped
+        """
+        current = {os.path.abspath(file_path) for file_path in file_paths}
+        removed = [file_path for file_path in self.entries if file_path not in current]
+        for file_path in removed:
+            self._drop(file_path)
+        return removed
+
+    def is_unchanged(self, file_path, file_stat=None):
+        """
+        Check whether an input is unchanged since its block was stored.
+
+        Size and modification time are compared first; if only the modification
+        time differs the content hash decides whether the file really changed.
+        The entry of a changed input is dropped.
+
+        Args:
+            file_path (str): Input file
+            file_stat (folder_scanner.ScannedFile): Size and modification time
+                collected by the folder scan (the file is stat'ed if omitted)
+
+        Returns:
+            bool: True if the stored block can be reused
+        """
+        file_path = os.path.abspath(file_path)
+        entry = self.entries.get(file_path)
+        if entry is None:
+            return False
+
+        try:
+            size, mtime = _size_and_mtime(file_path, file_stat)
+            if size != entry['size']:
+                self._drop(file_path)
+                return False
+            if mtime != entry['mtime']:
+                if file_sha256(file_path) != entry['sha256']:
+                    self._drop(file_path)
+                    return False
+                entry['mtime'] = mtime
+        except OSError:
+            self._drop(file_path)
+            return False
+        return True
+
+    def load(self, file_path):
+        """
+        Load the stored block of an input.
+
+        Any failure (a missing or damaged block, or one written by other
+        pandas or pyarrow versions) drops the entry and counts as a miss.
+
+        Returns:
+            The reader result stored for the file, or None
+        """
+        file_path = os.path.abspath(file_path)
+        entry = self.entries.get(file_path)
+        if entry is None:
+            return None
+        try:
+            return load_block(self._block_path(entry['sha256']), file_path)
+        except Exception:
+            self._drop(file_path)
+            return None
+
+    def lookup(self, file_path, file_stat=None):
+        """
+        Return the stored block of an unchanged input.
+
+        Args:
+            file_path (str): Input file
+            file_stat (folder_scanner.ScannedFile): Size and modification time
+                collected by the folder scan (the file is stat'ed if omitted)
+
+        Returns:
+            The reader result stored for the file, or None if the file is new,
+            changed or its block cannot be loaded
+        """
+        if not self.is_unchanged(file_path, file_stat):
+            return None
+        return self.load(file_path)
+
+    def store(self, file_path, result, file_stat=None):
+        """
+        Record an input and its freshly read block.
+
+        The input is hashed after it was read, so it is stat'ed again after
+        hashing: an input that changed since file_stat was taken is not
+        recorded, since its hash might not belong to the parsed block.
+        Neither is an input whose block cannot be stored (cells of a type the
+        block store does not know, a full disk, a file locked or deleted
+        since it was read). Either way the input is read again next time.
+
+        Args:
+            file_path (str): Input file
+            result: Reader result for the file
+            file_stat (folder_scanner.ScannedFile): Size and modification time
+                taken before the file was read (the file is stat'ed now if omitted)
+
+        Returns:
+            str: Why the input was not recorded, or None if it was
+        """
+        file_path = os.path.abspath(file_path)
+        try:
+            size, mtime = _size_and_mtime(file_path, file_stat)
+            sha256 = file_sha256(file_path)
+            if _size_and_mtime(file_path) != (size, mtime):
+                self.entries.pop(file_path, None)
+                return "the file changed while it was read"
+            save_block(self._block_path(sha256), result)
+        except (OSError, TypeError, ValueError) as e:
+            self.entries.pop(file_path, None)
+            return str(e)
+
+        self.entries[file_path] = {
+            'size': size,
+            'mtime': mtime,
+            'sha256': sha256,
+        }
+        return None
+
+    def save(self):
+        """Write the manifest next to the output file."""
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'reader': self.reader_name,
+            'files': self.entries,
+        }
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def remove(self):
+        """Delete the manifest and all stored blocks (e.g. a checkpoint that is no longer needed)."""
+        self.entries = {}
+        try:
+            os.remove(self.manifest_path)
+        except OSError:
+            pass
+        shutil.rmtree(self.blocks_dir, ignore_errors=True)
+
+    def read_files(self, reader, file_paths, workers=1,
+                   checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, file_stats=None, sheets=None, timings=None,
+                   log=None):
+        """
+        Read the inputs of an incremental combine.
+
+        Works like excel_reader.read_excel_files(), except that unchanged inputs
+        are served from their stored blocks and only new or changed inputs are
+        read (in parallel when workers > 1). The manifest is saved every
+        checkpoint_interval seconds, once all inputs have been yielded, and
+        when the caller stops early (the generator is closed or an exception
+        is raised), so finished files are never read twice. file_stats
+        ({path: folder_scanner.ScannedFile}) saves stat calls for scanned files.
+        With a SheetSelection (sheets), a file's block holds all of its
+        selected sheets, so the reader name must include the selection.
+        timings receives the read seconds of the inputs that are read, like
+        in read_excel_files(). Inputs that are read but cannot be recorded
+        (see store()) are reported through log.
+
+        Yields:
+            tuple: (file path, reader result or None, error message or None)
+        """
+        file_paths = list(file_paths)
+        file_stats = file_stats or {}
+        self.prune(file_paths)
+
+        # Blocks are only loaded when their turn comes, so no more than one
+        # reused block is held in memory at a time
+        unchanged = {file_path for file_path in file_paths
+                     if self.is_unchanged(file_path, file_stats.get(file_path))}
+        to_read = [file_path for file_path in file_paths if file_path not in unchanged]
+        # Taken before any file is read, so store() notices inputs that change while they are read
+        read_stats = {file_path: _stat_before_read(file_path, file_stats.get(file_path)) for file_path in file_paths}
+        fresh_results = read_excel_files(reader, to_read, workers, sheets, timings)
+        last_save = time.monotonic()
+
+        try:
+            for file_path in file_paths:
+                if file_path in unchanged:
+                    result = self.load(file_path)
+                    if result is not None:
+                        self.reused += 1
+                        yield file_path, result, None
+                        continue
+                    # The stored block could not be loaded; read the file after all
+                    _, result, error = next(read_excel_files(reader, [file_path], 1, sheets, timings))
+                else:
+                    _, result, error = next(fresh_results)
+
+                self.read += 1
+                if error is None:
+                    reason = self.store(file_path, result, read_stats[file_path])
+                    if reason is not None and log is not None:
+                        log(f"  Warning: {os.path.basename(file_path)} is not recorded in the manifest "
+                            f"and will be read again next time: {reason}")
+                    if time.monotonic() - last_save >= checkpoint_interval:
+                        self.save()
+                        last_save = time.monotonic()
+                yield file_path, result, error
+        finally:
+            fresh_results.close()
+            self.save()
+
+    def summary(self):
+        """Return a one-line description of what the incremental run reused."""
+        return (f"Incremental: reused {self.reused} unchanged file(s), "
+                f"read {self.read} new or changed file(s), "
+                f"dropped {self.dropped} removed or changed file(s)")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Combine Options
+
+Defaults and choices of the combine options that the GUI needs to build its
+window. This module imports nothing heavy, so the window can appear before
+pandas and openpyxl are loaded; the modules that implement the options
+(combine_engine, row_dedup, excel_reader) import their constants from here.
+"""
+
+import re
+from collections import namedtuple
+
+# Reader backend used unless another one is chosen (see combine_engine.READER_BACKENDS)
+DEFAULT_READER_BACKEND = 'openpyxl'
+
+# Output columns that can form the deduplication key
+DEDUP_KEY_COLUMNS = ('Filename', 'Transcription', 'Status')
+DEFAULT_DEDUP_COLUMNS = ('Filename', 'Transcription')
+
+# Which of several identical rows is kept (together with its formatting)
+DEDUP_KEEP_POLICIES = ('first', 'last')
+DEFAULT_DEDUP_KEEP = 'first'
+
+
+class SheetSelection(namedtuple('SheetSelection', ['names', 'patterns'])):
+    """
+    Which sheets of every workbook are combined.
+
+    A sheet is selected when its name is one of names or matches (re.search)
+    one of the regular expressions in patterns. With neither, all sheets are
+    selected. Sheets keep their workbook order.
+    """
+
+    __slots__ = ()
+
+    def select(self, sheet_names):
+        """Get the selected names of a workbook's sheet names."""
+        if not self.names and not self.patterns:
+            return list(sheet_names)
+        return [name for name in sheet_names
+                if name in self.names or any(re.search(pattern, name) for pattern in self.patterns)]
+
+    def describe(self):
+        """Describe the selection, e.g. for manifest names."""
+        if not self.names and not self.patterns:
+            return 'all sheets'
+        parts = [f"name={name}" for name in self.names] + [f"regex={pattern}" for pattern in self.patterns]
+        return ', '.join(parts)
+
+
+ALL_SHEETS = SheetSelection((), ())
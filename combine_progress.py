@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Combine Progress
+
+Determinate progress reporting for the combiner. A combine runs through up to
+five stages (scan, read, format extraction, write and save). Each stage has a
+fixed share of the overall progress, and the read stage advances by the byte
+size of the inputs, so a folder with one huge file and many small ones still
+shows an honest percentage. Every report carries the elapsed time, live
+rows/sec and MB/sec throughput, and an ETA.
+"""
+
+import os
+import sys
+import json
+import time
+
+STAGES = ('scan', 'read', 'format', 'write', 'save')
+
+# Relative share of each stage in the overall progress
+STAGE_WEIGHTS = {
+    'scan': 2,
+    'read': 60,
+    'format': 5,
+    'write': 23,
+    'save': 10,
+}
+
+STAGE_LABELS = {
+    'scan': 'Scanning',
+    'read': 'Reading',
+    'format': 'Extracting formatting',
+    'write': 'Writing',
+    'save': 'Saving',
+}
+
+# Minimum time between two reports within a stage, in seconds
+DEFAULT_MIN_INTERVAL = 0.2
+
+
+class ProgressTracker:
+    """
+    Turns per-stage progress updates into overall progress reports.
+
+    Reports are dicts passed to a callback. Updates within a stage are
+    throttled to one report per min_interval seconds; the first and last
+    update of every stage are always reported.
+    """
+
+    def __init__(self, callback, stages=STAGES, total_bytes=0, min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        Args:
+            callback (callable): Called with each progress report (a dict)
+            stages (tuple): Stages this combine runs through, in order
+            total_bytes (int): Total size of the inputs
+            min_interval (float): Minimum seconds between reports within a stage
+        """
+        self.callback = callback
+        self.stages = tuple(stages)
+        self.total_bytes = total_bytes
+        self.min_interval = min_interval
+
+        total_weight = sum(STAGE_WEIGHTS[stage] for stage in self.stages)
+        self.stage_start_fraction = {}
+        offset = 0.0
+        for stage in self.stages:
+            self.stage_start_fraction[stage] = offset
+            offset += STAGE_WEIGHTS[stage] / total_weight
+        self.stage_share = {stage: STAGE_WEIGHTS[stage] / total_weight for stage in self.stages}
+
+        self.start_time = time.perf_counter()
+        self.stage = None
+        self.stage_start_time = self.start_time
+        self.last_report_time = None
+
+    def update(self, stage, done, total, rows=None, force=False):
+        """
+        Report progress within a stage.
+
+        Args:
+            stage (str): Current stage (one of the tracker's stages)
+            done (int): Units done in the stage (bytes for the read stage)
+            total (int): Total units of the stage
+            rows (int): Rows processed so far in the stage, for the rows/sec rate
+            force (bool): Report even if the last report was less than
+                min_interval ago
+        """
+        now = time.perf_counter()
+        if stage != self.stage:
+            self.stage = stage
+            self.stage_start_time = now
+            force = True
+        if done >= total:
+            force = True
+        if not force and now - self.last_report_time < self.min_interval:
+            return
+        self.last_report_time = now
+
+        stage_fraction = min(done / total, 1.0) if total else 1.0
+        fraction = self.stage_start_fraction[stage] + self.stage_share[stage] * stage_fraction
+        elapsed = now - self.start_time
+        stage_elapsed = now - self.stage_start_time
+
+        eta = None
+        if fraction > 0:
+            eta = elapsed * (1 - fraction) / fraction
+
+        rows_per_sec = None
+        if rows is not None and stage_elapsed > 0:
+            rows_per_sec = rows / stage_elapsed
+
+        # Throughput of the whole pipeline, measured in input megabytes
+        mb_per_sec = None
+        if self.total_bytes and elapsed > 0:
+            mb_per_sec = fraction * self.total_bytes / (1024 * 1024) / elapsed
+
+        self.callback({
+            'stage': stage,
+            'stage_done': done,
+            'stage_total': total,
+            'percent': round(fraction * 100, 2),
+            'elapsed': round(elapsed, 3),
+            'eta': round(eta, 1) if eta is not None else None,
+            'rows': rows,
+            'rows_per_sec': round(rows_per_sec, 1) if rows_per_sec is not None else None,
+            'mb_per_sec': round(mb_per_sec, 3) if mb_per_sec is not None else None,
+        })
+
+
+def scan_file_sizes(file_paths, tracker, file_stats=None):
+    """
+    Run the scan stage: get the size of every input file.
+
+    The total is stored as the tracker's total_bytes, so later stages can
+    report their throughput in input megabytes.
+
+    Args:
+        file_paths (list): Input files
+        tracker (ProgressTracker): Tracker to report the scan to
+        file_stats (dict): Optional {path: folder_scanner.ScannedFile} of files
+            whose size is already known
+
+    Returns:
+        dict: Size in bytes of every file (0 if it cannot be read)
+    """
+    file_sizes = {}
+    for index, file_path in enumerate(file_paths):
+        tracker.update('scan', index, len(file_paths))
+        if file_stats and file_path in file_stats:
+            file_sizes[file_path] = file_stats[file_path].size
+            continue
+        try:
+            file_sizes[file_path] = os.path.getsize(file_path)
+        except OSError:
+            file_sizes[file_path] = 0
+    tracker.total_bytes = sum(file_sizes.values())
+    tracker.update('scan', len(file_paths), len(file_paths))
+    return file_sizes
+
+
+def format_duration(seconds):
+    """Format a number of seconds as M:SS or H:MM:SS."""
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_progress(report):
+    """
+    Format a progress report for display in a status bar.
+
+    Returns:
+        str: e.g. "Reading: 45% | 12,345 rows/s | 3.2 MB/s | ETA 1:23"
+    """
+    parts = [f"{STAGE_LABELS.get(report['stage'], report['stage'])}: {report['percent']:.0f}%"]
+    if report['rows_per_sec'] is not None:
+        parts.append(f"{report['rows_per_sec']:,.0f} rows/s")
+    if report['mb_per_sec'] is not None:
+        parts.append(f"{report['mb_per_sec']:.1f} MB/s")
+    if report['eta'] is not None:
+        parts.append(f"ETA {format_duration(report['eta'])}")
+    return " | ".join(parts)
+
+
+def json_lines_progress(stream=None):
+    """
+    Get a progress callback that writes every report as one JSON line.
+
+    Args:
+        stream: File object to write to (default: sys.stderr)
+
+    Returns:
+        callable: Progress callback for ProgressTracker
+    """
+    def report_progress(report):
+        out = stream if stream is not None else sys.stderr
+        out.write(json.dumps(dict(report, event='progress')) + "\n")
+        out.flush()
+    return report_progress
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Combine Table
+
+Columnar intermediate of the formatting-preserving combine. Every input
+file's block is converted to an Arrow table as soon as it has been read:
+Filename and Transcription become Arrow string columns, Status and
+Source_File dictionary-encoded columns (Source_File is empty on all but the
+first row of a block, so it costs little more than its null bitmap). The
+per-file pandas frame can then be dropped, the header row of later files is
+skipped with a zero-copy slice, and the blocks are concatenated without
+copying into one chunked table that the writers stream rows from. When
+sheets are combined, an optional Source_Sheet column marks the first row of
+every sheet's block the same way. Duplicate rows can be dropped from every
+block as it is added, keeping the first occurrence, or from the collected
+blocks before they are concatenated, which keeping the last occurrence
+needs (see row_dedup).
+
+pyarrow is optional. Without it, or when the blocks cannot share one schema
+(e.g. numbers in one file's Filename column and text in another's), the
+table falls back to collecting pandas frames and concatenating them, which
+is what the combine did before.
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+from row_dedup import block_keep_mask, deduplicate_blocks, filter_frame
+from output_shards import source_group_rows
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+OUTPUT_COLUMNS = ['Filename', 'Transcription', 'Status', 'Source_File']
+
+# Optional marker column with the sheet name, next to Source_File
+SHEET_COLUMN = 'Source_Sheet'
+
+# Columns with few distinct values, stored dictionary-encoded
+DICTIONARY_COLUMNS = ('Status', 'Source_File', SHEET_COLUMN)
+
+# Rows converted to Python values at a time while the table is written
+ROW_BATCH_SIZE = 10000
+
+
+class _MixedTypes(Exception):
+    """A block cannot be stored in Arrow's columnar layout."""
+
+
+def _column_array(series, dictionary):
+    """Convert one column of a block to an Arrow array."""
+    try:
+        array = pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise _MixedTypes(str(e))
+    if array.null_count == len(array):
+        # An empty column (e.g. no Status values) must not fix the column type
+        array = pa.nulls(len(array), pa.string())
+    if pa.types.is_large_string(array.type):
+        array = array.cast(pa.string())
+    if dictionary and pa.types.is_string(array.type):
+        array = array.dictionary_encode()
+    return array
+
+
+def _source_column(length, source_name):
+    """Build a dictionary-encoded marker column (Source_File or Source_Sheet): the name on the first row only."""
+    mask = np.ones(length, dtype=bool)
+    mask[0] = False
+    indices = pa.array(np.zeros(length, dtype=np.int32), mask=mask)
+    return pa.DictionaryArray.from_arrays(indices, pa.array([source_name]))
+
+
+class CombinedTable:
+    """The combined rows of all input files, collected block by block."""
+
+    def __init__(self, use_arrow=None, sheet_column=False, dedup_columns=None, deduplicator=None):
+        """
+        Args:
+            use_arrow (bool): Collect Arrow tables (default: when pyarrow is installed)
+            sheet_column (bool): Add the Source_Sheet column after Source_File
+            dedup_columns (list): Key columns of the deduplication done as
+                blocks are added (see row_dedup.DEDUP_KEY_COLUMNS)
+            deduplicator (row_dedup.RowDeduplicator): When given, rows whose
+                dedup_columns were seen before are dropped from every block
+                as it is added, so the first occurrence is kept
+        """
+        if use_arrow is None:
+            use_arrow = HAS_PYARROW
+        self.use_arrow = use_arrow
+        self.sheet_column = sheet_column
+        self.dedup_columns = dedup_columns
+        self.deduplicator = deduplicator
+        self._blocks = []
+        # (source filename, sheet name) of every block
+        self._sources = []
+        self.rows = 0
+        # {source filename: rows dropped as duplicates} of the deduplication done by add_file()
+        self.dropped_rows = {}
+        # Keep mask of the rows of the last add_file(), or None if it dropped none
+        self.last_keep_mask = None
+
+    def _fall_back_to_pandas(self):
+        """Turn the collected Arrow blocks into pandas frames and keep collecting frames."""
+        self._blocks = [block.to_pandas() for block in self._blocks]
+        self.use_arrow = False
+
+    def _add_frame(self, df, source_filename, source_sheet, skip_first_row):
+        df_subset = df.iloc[:, :3].copy()
+        df_subset.columns = OUTPUT_COLUMNS[:3]
+        df_subset['Source_File'] = ''
+        if self.sheet_column:
+            df_subset[SHEET_COLUMN] = ''
+        if skip_first_row:
+            df_subset = df_subset.iloc[1:].copy()
+        df_subset.iloc[0, df_subset.columns.get_loc('Source_File')] = source_filename
+        if self.sheet_column:
+            df_subset.iloc[0, df_subset.columns.get_loc(SHEET_COLUMN)] = source_sheet or ''
+        self._blocks.append(df_subset)
+
+    def _add_arrow(self, df, source_filename, source_sheet, skip_first_row):
+        columns = [_column_array(df.iloc[:, index], name in DICTIONARY_COLUMNS)
+                   for index, name in enumerate(OUTPUT_COLUMNS[:3])]
+        block = pa.Table.from_arrays(columns, names=OUTPUT_COLUMNS[:3])
+        if skip_first_row:
+            block = block.slice(1)
+        block = block.append_column('Source_File', _source_column(len(block), source_filename))
+        if self.sheet_column:
+            block = block.append_column(SHEET_COLUMN, _source_column(len(block), source_sheet or ''))
+        self._blocks.append(block)
+
+    def add_file(self, df, source_filename, first_file, source_sheet=None):
+        """
+        Add the rows of one input file (or one sheet of it).
+
+        Only columns A-C are kept and the source filename (and, with the
+        sheet column, the sheet name) is put on the first row of the block.
+        Every block after the first loses its first row (the repeated
+        header), unless that is its only row. With a deduplicator, rows seen
+        before are dropped and last_keep_mask tells which rows were kept.
+
+        Args:
+            df (pandas.DataFrame): Rows read from the file (at least 3 columns, not empty)
+            source_filename (str): Filename for the Source_File column
+            first_file (bool): Whether this is the first block of the output
+            source_sheet (str): Sheet name for the Source_Sheet column
+
+        Returns:
+            int: Number of rows added
+        """
+        skip_first_row = not first_file and len(df) > 1
+        if self.use_arrow:
+            try:
+                self._add_arrow(df, source_filename, source_sheet, skip_first_row)
+            except _MixedTypes:
+                self._fall_back_to_pandas()
+        if not self.use_arrow:
+            self._add_frame(df, source_filename, source_sheet, skip_first_row)
+        self._sources.append((source_filename, source_sheet))
+
+        added = len(df) - 1 if skip_first_row else len(df)
+        self.last_keep_mask = None
+        if self.deduplicator is not None:
+            mask = block_keep_mask(self._blocks[-1], self.dedup_columns, self.deduplicator)
+            dropped = len(mask) - int(mask.sum())
+            if dropped:
+                self.last_keep_mask = mask
+                self.dropped_rows[source_filename] = self.dropped_rows.get(source_filename, 0) + dropped
+                if dropped == len(mask):
+                    del self._blocks[-1], self._sources[-1]
+                else:
+                    self._blocks[-1] = self._filter_block(self._blocks[-1], mask, source_filename, source_sheet)
+                added -= dropped
+        self.rows += added
+        return added
+
+    def _filter_block(self, block, mask, source_filename, source_sheet):
+        """Keep the rows of a block where mask is True, moving its markers to the first remaining row."""
+        markers = {'Source_File': source_filename}
+        if self.sheet_column:
+            markers[SHEET_COLUMN] = source_sheet or ''
+        if isinstance(block, pd.DataFrame):
+            return filter_frame(block, mask, markers)
+        block = block.filter(pa.array(mask))
+        for name, value in markers.items():
+            block = block.set_column(block.column_names.index(name), name, _source_column(len(block), value))
+        return block
+
+    def deduplicate(self, key_columns, deduplicator, keep='first'):
+        """
+        Drop duplicate rows from the collected blocks.
+
+        Rows are duplicates when their key columns are equal; the first or
+        last occurrence is kept. A block whose first row is dropped gets its
+        Source_File (and Source_Sheet) marker on its first remaining row, and
+        blocks without remaining rows are removed. Keeping the last
+        occurrence needs every block, so it is done here; keeping the first
+        can be done while blocks are added (see __init__), which holds only
+        one block's keep mask at a time instead of one flag per row.
+
+        Args:
+            key_columns (list): Output columns that form the key (see row_dedup.DEDUP_KEY_COLUMNS)
+            deduplicator (row_dedup.RowDeduplicator): Keys seen so far
+            keep (str): 'first' or 'last'
+
+        Returns:
+            tuple: (numpy bool array with one keep flag per collected row, in
+                output order; {source filename: rows dropped from it})
+        """
+        masks = deduplicate_blocks(self._blocks, key_columns, deduplicator, keep)
+
+        blocks = []
+        sources = []
+        dropped_rows = {}
+        for block, mask, (source_filename, source_sheet) in zip(self._blocks, masks, self._sources):
+            dropped = len(mask) - int(mask.sum())
+            if dropped:
+                dropped_rows[source_filename] = dropped_rows.get(source_filename, 0) + dropped
+            if dropped == len(mask):
+                continue
+            if dropped:
+                block = self._filter_block(block, mask, source_filename, source_sheet)
+            blocks.append(block)
+            sources.append((source_filename, source_sheet))
+
+        self._blocks = blocks
+        self._sources = sources
+        keep_mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+        self.rows = int(keep_mask.sum())
+        return keep_mask, dropped_rows
+
+    def group_rows(self):
+        """Get the rows of every source file's group (its consecutive blocks), in output order."""
+        return source_group_rows((source_filename, len(block))
+                                 for block, (source_filename, _) in zip(self._blocks, self._sources))
+
+    def finish(self):
+        """
+        Concatenate the collected blocks.
+
+        Returns:
+            pyarrow.Table or pandas.DataFrame: The combined rows, or None if no
+                rows were added
+        """
+        if not self._blocks:
+            return None
+        if self.use_arrow:
+            try:
+                # Keeps every block's buffers as chunks instead of copying them
+                return pa.concat_tables(self._blocks, promote_options='permissive')
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                self._fall_back_to_pandas()
+        return pd.concat(self._blocks, ignore_index=True)
+
+
+def output_columns(data):
+    """Get the column names of the combined data (a pyarrow.Table or pandas.DataFrame)."""
+    if isinstance(data, pd.DataFrame):
+        return list(data.columns)
+    return list(data.column_names)
+
+
+def to_frame(data):
+    """
+    Get the combined data as a pandas DataFrame.
+
+    Dictionary-encoded Arrow columns become plain text columns, and the
+    empty rows of the Source_File (and Source_Sheet) marker columns hold ''
+    like the marker columns of the pandas fallback.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    columns = []
+    for name, column in zip(data.column_names, data.columns):
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if name in ('Source_File', SHEET_COLUMN):
+            column = column.fill_null('')
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=data.column_names).to_pandas()
+
+
+def slice_rows(data, start, stop, copy=False):
+    """
+    Get the rows [start, stop) of the combined data.
+
+    Args:
+        data (pyarrow.Table or pandas.DataFrame): Combined rows
+        copy (bool): Copy the rows into compact buffers of their own (e.g.
+            before they are sent to another process) instead of a zero-copy
+            slice that still references the buffers of all rows
+
+    Returns:
+        pyarrow.Table or pandas.DataFrame: The rows
+    """
+    if isinstance(data, pd.DataFrame):
+        rows = data.iloc[start:stop]
+        return rows.reset_index(drop=True) if copy else rows
+    if copy:
+        return data.take(np.arange(start, stop))
+    return data.slice(start, stop - start)
+
+
+def iter_output_rows(data):
+    """
+    Iterate over the header and the rows of the combined data.
+
+    Arrow tables are converted to Python values one batch of rows at a time.
+
+    Yields:
+        sequence: The column names first, then the values of every row
+    """
+    if isinstance(data, pd.DataFrame):
+        yield from dataframe_to_rows(data, index=False, header=True)
+        return
+    yield list(data.column_names)
+    for batch in data.to_batches(max_chunksize=ROW_BATCH_SIZE):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
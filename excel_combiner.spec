@@ -10,17 +10,43 @@ a = Analysis(
     hiddenimports=[
         'pandas',
         'openpyxl',
+        'pyarrow',
         'xlrd',
         'tkinter',
         'tkinter.ttk',
         'tkinter.filedialog',
         'tkinter.messagebox',
-        'tkinter.scrolledtext'
+        'tkinter.scrolledtext',
+        # The GUI imports the combine engine after its window is shown
+        'combine_engine',
+        'excel_reader',
+        'parse_cache'
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Never imported by the combiner; leaving them out shrinks the executable,
+    # which a onefile build unpacks on every launch
+    excludes=[
+        'pandas.tests',
+        'pandas.conftest',
+        'pandas.io.formats.style',
+        'pandas.io.formats.style_render',
+        'numpy.f2py',
+        'numpy.distutils',
+        'matplotlib',
+        'scipy',
+        'IPython',
+        'jinja2',
+        'pytest',
+        'tables',
+        'sqlalchemy',
+        'lxml',
+        'bs4',
+        'xlsxwriter',
+        'tkinter.tix',
+        'lib2to3'
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
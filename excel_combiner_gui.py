@@ -4,21 +4,60 @@ Excel File Combiner GUI Application
 
 A cross-platform GUI application for combining multiple Excel files into a single file.
 Built with tkinter for maximum compatibility across macOS and Windows.
+
+Only tkinter and lightweight modules are imported at startup, so the window
+appears quickly. pandas, openpyxl and the combine engine are imported in the
+background once the window is up; a combine started before that finishes
+waits for the imports.
 """
 
 import os
+import re
 import sys
-import glob
+import importlib
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import pandas as pd
-from pathlib import Path
 import threading
+import queue
+from collections import namedtuple
 from datetime import datetime
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-import copy
+
+import multiprocessing
+
+from combine_options import (DEFAULT_READER_BACKEND, DEFAULT_DEDUP_COLUMNS, DEDUP_KEEP_POLICIES, DEFAULT_DEDUP_KEEP,
+                             SheetSelection, ALL_SHEETS)
+from combine_progress import format_progress
+from folder_scanner import scan_excel_files, DEFAULT_EXCLUDE_FILES
+from output_shards import shard_file_regex
+from run_report import RunReport
+from workbook_prescan import prescan_files, summarize_prescan, format_prescan
+
+# Modules that pull in pandas and openpyxl, imported after the window is shown
+ENGINE_MODULES = ('combine_engine', 'excel_reader', 'parse_cache')
+
+# Command line switch that closes the window as soon as it is drawn (for startup benchmarks)
+EXIT_AFTER_STARTUP_ARG = '--exit-after-startup'
+
+# How often the Tk main loop drains the UI event queue, in milliseconds
+UI_DRAIN_INTERVAL_MS = 100
+
+# Most queued events handled per drain, so a flood of log lines cannot stall the UI
+UI_DRAIN_MAX_EVENTS = 2000
+
+
+# Combine options read from the window in the main thread, for the worker thread
+# (Tk variables must not be touched from other threads)
+CombineSettings = namedtuple('CombineSettings', [
+    'folder_path', 'output_filename', 'recursive', 'workers', 'incremental', 'use_parse_cache',
+    'streaming', 'checkpoint', 'reader_backend', 'sheets', 'sheet_column', 'dedup', 'dedup_keep',
+    'split_files', 'trace_memory'])
+
+
+def load_engine_modules():
+    """Import the combine engine and its dependencies (a no-op once they are loaded)."""
+    for name in ENGINE_MODULES:
+        importlib.import_module(name)
+
 
 class ExcelCombinerGUI:
     def __init__(self, root):
@@ -28,15 +67,48 @@ class ExcelCombinerGUI:
         self.root.minsize(600, 400)
         
         # Variables
-        self.folder_path = tk.StringVar()
-        self.output_filename = tk.StringVar(value="combined_excel_files.xlsx")
+        self.create_variables()
         self.is_processing = False
         
+        # Stage timings and counters of the last run, for "Save Run Report..."
+        self.run_report = None
+        
+        # (folder, sheet selection, {path: WorkbookPrescan}) of the last pre-scan
+        self.prescan = None
+        
+        # Set by the Cancel button; the worker stops between files or write chunks
+        self.cancel_event = threading.Event()
+        
+        # Log lines and UI updates from the worker thread, applied by the main loop
+        self.ui_events = queue.Queue()
+        
         # Set up the GUI
         self.setup_gui()
         
         # Center the window
         self.center_window()
+        
+        # Start draining the UI event queue
+        self.root.after(UI_DRAIN_INTERVAL_MS, self.drain_ui_events)
+    
+    def create_variables(self, master=None):
+        """Create the Tk variables of the options (on the default root unless a master, e.g. tk.Tcl(), is given)."""
+        self.folder_path = tk.StringVar(master)
+        self.output_filename = tk.StringVar(master, value="combined_excel_files.xlsx")
+        self.streaming_output = tk.BooleanVar(master, value=True)
+        self.workers = tk.IntVar(master, value=1)
+        self.incremental = tk.BooleanVar(master, value=False)
+        self.use_parse_cache = tk.BooleanVar(master, value=False)
+        self.checkpoint = tk.BooleanVar(master, value=False)
+        self.recursive = tk.BooleanVar(master, value=False)
+        self.reader_backend = tk.StringVar(master, value=DEFAULT_READER_BACKEND)
+        self.all_sheets = tk.BooleanVar(master, value=False)
+        self.sheet_pattern = tk.StringVar(master)
+        self.sheet_column = tk.BooleanVar(master, value=False)
+        self.dedup = tk.BooleanVar(master, value=False)
+        self.dedup_keep = tk.StringVar(master, value=DEFAULT_DEDUP_KEEP)
+        self.split_files = tk.BooleanVar(master, value=False)
+        self.trace_memory = tk.BooleanVar(master, value=False)
     
     def center_window(self):
         """Center the window on the screen"""
@@ -58,7 +130,7 @@ class ExcelCombinerGUI:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(4, weight=1)
+        main_frame.rowconfigure(5, weight=1)
         
         # Title
         title_label = ttk.Label(main_frame, text="Excel File Combiner", 
@@ -88,24 +160,95 @@ class ExcelCombinerGUI:
         self.output_entry = ttk.Entry(output_frame, textvariable=self.output_filename, width=50)
         self.output_entry.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 5))
         
+        # Options
+        options_frame = ttk.LabelFrame(main_frame, text="Options", padding="5")
+        options_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        
+        self.streaming_check = ttk.Checkbutton(options_frame, text="Low-memory streaming output",
+                                               variable=self.streaming_output)
+        self.streaming_check.grid(row=0, column=0, sticky=tk.W, padx=(0, 15))
+        
+        ttk.Label(options_frame, text="Worker processes:").grid(row=0, column=1, sticky=tk.W)
+        self.workers_spinbox = ttk.Spinbox(options_frame, from_=1, to=os.cpu_count() or 1,
+                                           textvariable=self.workers, width=5)
+        self.workers_spinbox.grid(row=0, column=2, sticky=tk.W, padx=(5, 15))
+        
+        self.incremental_check = ttk.Checkbutton(options_frame, text="Incremental (reuse unchanged files)",
+                                                 variable=self.incremental)
+        self.incremental_check.grid(row=0, column=3, sticky=tk.W)
+        
+        self.cache_check = ttk.Checkbutton(options_frame, text="Cache parsed files",
+                                           variable=self.use_parse_cache)
+        self.cache_check.grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.recursive_check = ttk.Checkbutton(options_frame, text="Include subfolders",
+                                               variable=self.recursive)
+        self.recursive_check.grid(row=1, column=1, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
+        self.checkpoint_check = ttk.Checkbutton(options_frame, text="Checkpoint (resume interrupted runs)",
+                                                variable=self.checkpoint)
+        self.checkpoint_check.grid(row=1, column=3, sticky=tk.W, pady=(5, 0))
+        
+        self.native_reader_check = ttk.Checkbutton(options_frame, text="Fast native xlsx reader",
+                                                   variable=self.reader_backend,
+                                                   onvalue='native', offvalue=DEFAULT_READER_BACKEND)
+        self.native_reader_check.grid(row=2, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.all_sheets_check = ttk.Checkbutton(options_frame, text="All sheets",
+                                                variable=self.all_sheets)
+        self.all_sheets_check.grid(row=3, column=0, sticky=tk.W, pady=(5, 0))
+        
+        ttk.Label(options_frame, text="Sheets matching:").grid(row=3, column=1, sticky=tk.W, pady=(5, 0))
+        self.sheet_pattern_entry = ttk.Entry(options_frame, textvariable=self.sheet_pattern, width=12)
+        self.sheet_pattern_entry.grid(row=3, column=2, sticky=tk.W, padx=(5, 15), pady=(5, 0))
+        
+        self.sheet_column_check = ttk.Checkbutton(options_frame, text="Add Source_Sheet column",
+                                                  variable=self.sheet_column)
+        self.sheet_column_check.grid(row=3, column=3, sticky=tk.W, pady=(5, 0))
+        
+        self.dedup_check = ttk.Checkbutton(options_frame, text="Remove duplicate rows",
+                                           variable=self.dedup)
+        self.dedup_check.grid(row=4, column=0, sticky=tk.W, pady=(5, 0))
+        
+        ttk.Label(options_frame, text="Keep duplicate:").grid(row=4, column=1, sticky=tk.W, pady=(5, 0))
+        self.dedup_keep_combo = ttk.Combobox(options_frame, textvariable=self.dedup_keep,
+                                             values=DEDUP_KEEP_POLICIES, state='readonly', width=6)
+        self.dedup_keep_combo.grid(row=4, column=2, sticky=tk.W, padx=(5, 15), pady=(5, 0))
+        
+        self.split_files_check = ttk.Checkbutton(options_frame, text="Split large output into files",
+                                                 variable=self.split_files)
+        self.split_files_check.grid(row=4, column=3, sticky=tk.W, pady=(5, 0))
+        
+        self.trace_memory_check = ttk.Checkbutton(options_frame, text="Trace memory in run report (slower)",
+                                                  variable=self.trace_memory)
+        self.trace_memory_check.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
         # Buttons frame
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=3, column=0, columnspan=3, pady=20)
+        button_frame.grid(row=4, column=0, columnspan=3, pady=20)
         
         self.combine_button = ttk.Button(button_frame, text="Combine Excel Files", 
                                         command=self.start_combine_process, style="Accent.TButton")
         self.combine_button.pack(side=tk.LEFT, padx=5)
         
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_combine_process,
+                                        state='disabled')
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
         self.clear_button = ttk.Button(button_frame, text="Clear Log", command=self.clear_log)
         self.clear_button.pack(side=tk.LEFT, padx=5)
         
+        self.report_button = ttk.Button(button_frame, text="Save Run Report...", command=self.save_run_report,
+                                        state='disabled')
+        self.report_button.pack(side=tk.LEFT, padx=5)
+        
         # Progress bar
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(50, 10))
+        self.progress = ttk.Progressbar(main_frame, mode='determinate', maximum=100)
+        self.progress.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(50, 10))
         
         # Log text area
         log_frame = ttk.LabelFrame(main_frame, text="Processing Log", padding="5")
-        log_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        log_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
         
@@ -115,7 +258,7 @@ class ExcelCombinerGUI:
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
+        status_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
         
         # Initial log message
         self.log_message("Excel File Combiner started. Select a folder containing Excel files to begin.")
@@ -128,109 +271,103 @@ class ExcelCombinerGUI:
             self.log_message(f"Selected folder: {folder}")
             
             # Check for Excel files in the selected folder
-            excel_files = self.get_excel_files(folder)
-            if excel_files:
-                self.log_message(f"Found {len(excel_files)} Excel files:")
-                for file in excel_files:
-                    self.log_message(f"  - {os.path.basename(file)}")
+            scanned_files = self.scan_excel_files(folder)
+            if scanned_files:
+                self.log_message(f"Found {len(scanned_files)} Excel files:")
+                for scanned_file in scanned_files:
+                    self.log_message(f"  - {os.path.basename(scanned_file.path)}")
+                self.start_prescan(folder, scanned_files)
             else:
                 self.log_message("No Excel files found in selected folder.")
     
-    def get_excel_files(self, folder_path, exclude_files=None):
-        """Get all Excel files from the specified folder."""
+    def start_prescan(self, folder, scanned_files):
+        """Pre-scan the files in a background thread and log the size of the combine"""
+        try:
+            sheets = self.sheet_selection()
+            workers = self.worker_count()
+        except (re.error, ValueError):
+            return  # Reported when the combine starts
+        
+        # Tk variables are read here, in the main thread
+        options = {'reader_backend': self.reader_backend.get(), 'workers': workers,
+                   'streaming': self.streaming_output.get()}
+        file_paths = [scanned_file.path for scanned_file in scanned_files]
+        file_stats = {scanned_file.path: scanned_file for scanned_file in scanned_files}
+        
+        def prescan():
+            workbooks = prescan_files(file_paths, sheets, file_stats)
+            self.post_ui_event(self.prescan_complete, folder, sheets, workbooks,
+                               summarize_prescan(workbooks, **options))
+        
+        thread = threading.Thread(target=prescan)
+        thread.daemon = True
+        thread.start()
+    
+    def prescan_complete(self, folder, sheets, workbooks, summary):
+        """Called when a pre-scan is complete"""
+        if folder != self.folder_path.get():
+            return  # Another folder was selected meanwhile
+        self.prescan = (folder, sheets, workbooks)
+        self.log_message(format_prescan(summary))
+    
+    def prescan_results(self, folder_path, sheets, scanned_files):
+        """
+        Get the pre-scan of the files about to be combined.
+        
+        Returns:
+            dict: {path: WorkbookPrescan}, or None unless the last pre-scan
+                covered exactly these files, unchanged, with the same sheets
+        """
+        if self.prescan is None:
+            return None
+        prescan_folder, prescan_sheets, workbooks = self.prescan
+        if prescan_folder != folder_path or prescan_sheets != sheets or len(workbooks) != len(scanned_files):
+            return None
+        for scanned_file in scanned_files:
+            workbook = workbooks.get(scanned_file.path)
+            if workbook is None or (workbook.size, workbook.mtime) != (scanned_file.size, scanned_file.mtime):
+                return None
+        return workbooks
+    
+    def scan_excel_files(self, folder_path, exclude_files=None, output_file=None, recursive=None):
+        """
+        Scan the folder for Excel files, keeping each file's size and modification time.
+        
+        The output filename and the recursive option are read from the window
+        unless given (they must be given when scanning from a worker thread).
+        """
         if exclude_files is None:
-            exclude_files = ['combined_excel_files.xlsx', 'test_combined.xlsx', 
-                           'updated_combined.xlsx', 'final_combined.xlsx', 
-                           'final_updated_combined.xlsx', 'clean_test.xlsx']
+            exclude_files = DEFAULT_EXCLUDE_FILES
+        if output_file is None:
+            output_file = self.output_filename.get()
+        if recursive is None:
+            recursive = self.recursive.get()
         
         # Add current output filename to exclusions
-        output_file = self.output_filename.get()
-        if output_file and output_file not in exclude_files:
-            exclude_files.append(output_file)
-        
-        # Look for both .xlsx and .xls files
-        xlsx_pattern = os.path.join(folder_path, "*.xlsx")
-        xls_pattern = os.path.join(folder_path, "*.xls")
-        
-        excel_files = glob.glob(xlsx_pattern) + glob.glob(xls_pattern)
-        
-        # Filter out excluded files
-        filtered_files = []
-        for file_path in excel_files:
-            filename = os.path.basename(file_path)
-            if filename not in exclude_files:
-                filtered_files.append(file_path)
-        
-        # Sort files to ensure consistent order
-        filtered_files.sort()
-        
-        return filtered_files
+        exclude_files = set(exclude_files)
+        exclude_regex = []
+        if output_file:
+            exclude_files.add(output_file)
+            # ... and the numbered files of an output split into several files
+            exclude_regex.append(shard_file_regex(output_file))
+        
+        return scan_excel_files(folder_path, recursive=recursive, exclude_files=exclude_files,
+                                exclude_regex=exclude_regex, on_error=lambda path, e: self.log_message(f"Warning: Cannot read {path}: {e}"))
+    
+    def get_excel_files(self, folder_path, exclude_files=None):
+        """Get all Excel files from the specified folder."""
+        return [scanned_file.path for scanned_file in self.scan_excel_files(folder_path, exclude_files)]
     
     def read_excel_data_with_formatting(self, file_path):
-        """Read Excel file and return data with formatting information."""
+        """Read Excel file and return data with formatting information in a single pass."""
+        from excel_reader import read_excel_data_with_formatting
+        
         try:
-            # Read the Excel file with pandas for data
-            df = pd.read_excel(file_path)
-            
-            # Load with openpyxl to get formatting
-            wb = load_workbook(file_path)
-            ws = wb.active
-            
-            # Get the filename without extension for the source column
-            filename = os.path.basename(file_path)
-            
-            # Capture row formatting information
-            row_formats = {}
-            
-            for row_idx in range(1, ws.max_row + 1):
-                row_format = {}
-                has_formatting = False
-                
-                # Check each cell in the row for formatting
-                for col_idx in range(1, min(ws.max_column + 1, len(df.columns) + 1)):
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    
-                    cell_format = {}
-                    
-                    # Check for fill (background color)
-                    if cell.fill and cell.fill.patternType and cell.fill.patternType != 'none':
-                        if hasattr(cell.fill, 'fgColor') and cell.fill.fgColor:
-                            if hasattr(cell.fill.fgColor, 'rgb') and cell.fill.fgColor.rgb:
-                                # Store the RGB value as string
-                                rgb_val = cell.fill.fgColor.rgb
-                                if hasattr(rgb_val, 'rgb'):
-                                    rgb_val = rgb_val.rgb
-                                cell_format['fill_color'] = str(rgb_val)
-                                has_formatting = True
-                    
-                    # Check for font formatting
-                    if cell.font:
-                        font_info = {}
-                        if cell.font.bold:
-                            font_info['bold'] = True
-                            has_formatting = True
-                        if cell.font.italic:
-                            font_info['italic'] = True
-                            has_formatting = True
-                        # Skip font color for now to avoid errors
-                        # if cell.font.color and hasattr(cell.font.color, 'rgb') and cell.font.color.rgb:
-                        #     font_info['color'] = str(cell.font.color.rgb)
-                        #     has_formatting = True
-                        
-                        if font_info:
-                            cell_format['font'] = font_info
-                    
-                    if cell_format:
-                        row_format[col_idx] = cell_format
-                
-                if has_formatting:
-                    row_formats[row_idx] = row_format
-            
-            return df, filename, row_formats
+            return read_excel_data_with_formatting(file_path)
             
         except Exception as e:
             self.log_message(f"Error reading file {file_path}: {str(e)}")
-            return None, None, None
+            return None, None, None, 0
     
     def read_excel_data(self, file_path):
         """Read Excel file and return data from columns A through C (legacy method)."""
@@ -239,257 +376,264 @@ class ExcelCombinerGUI:
             return result[0], result[1]
         return None, None
     
-    def combine_excel_files(self):
-        """Combine multiple Excel files into one with preserved formatting."""
+    def sheet_selection(self):
+        """
+        Get the sheets to combine from the sheet options.
+        
+        Returns:
+            SheetSelection: All sheets, or the sheets whose name matches the
+                pattern (a regular expression); None for the active sheet only
+        
+        Raises:
+            re.error: If the pattern is not a valid regular expression
+        """
+        pattern = self.sheet_pattern.get().strip()
+        if not self.all_sheets.get() and not pattern:
+            return None
+        if self.all_sheets.get():
+            return ALL_SHEETS
+        re.compile(pattern)
+        return SheetSelection((), (pattern,))
+    
+    def worker_count(self):
+        """
+        Get the number of worker processes from the workers spinbox.
+        
+        Raises:
+            ValueError: If the spinbox does not hold a whole number of at least 1
+        """
+        try:
+            workers = self.workers.get()
+        except tk.TclError:
+            workers = 0  # Not a number
+        if workers < 1:
+            raise ValueError("Workers must be a whole number of at least 1.")
+        return workers
+    
+    def combine_settings(self):
+        """
+        Read and check the combine options (in the main thread).
+        
+        Returns:
+            CombineSettings: The options, for the worker thread
+        
+        Raises:
+            ValueError: With the message to show if an option is missing or invalid
+        """
         folder_path = self.folder_path.get()
         output_filename = self.output_filename.get()
         
         if not folder_path:
-            messagebox.showerror("Error", "Please select a source folder.")
-            return False
-        
+            raise ValueError("Please select a source folder.")
         if not os.path.exists(folder_path):
-            messagebox.showerror("Error", f"Folder does not exist: {folder_path}")
-            return False
-        
+            raise ValueError(f"Folder does not exist: {folder_path}")
         if not output_filename:
-            messagebox.showerror("Error", "Please specify an output filename.")
-            return False
+            raise ValueError("Please specify an output filename.")
+        
+        workers = self.worker_count()
+        try:
+            sheets = self.sheet_selection()
+        except re.error as e:
+            raise ValueError(f"Invalid sheet pattern: {e}")
+        
+        return CombineSettings(
+            folder_path=folder_path,
+            output_filename=output_filename,
+            recursive=self.recursive.get(),
+            workers=workers,
+            incremental=self.incremental.get(),
+            use_parse_cache=self.use_parse_cache.get(),
+            streaming=self.streaming_output.get(),
+            checkpoint=self.checkpoint.get(),
+            reader_backend=self.reader_backend.get(),
+            sheets=sheets,
+            sheet_column=self.sheet_column.get() and sheets is not None,
+            dedup=self.dedup.get(),
+            dedup_keep=self.dedup_keep.get(),
+            split_files=self.split_files.get(),
+            trace_memory=self.trace_memory.get())
+    
+    def combine_excel_files(self, settings=None):
+        """
+        Combine multiple Excel files into one with preserved formatting.
+        
+        Args:
+            settings (CombineSettings): Options read by combine_settings() in the
+                main thread; read from the window here when None
+        """
+        if settings is None:
+            try:
+                settings = self.combine_settings()
+            except ValueError as e:
+                self.show_message('showerror', "Error", str(e))
+                return False
+        
+        # Waits for the background import if it is still running
+        from combine_engine import combine_with_formatting, CombineCancelled
+        from parse_cache import ParseCache
+        
+        folder_path = settings.folder_path
+        output_filename = settings.output_filename
+        sheets = settings.sheets
+        
+        # Every run records stage timings and counters; tracemalloc only on request
+        report = RunReport(trace_memory=settings.trace_memory)
+        self.run_report = report
+        report.start()
         
         # Get all Excel files in the folder, excluding output files
-        excel_files = self.get_excel_files(folder_path)
+        with report.stage('scan'):
+            scanned_files = self.scan_excel_files(folder_path, output_file=output_filename,
+                                                  recursive=settings.recursive)
+        excel_files = [scanned_file.path for scanned_file in scanned_files]
         
         if not excel_files:
+            report.finish()
             self.log_message(f"No Excel files found in folder: {folder_path}")
-            messagebox.showwarning("Warning", "No Excel files found in the selected folder.")
+            self.show_message('showwarning', "Warning", "No Excel files found in the selected folder.")
             return False
         
         self.log_message(f"Found {len(excel_files)} Excel files to combine:")
-        for file in excel_files:
-            self.log_message(f"  - {os.path.basename(file)}")
+        for scanned_file in scanned_files:
+            self.log_message(f"  - {scanned_file.relative_path}")
         
         try:
-            # Create a new workbook for output
-            output_wb = Workbook()
-            output_ws = output_wb.active
-            output_ws.title = "Combined_Data"
-            
-            # Initialize variables for combining data
-            combined_data = []
-            all_formatting = []
-            current_row = 1
-            header_added = False
+            # Create output file path
+            output_path = os.path.join(folder_path, output_filename)
             
-            for file_index, file_path in enumerate(excel_files):
-                self.log_message(f"Processing: {os.path.basename(file_path)}")
-                
-                df, source_filename, row_formats = self.read_excel_data_with_formatting(file_path)
-                
-                if df is None:
-                    continue
-                    
-                # Skip empty files
-                if df.empty:
-                    self.log_message(f"  Skipping empty file: {source_filename}")
-                    continue
-                
-                # Ensure we have standard column names
-                original_columns = list(df.columns)
-                if len(df.columns) >= 3:
-                    # Use first 3 columns and add source column
-                    df_subset = df.iloc[:, :3].copy()
-                    df_subset.columns = ['Filename', 'Transcription', 'Status']
-                    df_subset['Source_File'] = ''
-                else:
-                    self.log_message(f"  Warning: File {source_filename} has fewer than 3 columns. Skipping.")
-                    continue
-                
-                # Add source filename to the first data row of this file
-                if len(df_subset) > 0:
-                    if not header_added:
-                        # First file: include header
-                        df_subset.iloc[0, df_subset.columns.get_loc('Source_File')] = source_filename
-                        start_data_row = 1
-                        header_added = True
-                    else:
-                        # Subsequent files: skip header, add source to first data row
-                        if len(df_subset) > 1:
-                            df_subset = df_subset.iloc[1:].copy()  # Skip header row
-                            if len(df_subset) > 0:
-                                df_subset.iloc[0, df_subset.columns.get_loc('Source_File')] = source_filename
-                        start_data_row = 2  # Start from row 2 in original file (skip header)
-                
-                # Store data and formatting info
-                combined_data.append(df_subset)
-                
-                # Adjust row formatting indices for the combined file
-                if row_formats and len(df_subset) > 0:
-                    adjusted_formats = {}
-                    for orig_row, format_info in row_formats.items():
-                        # Calculate new row position in combined file
-                        if file_index == 0:
-                            # First file
-                            new_row = current_row + (orig_row - 1)
-                        else:
-                            # Subsequent files: adjust for skipped header
-                            if orig_row > 1:  # Skip header row
-                                new_row = current_row + (orig_row - 2)
-                            else:
-                                continue  # Skip header formatting
-                        
-                        adjusted_formats[new_row] = format_info
-                    
-                    all_formatting.append(adjusted_formats)
-                
-                current_row += len(df_subset)
-                self.log_message(f"  Added {len(df_subset)} rows with formatting")
+            summary = combine_with_formatting(
+                excel_files, output_path,
+                workers=settings.workers,
+                incremental=settings.incremental,
+                cache=ParseCache() if settings.use_parse_cache else None,
+                streaming=settings.streaming,
+                log=self.log_message,
+                progress=self.report_progress,
+                checkpoint=settings.checkpoint,
+                cancel_event=self.cancel_event,
+                file_stats={scanned_file.path: scanned_file for scanned_file in scanned_files},
+                reader_backend=settings.reader_backend,
+                sheets=sheets,
+                sheet_column=settings.sheet_column,
+                dedup_columns=DEFAULT_DEDUP_COLUMNS if settings.dedup else None,
+                dedup_keep=settings.dedup_keep,
+                shard_mode='files' if settings.split_files else 'sheets',
+                report=report,
+                prescan=self.prescan_results(folder_path, sheets, scanned_files))
             
-            if not combined_data:
-                self.log_message("No data to combine!")
-                messagebox.showwarning("Warning", "No data found to combine.")
+            if summary is None:
+                self.show_message('showwarning', "Warning", "No data found to combine.")
                 return False
             
-            # Combine all DataFrames
-            final_df = pd.concat(combined_data, ignore_index=True)
-            
-            # Write data to the workbook
-            for r_idx, row in enumerate(dataframe_to_rows(final_df, index=False, header=True), 1):
-                for c_idx, value in enumerate(row, 1):
-                    output_ws.cell(row=r_idx, column=c_idx, value=value)
-            
-            # Apply formatting with full-row highlighting
-            formatted_rows_set = set()  # Track which rows need full-row formatting
-            row_colors = {}  # Store the primary color for each row
-            
-            # First pass: identify rows that need formatting and determine their colors
-            for format_dict in all_formatting:
-                for row_num, row_format in format_dict.items():
-                    if row_num <= output_ws.max_row:
-                        # Check if this row has any fill colors
-                        for col_num, cell_format in row_format.items():
-                            if 'fill_color' in cell_format:
-                                try:
-                                    fill_color = cell_format['fill_color']
-                                    # Ensure it's a valid hex color
-                                    if len(fill_color) == 8 and fill_color.startswith('FF'):
-                                        fill_color = fill_color[2:]  # Remove alpha channel
-                                    elif len(fill_color) != 6:
-                                        continue  # Skip invalid colors
-                                    
-                                    # Skip default/black colors
-                                    if fill_color not in ['000000', 'FFFFFF']:
-                                        formatted_rows_set.add(row_num)
-                                        row_colors[row_num] = fill_color
-                                        break  # Use first valid color found for the row
-                                except Exception:
-                                    continue
-            
-            # Second pass: apply formatting to entire rows
-            max_column = max(output_ws.max_column, 15)  # Ensure we color at least 15 columns for visual effect
-            
-            # Apply full-row background colors first
-            for row_num in formatted_rows_set:
-                fill_color = row_colors[row_num]
-                try:
-                    pattern_fill = PatternFill(start_color=fill_color, 
-                                             end_color=fill_color, 
-                                             fill_type='solid')
-                    
-                    # Apply background color to entire row (extend well beyond data columns)
-                    for col_idx in range(1, max_column + 10):  # Extra columns for visual effect
-                        cell = output_ws.cell(row=row_num, column=col_idx)
-                        cell.fill = pattern_fill
-                        
-                except Exception as e:
-                    self.log_message(f"    Warning: Could not apply full-row color {fill_color} to row {row_num}: {e}")
-            
-            # Third pass: apply font formatting to original cells
-            for format_dict in all_formatting:
-                for row_num, row_format in format_dict.items():
-                    if row_num <= output_ws.max_row:
-                        for col_num, cell_format in row_format.items():
-                            if col_num <= output_ws.max_column:
-                                cell = output_ws.cell(row=row_num, column=col_num)
-                                
-                                # Apply font formatting (simplified - only bold/italic)
-                                if 'font' in cell_format:
-                                    try:
-                                        font_info = cell_format['font']
-                                        current_font = cell.font
-                                        
-                                        new_font = Font(
-                                            name=current_font.name or 'Calibri',
-                                            size=current_font.size or 11,
-                                            bold=font_info.get('bold', current_font.bold),
-                                            italic=font_info.get('italic', current_font.italic)
-                                            # Skip color for now due to complexity
-                                        )
-                                        cell.font = new_font
-                                    except Exception as e:
-                                        self.log_message(f"    Warning: Could not apply font formatting: {e}")
-            
-            formatted_rows = formatted_rows_set  # For the count at the end
-            
-            # Create output file path and save
-            output_path = os.path.join(folder_path, output_filename)
-            output_wb.save(output_path)
-            
-            self.log_message(f"Successfully combined {len(excel_files)} files with preserved formatting!")
-            self.log_message(f"Output saved to: {output_path}")
-            self.log_message(f"Total rows in combined file: {len(final_df)}")
-            self.log_message(f"Columns: {list(final_df.columns)}")
+            self.log_message(f"Successfully combined {summary['files']} files with preserved formatting!")
+            for saved_path in summary['output_paths']:
+                self.log_message(f"Output saved to: {saved_path}")
+            self.log_message(f"Total rows in combined file: {summary['rows']}")
+            self.log_message(f"Columns: {summary['columns']}")
             
             # Count formatted rows (now refers to full-row formatting)
-            total_formatted_rows = len(formatted_rows)
-            self.log_message(f"Applied full-row highlighting to {total_formatted_rows} row(s)")
+            self.log_message(f"Applied full-row highlighting to {summary['highlighted_rows']} row(s)")
+            self.log_message(summary['style_cache'].summary())
+            report.finish()
+            self.log_message(report.summary())
             
-            messagebox.showinfo("Success", 
-                              f"Successfully combined {len(excel_files)} files with full-row formatting!\n"
-                              f"Output saved to: {output_filename}\n"
-                              f"Total rows: {len(final_df)}\n"
-                              f"Highlighted rows: {total_formatted_rows}")
+            self.show_message('showinfo', "Success", 
+                              f"Successfully combined {summary['files']} files with full-row formatting!\n"
+                              f"Output saved to: {output_filename}\n" +
+                              (f"Split into {summary['shards']} {'files' if settings.split_files else 'sheets'}\n"
+                               if summary['shards'] > 1 else "") +
+                              f"Total rows: {summary['rows']}\n"
+                              f"Highlighted rows: {summary['highlighted_rows']}" +
+                              (f"\nDuplicate rows removed: {sum(summary['dropped_rows'].values())}"
+                               if settings.dedup else ""))
             
             return True
             
+        except CombineCancelled:
+            self.log_message("Combine cancelled.")
+            if settings.checkpoint or settings.incremental:
+                self.log_message("Finished files were checkpointed; the next run resumes after them.")
+            return False
+            
         except Exception as e:
             error_msg = f"Error combining files: {str(e)}"
             self.log_message(error_msg)
-            messagebox.showerror("Error", error_msg)
+            self.show_message('showerror', "Error", error_msg)
             return False
+            
+        finally:
+            # Stops memory tracing; the timings of a failed run can still be saved
+            report.finish()
+    
+    def preload_engine(self):
+        """Import pandas, openpyxl and the combine engine in a background thread"""
+        def preload():
+            try:
+                load_engine_modules()
+            except ImportError:
+                pass  # Reported when a combine imports the engine
+        
+        thread = threading.Thread(target=preload)
+        thread.daemon = True
+        thread.start()
     
     def start_combine_process(self):
         """Start the combination process in a separate thread"""
         if self.is_processing:
             return
         
+        try:
+            settings = self.combine_settings()
+        except ValueError as e:
+            self.log_message(str(e))
+            messagebox.showerror("Error", str(e))
+            return
+        
         self.is_processing = True
+        self.cancel_event.clear()
         self.combine_button.config(state='disabled')
-        self.progress.start(10)
+        self.cancel_button.config(state='normal')
+        self.progress.config(value=0)
         self.status_var.set("Processing...")
         
         # Run in separate thread to prevent GUI freezing
-        thread = threading.Thread(target=self.combine_process_thread)
+        thread = threading.Thread(target=self.combine_process_thread, args=(settings,))
         thread.daemon = True
         thread.start()
     
-    def combine_process_thread(self):
+    def cancel_combine_process(self):
+        """Ask the running combine to stop at the next file or write chunk"""
+        if not self.is_processing or self.cancel_event.is_set():
+            return
+        
+        self.cancel_event.set()
+        self.cancel_button.config(state='disabled')
+        self.status_var.set("Cancelling...")
+        self.log_message("Cancelling after the current file...")
+    
+    def combine_process_thread(self, settings):
         """Thread function for combining files"""
         try:
-            success = self.combine_excel_files()
+            success = self.combine_excel_files(settings)
             
             # Update GUI in main thread
-            self.root.after(0, self.combine_process_complete, success)
+            self.post_ui_event(self.combine_process_complete, success)
         except Exception as e:
-            self.root.after(0, self.combine_process_error, str(e))
+            self.post_ui_event(self.combine_process_error, str(e))
     
     def combine_process_complete(self, success):
         """Called when combine process is complete"""
         self.is_processing = False
         self.combine_button.config(state='normal')
-        self.progress.stop()
+        self.cancel_button.config(state='disabled')
+        if self.run_report is not None:
+            self.report_button.config(state='normal')
         
         if success:
+            self.progress.config(value=100)
             self.status_var.set("Combination completed successfully!")
+        elif self.cancel_event.is_set():
+            self.status_var.set("Combination cancelled.")
         else:
             self.status_var.set("Combination failed.")
     
@@ -497,19 +641,94 @@ class ExcelCombinerGUI:
         """Called when combine process encounters an error"""
         self.is_processing = False
         self.combine_button.config(state='normal')
-        self.progress.stop()
+        self.cancel_button.config(state='disabled')
+        if self.run_report is not None:
+            self.report_button.config(state='normal')
+        self.progress.config(value=0)
         self.status_var.set("Error occurred during processing.")
         self.log_message(f"Unexpected error: {error_msg}")
         messagebox.showerror("Error", f"Unexpected error: {error_msg}")
     
+    def save_run_report(self):
+        """Save the run report of the last combine as JSON"""
+        if self.run_report is None:
+            return
+        report_path = filedialog.asksaveasfilename(title="Save run report", defaultextension='.json',
+                                                   initialdir=self.folder_path.get() or None,
+                                                   initialfile='run_report.json',
+                                                   filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if not report_path:
+            return
+        try:
+            self.run_report.finish()
+            self.run_report.save(report_path)
+            self.log_message(f"Run report saved to: {report_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save the run report: {e}")
+    
+    def report_progress(self, report):
+        """Progress callback of the combine engine (called from the worker thread)"""
+        self.post_ui_event(self.show_progress, report)
+    
+    def show_progress(self, report):
+        """Show a progress report in the progress bar and status bar"""
+        self.progress.config(value=report['percent'])
+        self.status_var.set(format_progress(report))
+    
+    def post_ui_event(self, callback, *args):
+        """Run a callback on the Tk main loop (safe to call from any thread)"""
+        self.ui_events.put((callback, args))
+    
+    def show_message(self, kind, title, message):
+        """Show a message box, routing it through the UI event queue from worker threads"""
+        show = getattr(messagebox, kind)
+        if threading.current_thread() is threading.main_thread():
+            show(title, message)
+        else:
+            self.post_ui_event(show, title, message)
+    
     def log_message(self, message):
-        """Add a message to the log"""
+        """Add a message to the log (safe to call from any thread)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}\n"
         
-        self.log_text.insert(tk.END, log_entry)
+        # The line is inserted by drain_ui_events() on the main loop
+        self.ui_events.put((None, log_entry))
+    
+    def drain_ui_events(self):
+        """
+        Apply queued log lines and UI events, then schedule the next drain.
+        
+        Runs on the Tk main loop. Consecutive log lines are inserted into the
+        log with a single insert, so the log is redrawn at most once per drain
+        no matter how many lines the worker produced.
+        """
+        log_entries = []
+        try:
+            for _ in range(UI_DRAIN_MAX_EVENTS):
+                try:
+                    callback, args = self.ui_events.get_nowait()
+                except queue.Empty:
+                    break
+                
+                if callback is None:
+                    log_entries.append(args)
+                    continue
+                
+                # Keep the log in order with the event
+                self.append_log_entries(log_entries)
+                log_entries = []
+                callback(*args)
+        finally:
+            self.append_log_entries(log_entries)
+            self.root.after(UI_DRAIN_INTERVAL_MS, self.drain_ui_events)
+    
+    def append_log_entries(self, log_entries):
+        """Insert log lines at the end of the log and scroll to them"""
+        if not log_entries:
+            return
+        self.log_text.insert(tk.END, ''.join(log_entries))
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
     
     def clear_log(self):
         """Clear the log text area"""
@@ -517,6 +736,9 @@ class ExcelCombinerGUI:
         self.log_message("Log cleared.")
 
 def main():
+    # Required for the process pool in frozen (PyInstaller) executables
+    multiprocessing.freeze_support()
+    
     # Create the main window
     root = tk.Tk()
     
@@ -537,12 +759,21 @@ def main():
     def on_closing():
         if app.is_processing:
             if messagebox.askokcancel("Quit", "Processing is in progress. Do you want to quit?"):
+                # Let the worker stop cleanly (and save its checkpoint) if it gets the chance
+                app.cancel_event.set()
                 root.destroy()
         else:
             root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     
+    if EXIT_AFTER_STARTUP_ARG in sys.argv[1:]:
+        # Startup benchmark: stop once the window is drawn, without waiting for the imports
+        root.after_idle(lambda: (root.update(), os._exit(0)))
+    
+    # Load the heavy modules while the user picks a folder
+    root.after_idle(app.preload_engine)
+    
     # Start the GUI event loop
     root.mainloop()
 
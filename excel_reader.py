@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Excel Reader
+
+Single-pass reader for the Excel combiner. Each workbook is opened once in
+openpyxl's read-only mode and its rows are streamed a single time: the cell
+values feed the pandas DataFrame and the cell styles feed the row formatting
+map, so the workbook is never parsed twice.
+
+Readers read the active sheet by default. With a SheetSelection,
+read_excel_files() reads the selected sheets of every workbook instead, each
+sheet as a task of its own, so the sheets of one workbook are parsed in
+parallel just like separate files.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+from pandas.errors import EmptyDataError
+import pandas as pd
+
+from combine_options import SheetSelection, ALL_SHEETS  # noqa: F401 (re-exported)
+
+# Bump whenever the result of read_excel_data_with_formatting() changes, so
+# parse results cached by older versions are no longer used
+READER_VERSION = 1
+
+
+def _convert_cell(cell):
+    """Convert a cell value the same way pandas.read_excel does."""
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return float('nan')
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _cell_format(cell):
+    """
+    Get the fill color and bold/italic flags of a cell.
+
+    Returns:
+        dict: Cell format with 'fill_color' and/or 'font' keys (empty if unformatted)
+    """
+    cell_format = {}
+
+    # Check for fill (background color)
+    if cell.fill and cell.fill.patternType and cell.fill.patternType != 'none':
+        if hasattr(cell.fill, 'fgColor') and cell.fill.fgColor:
+            if hasattr(cell.fill.fgColor, 'rgb') and cell.fill.fgColor.rgb:
+                # Store the RGB value as string
+                rgb_val = cell.fill.fgColor.rgb
+                if hasattr(rgb_val, 'rgb'):
+                    rgb_val = rgb_val.rgb
+                cell_format['fill_color'] = str(rgb_val)
+
+    # Check for font formatting
+    if cell.font:
+        font_info = {}
+        if cell.font.bold:
+            font_info['bold'] = True
+        if cell.font.italic:
+            font_info['italic'] = True
+        if font_info:
+            cell_format['font'] = font_info
+
+    return cell_format
+
+
+def row_highlight_color(row_format):
+    """
+    Get the highlight color of a row from its captured formatting.
+
+    The first valid fill color of the row is used. Colors are normalized to six
+    hex digits (an opaque 'FF' alpha channel is removed) and default black or
+    white fills do not count as highlighting.
+
+    Args:
+        row_format (dict): {column: cell format} of one row
+
+    Returns:
+        str: Six-digit hex color, or None if the row is not highlighted
+    """
+    for cell_format in row_format.values():
+        if 'fill_color' in cell_format:
+            fill_color = cell_format['fill_color']
+            # Ensure it's a valid hex color
+            if len(fill_color) == 8 and fill_color.startswith('FF'):
+                fill_color = fill_color[2:]  # Remove alpha channel
+            elif len(fill_color) != 6:
+                continue  # Skip invalid colors
+
+            # Skip default/black colors
+            if fill_color not in ['000000', 'FFFFFF']:
+                return fill_color  # Use first valid color found for the row
+    return None
+
+
+def read_excel_data_with_formatting(file_path, sheet_name=None):
+    """
+    Read an Excel file and return its data together with row formatting.
+
+    The sheet (the active one unless sheet_name is given) is streamed once. Values are converted exactly as
+    pandas.read_excel converts them and parsed into a DataFrame (first row as
+    header), while the formatting of every cell is captured from the same rows.
+
+    The scan is bounded by the real data extent rather than the sheet's
+    declared dimensions: empty rows are only kept once a later row with data
+    shows they are inside the table, and formatting on trailing rows without
+    any value (stray fills saved far below the data) is discarded.
+
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_name (str): Name of the sheet to read (default: the active sheet)
+
+    Returns:
+        tuple: (DataFrame, source filename, row formats, phantom row count) where
+            row formats maps 1-based worksheet row numbers to {column: cell format}
+            and the phantom row count is the number of trailing rows without data
+            that the sheet claims to contain
+
+    Raises:
+        Exception: Any error raised while opening or parsing the workbook
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.active if sheet_name is None else wb[sheet_name]
+        declared_max_row = ws.max_row or 0
+        # The dimension tag may be stale; let the row stream define the extent
+        ws.reset_dimensions()
+
+        def converted_rows():
+            for row_number, row in enumerate(ws.rows, 1):
+                # Missing rows in the sheet XML come through as empty tuples
+                if row:
+                    yield row_number, [_convert_cell(cell) for cell in row], _row_format(row)
+
+        return build_formatted_result(converted_rows(), declared_max_row, file_path)
+    finally:
+        wb.close()
+
+
+def _row_format(row):
+    """Get {column: cell format} of the formatted cells of a row."""
+    row_format = {}
+    for col_idx, cell in enumerate(row, 1):
+        cell_format = _cell_format(cell)
+        if cell_format:
+            row_format[col_idx] = cell_format
+    return row_format
+
+
+def build_formatted_result(rows, declared_max_row, file_path):
+    """
+    Turn the streamed rows of a sheet into the result of a formatting reader.
+
+    Shared by the reader backends. Empty rows are only kept once a later row
+    with data shows they are inside the table; formatting on trailing rows
+    without any value is discarded.
+
+    Args:
+        rows (iterable): (1-based row number, converted cell values, row format)
+            for every row present in the sheet, in order
+        declared_max_row (int): Last row according to the sheet's dimension tag
+        file_path (str): Path of the Excel file
+
+    Returns:
+        tuple: (DataFrame, source filename, row formats, phantom row count), like
+            read_excel_data_with_formatting()
+    """
+    data = []
+    row_formats = {}
+    pending_empty_rows = 0
+    pending_formats = {}
+    streamed_rows = 0
+
+    for row_number, converted_row, row_format in rows:
+        # Rows missing from the sheet XML are empty rows
+        pending_empty_rows += row_number - streamed_rows - 1
+        streamed_rows = row_number
+
+        # Trim trailing empty elements
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+
+        if not converted_row:
+            # Hold empty rows back until we know more data follows them
+            pending_empty_rows += 1
+            if row_format:
+                pending_formats[row_number] = row_format
+            continue
+
+        if pending_empty_rows:
+            data.extend([] for _ in range(pending_empty_rows))
+            row_formats.update(pending_formats)
+            pending_empty_rows = 0
+            pending_formats = {}
+
+        data.append(converted_row)
+        if row_format:
+            row_formats[row_number] = row_format
+
+    # Rows after the last one with data are phantom rows (stray formatting)
+    phantom_rows = max(declared_max_row, streamed_rows) - len(data)
+
+    # Extend the rows to the same width
+    max_width = max((len(data_row) for data_row in data), default=0)
+    data = [data_row + [""] * (max_width - len(data_row)) for data_row in data]
+
+    # Only keep formatting for the columns that made it into the DataFrame
+    for row_idx in list(row_formats):
+        row_format = {col: fmt for col, fmt in row_formats[row_idx].items() if col <= max_width}
+        if row_format:
+            row_formats[row_idx] = row_format
+        else:
+            del row_formats[row_idx]
+
+    try:
+        df = TextParser(data, header=0, skip_blank_lines=False).read()
+    except EmptyDataError:
+        df = pd.DataFrame()
+
+    filename = os.path.basename(file_path)
+
+    return df, filename, row_formats, phantom_rows
+
+
+def _call_reader(reader, file_path):
+    """Run a reader and return (result, error message, seconds taken) instead of raising."""
+    start = time.perf_counter()
+    try:
+        return reader(file_path), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+def _call_sheet_reader(reader, task):
+    """Run a reader on one (file path, sheet name) task and return (result, error message, seconds taken)."""
+    file_path, sheet_name = task
+    start = time.perf_counter()
+    try:
+        return reader(file_path, sheet_name=sheet_name), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+def _map_tasks(call, tasks, workers):
+    """
+    Apply call to every task, in a process pool when workers > 1.
+
+    Results are yielded in the order of tasks. When the caller stops early,
+    the tasks that have not started yet are dropped instead of waiting for
+    all of them to finish.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield call(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        results = executor.map(call, tasks)
+        try:
+            yield from results
+        finally:
+            results.close()
+
+
+def _read_sheets(reader, file_paths, workers, sheets, timings):
+    """Read the selected sheets of every file; see read_excel_files()."""
+    # xlsx_reader builds on this module, so it cannot be imported at the top
+    from xlsx_reader import list_sheet_names
+
+    # Every selected sheet becomes a task of its own, so the pool balances
+    # sheets rather than whole workbooks
+    plan = []
+    tasks = []
+    for file_path in file_paths:
+        try:
+            sheet_names = sheets.select(list_sheet_names(file_path))
+        except Exception as e:
+            plan.append((file_path, None, str(e)))
+            continue
+        plan.append((file_path, sheet_names, None))
+        tasks.extend((file_path, sheet_name) for sheet_name in sheet_names)
+
+    results = _map_tasks(partial(_call_sheet_reader, reader), tasks, workers)
+    try:
+        for file_path, sheet_names, error in plan:
+            if error is not None:
+                yield file_path, None, error
+                continue
+            sheet_results = []
+            errors = []
+            timings[file_path] = 0.0
+            for sheet_name in sheet_names:
+                result, sheet_error, seconds = next(results)
+                timings[file_path] += seconds
+                if sheet_error is not None:
+                    errors.append(f"sheet '{sheet_name}': {sheet_error}")
+                else:
+                    sheet_results.append((sheet_name, result))
+            if errors:
+                # A workbook is only used when all of its selected sheets could be read
+                yield file_path, None, '; '.join(errors)
+            else:
+                yield file_path, sheet_results, None
+    finally:
+        results.close()
+
+
+def read_excel_files(reader, file_paths, workers=1, sheets=None, timings=None):
+    """
+    Read several Excel files, optionally in parallel.
+
+    With more than one worker the files are parsed in a process pool, but the
+    results are still yielded in the order of file_paths so the combined output
+    does not depend on which file finishes first. Errors are captured per file.
+
+    With a SheetSelection, the selected sheets of every file are read as
+    separate tasks (the reader is called as reader(file_path, sheet_name=name))
+    and each file's result is the list of its (sheet name, reader result)
+    pairs, in workbook order. A file that fails to read on any of its
+    selected sheets is reported as an error.
+
+    Args:
+        reader (callable): Module-level function taking a file path
+        file_paths (list): Files to read
+        workers (int): Number of worker processes (1 reads in this process)
+        sheets (SheetSelection): Sheets to read (default: the active sheet)
+        timings (dict): Receives the seconds the reader took on every file
+            (summed over its sheets; in the worker process when workers > 1)
+            by the time the file is yielded
+
+    Yields:
+        tuple: (file path, reader result or None, error message or None)
+    """
+    file_paths = list(file_paths)
+    if timings is None:
+        timings = {}
+
+    if sheets is not None:
+        yield from _read_sheets(reader, file_paths, workers, sheets, timings)
+        return
+
+    results = _map_tasks(partial(_call_reader, reader), file_paths, workers)
+    try:
+        for file_path, (result, error, seconds) in zip(file_paths, results):
+            timings[file_path] = seconds
+            yield file_path, result, error
+    finally:
+        results.close()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Folder Scanner
+
+Finds the Excel files to combine. The scan is built on os.scandir, so each
+directory is listed once and the stat information it returns is kept with
+every file (size and modification time) for the later stages, which then do
+not have to stat the files again. Subfolders can be scanned recursively, and
+files can be filtered by glob and regular expression patterns, size and
+modification time. Office lock files (~$name.xlsx) and hidden files are
+skipped.
+"""
+
+import os
+import re
+import fnmatch
+from collections import namedtuple
+from datetime import datetime
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# Prefix of the lock files Office creates next to open workbooks
+LOCK_FILE_PREFIX = '~$'
+
+# Outputs of earlier runs that are never combined again
+DEFAULT_EXCLUDE_FILES = ['combined_excel_files.xlsx', 'test_combined.xlsx',
+                         'updated_combined.xlsx', 'final_combined.xlsx',
+                         'final_updated_combined.xlsx', 'clean_test.xlsx']
+
+# A scanned Excel file with the stat information collected during the scan
+ScannedFile = namedtuple('ScannedFile', ['path', 'relative_path', 'size', 'mtime'])
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    """
+    Parse a file size such as '500', '64K', '10MB' or '1.5G'.
+
+    Returns:
+        int: Size in bytes
+
+    Raises:
+        ValueError: If the size cannot be parsed
+    """
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*([A-Za-z]*)\s*', text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_timestamp(text):
+    """
+    Parse an ISO date or date/time such as '2025-09-15' or '2025-09-15T08:30'.
+
+    Returns:
+        float: POSIX timestamp (local time)
+
+    Raises:
+        ValueError: If the date cannot be parsed
+    """
+    return datetime.fromisoformat(text.strip()).timestamp()
+
+
+def _matches_glob(pattern, relative_path, name):
+    # Patterns with a path separator are matched against the relative path,
+    # all others against the file name only
+    if '/' in pattern:
+        return fnmatch.fnmatch(relative_path, pattern)
+    return fnmatch.fnmatch(name, pattern)
+
+
+def scan_excel_files(folder_path, recursive=False, exclude_files=None, include=None, exclude=None,
+                     include_regex=None, exclude_regex=None, min_size=None, max_size=None,
+                     modified_after=None, modified_before=None, on_error=None):
+    """
+    Find the Excel files in a folder.
+
+    Glob patterns without a '/' are matched against the file name, patterns
+    with a '/' and regular expressions against the path relative to
+    folder_path (always with '/' separators). A file is kept if it matches any
+    include pattern (or there are none) and no exclude pattern.
+
+    Args:
+        folder_path (str): Folder to scan
+        recursive (bool): Also scan all subfolders
+        exclude_files (iterable): File names that are never included
+            (default: DEFAULT_EXCLUDE_FILES)
+        include (list): Glob patterns of files to include
+        exclude (list): Glob patterns of files to exclude
+        include_regex (list): Regular expressions of files to include
+        exclude_regex (list): Regular expressions of files to exclude
+        min_size (int): Minimum file size in bytes
+        max_size (int): Maximum file size in bytes
+        modified_after (float): Only files modified at or after this timestamp
+        modified_before (float): Only files modified before this timestamp
+        on_error (callable): Called with (path, OSError) for folders or files
+            that cannot be read; they are skipped either way
+
+    Returns:
+        list: ScannedFile entries sorted by path
+    """
+    if exclude_files is None:
+        exclude_files = DEFAULT_EXCLUDE_FILES
+    exclude_files = set(exclude_files)
+    include = list(include or [])
+    exclude = list(exclude or [])
+    include_regex = [re.compile(pattern) for pattern in include_regex or []]
+    exclude_regex = [re.compile(pattern) for pattern in exclude_regex or []]
+
+    scanned = []
+    pending_dirs = [(folder_path, '')]
+    while pending_dirs:
+        dir_path, relative_dir = pending_dirs.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                dir_entries = list(entries)
+        except OSError as e:
+            if on_error is not None:
+                on_error(dir_path, e)
+            continue
+
+        for entry in dir_entries:
+            name = entry.name
+            if name.startswith('.'):
+                continue
+            relative_path = relative_dir + name
+
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending_dirs.append((entry.path, relative_path + '/'))
+                    continue
+                if not name.lower().endswith(EXCEL_EXTENSIONS):
+                    continue
+                if name.startswith(LOCK_FILE_PREFIX) or name in exclude_files:
+                    continue
+                if include and not any(_matches_glob(p, relative_path, name) for p in include):
+                    continue
+                if any(_matches_glob(p, relative_path, name) for p in exclude):
+                    continue
+                if include_regex and not any(p.search(relative_path) for p in include_regex):
+                    continue
+                if any(p.search(relative_path) for p in exclude_regex):
+                    continue
+
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError as e:
+                if on_error is not None:
+                    on_error(entry.path, e)
+                continue
+
+            if min_size is not None and stat.st_size < min_size:
+                continue
+            if max_size is not None and stat.st_size > max_size:
+                continue
+            if modified_after is not None and stat.st_mtime < modified_after:
+                continue
+            if modified_before is not None and stat.st_mtime >= modified_before:
+                continue
+
+            scanned.append(ScannedFile(entry.path, relative_path, stat.st_size, stat.st_mtime))
+
+    # Sort files to ensure consistent order
+    scanned.sort(key=lambda scanned_file: scanned_file.path)
+    return scanned
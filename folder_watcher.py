@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Folder Watcher
+
+Watch mode for the Excel combiner. The watched folder is rescanned whenever
+it changes and at least every poll interval; on Linux inotify wakes the
+watcher as soon as a file is created, closed after writing, moved or
+deleted, elsewhere (and on network shares, where inotify does not see
+changes made by other machines) the poll interval alone drives the rescans.
+
+Files that are still being written are debounced: a file is only handed to
+the combine once its size and modification time have stayed the same for
+the settle time. Changes are also batched: once the inputs change, the
+combine waits until the folder has been quiet for the quiet time, so a burst
+of saves causes one rebuild rather than one per file (at most the maximum
+delay passes before a folder that never goes quiet is combined anyway). The
+watcher only keeps state for the files that are currently in the folder, so
+its memory use stays flat however long it runs.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# Seconds between two rescans when no change event arrives
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Seconds a file's size and modification time must stay unchanged
+DEFAULT_SETTLE_SECONDS = 3.0
+
+# Seconds the folder must stay unchanged before changed inputs are combined
+DEFAULT_QUIET_SECONDS = 10.0
+
+# Seconds after a change by which it is combined even if the folder never goes quiet
+DEFAULT_MAX_DELAY = 300.0
+
+# inotify event flags (see inotify(7))
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Writes in progress (IN_MODIFY) are left out: they would trigger a rescan
+# for every chunk of a copy, and the settle time covers them anyway
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatch:
+    """Change source that never reports events, so every rescan waits for the poll interval."""
+
+    kind = 'polling'
+
+    def wait(self, timeout):
+        """Sleep for timeout seconds; returns False (no change event)."""
+        time.sleep(max(timeout, 0))
+        return False
+
+    def close(self):
+        pass
+
+
+class InotifyWatch:
+    """Change source backed by Linux inotify, watching a folder (and its subfolders)."""
+
+    kind = 'inotify'
+
+    def __init__(self, folder_path, recursive=False):
+        """
+        Start watching a folder.
+
+        Raises:
+            OSError: If inotify is unavailable or the folder cannot be watched
+                (e.g. the per-user watch limit is reached)
+        """
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self._watches = {}
+        try:
+            self._add_tree(folder_path)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"Cannot watch {dir_path}: {os.strerror(error)}")
+        self._watches[wd] = dir_path
+
+    def _add_tree(self, dir_path):
+        """Watch a folder and, in recursive mode, all of its non-hidden subfolders."""
+        self._add_watch(dir_path)
+        if not self.recursive:
+            return
+        pending_dirs = [dir_path]
+        while pending_dirs:
+            try:
+                with os.scandir(pending_dirs.pop()) as entries:
+                    subdirs = [entry.path for entry in entries
+                               if not entry.name.startswith('.') and entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue
+            for subdir in subdirs:
+                try:
+                    self._add_watch(subdir)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        raise
+                    continue
+                pending_dirs.append(subdir)
+
+    def _read_events(self):
+        """Drain the pending events, following created and removed subfolders."""
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+                name_start = offset + _EVENT_HEADER.size
+                name = data[name_start:name_start + name_length].rstrip(b'\0')
+                offset = name_start + name_length
+
+                if mask & IN_IGNORED:
+                    # The folder was removed (or unmounted); forget its watch
+                    self._watches.pop(wd, None)
+                elif (self.recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and
+                        wd in self._watches and not name.startswith(b'.')):
+                    try:
+                        self._add_tree(os.path.join(self._watches[wd], os.fsdecode(name)))
+                    except OSError:
+                        # Out of watches; the poll interval still covers the folder
+                        pass
+
+    def wait(self, timeout):
+        """
+        Wait until the watched folders change or timeout seconds have passed.
+
+        Returns:
+            bool: True if a change event arrived
+        """
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not readable:
+            return False
+        self._read_events()
+        return True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+
+
+def create_watch(folder_path, recursive=False, use_inotify=True, log=print):
+    """
+    Create the change source for a watched folder.
+
+    inotify is used on Linux unless use_inotify is False; if it cannot be set
+    up the watcher falls back to polling.
+
+    Returns:
+        InotifyWatch or PollingWatch
+    """
+    if use_inotify and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatch(folder_path, recursive)
+        except (OSError, AttributeError) as e:
+            log(f"Warning: inotify is not available ({e}); polling instead")
+    return PollingWatch()
+
+
+class StableFileTracker:
+    """Debounces files that are still being written."""
+
+    def __init__(self, settle_seconds=DEFAULT_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        # {path: (size, mtime, time since which size and mtime are unchanged)}
+        self._seen = {}
+
+    def update(self, scanned_files, now=None):
+        """
+        Record a scan of the folder.
+
+        Files that are no longer in the scan are forgotten.
+
+        Args:
+            scanned_files (list): folder_scanner.ScannedFile entries of the scan
+            now (float): time.monotonic() of the scan (default: now)
+
+        Returns:
+            tuple: (stable files, files still settling), both lists of ScannedFile
+        """
+        if now is None:
+            now = time.monotonic()
+        seen = {}
+        stable = []
+        settling = []
+        for scanned_file in scanned_files:
+            previous = self._seen.get(scanned_file.path)
+            if previous is not None and previous[:2] == (scanned_file.size, scanned_file.mtime):
+                since = previous[2]
+            else:
+                since = now
+            seen[scanned_file.path] = (scanned_file.size, scanned_file.mtime, since)
+            if now - since >= self.settle_seconds:
+                stable.append(scanned_file)
+            else:
+                settling.append(scanned_file)
+        self._seen = seen
+        return stable, settling
+
+    def next_settle_time(self):
+        """Return the time.monotonic() at which the next settling file becomes stable, or None."""
+        pending = [since + self.settle_seconds for _, _, since in self._seen.values()
+                   if time.monotonic() - since < self.settle_seconds]
+        return min(pending) if pending else None
+
+
+def watch_folder(folder_path, scan, on_change, recursive=False, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, use_inotify=True, log=print, stop_event=None,
+                 quiet_seconds=DEFAULT_QUIET_SECONDS, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Call on_change with the stable files of a folder whenever they change.
+
+    on_change is called once at startup (after the settle time) and then
+    every time files arrive, are replaced or are removed. Later calls wait
+    until no file has changed for quiet_seconds and no file is settling, so
+    a burst of changes leads to a single call; after max_delay seconds of
+    changes the call is made anyway. While a file that was part of the last
+    call is being rewritten, calls wait until it has settled, so its rows
+    never disappear from the output in between. Runs until stop_event is set
+    or KeyboardInterrupt is raised.
+
+    Args:
+        folder_path (str): Watched folder
+        scan (callable): Returns the folder's folder_scanner.ScannedFile list
+        on_change (callable): Called with the sorted list of stable ScannedFile entries
+        recursive (bool): Also watch all subfolders for change events
+        poll_interval (float): Maximum seconds between two scans
+        settle_seconds (float): Seconds a file must stay unchanged before it is used
+        use_inotify (bool): Use inotify change events where available
+        log (callable): Called with each status message
+        stop_event (threading.Event): When set, the watcher stops after the current scan
+        quiet_seconds (float): Seconds without any change before changed inputs are passed on
+        max_delay (float): Seconds after which a pending change is passed on even
+            if the folder has not gone quiet
+    """
+    tracker = StableFileTracker(settle_seconds)
+    watch = create_watch(folder_path, recursive, use_inotify, log)
+    log(f"Watching {folder_path} ({watch.kind}, settle {settle_seconds:g}s, quiet {quiet_seconds:g}s, "
+        f"poll {poll_interval:g}s); press Ctrl+C to stop")
+
+    last_signature = None
+    last_paths = set()
+    # State of the folder at the last scan, when it last changed, and since when a change is pending
+    last_state = None
+    last_change = None
+    pending_since = None
+    try:
+        while stop_event is None or not stop_event.is_set():
+            stable, settling = tracker.update(scan())
+            now = time.monotonic()
+            signature = {(f.path, f.size, f.mtime) for f in stable}
+            rewritten = any(f.path in last_paths for f in settling)
+
+            state = (signature, {(f.path, f.size, f.mtime) for f in settling})
+            if state != last_state:
+                last_state = state
+                last_change = now
+
+            if signature != last_signature and not rewritten and (stable or last_signature):
+                if pending_since is None:
+                    pending_since = now
+                # The first combine does not wait for the folder to go quiet
+                quiet = last_signature is None or (not settling and now - last_change >= quiet_seconds)
+                if quiet or now - pending_since >= max_delay:
+                    on_change(stable)
+                    last_signature = signature
+                    last_paths = {f.path for f in stable}
+                    pending_since = None
+            else:
+                pending_since = None
+
+            timeout = poll_interval
+            next_settle = tracker.next_settle_time()
+            if next_settle is not None:
+                timeout = min(timeout, next_settle - time.monotonic())
+            if pending_since is not None:
+                # Settling files are covered by their settle time
+                quiet_until = last_change + quiet_seconds
+                if quiet_until > time.monotonic():
+                    timeout = min(timeout, quiet_until - time.monotonic())
+                timeout = min(timeout, pending_since + max_delay - time.monotonic())
+            watch.wait(timeout)
+    finally:
+        watch.close()
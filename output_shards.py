@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Output Shards
+
+Splitting of combined output that does not fit on one Excel worksheet. A
+worksheet holds at most 1,048,576 rows, header included; a larger output is
+split into shards of at most a configurable number of data rows, written
+either as numbered sheets of one workbook or as numbered files next to the
+output (combined_001.xlsx, combined_002.xlsx, ...). Every shard repeats the
+header row.
+
+Shards are planned from the row count of every source file's group before
+anything is written, so a run never fails on the row limit after all the
+reading work is done. Groups are packed whole into shards where they fit;
+only a group larger than a whole shard is split across shards.
+"""
+
+import os
+import re
+
+# Rows of an Excel worksheet, header row included
+EXCEL_MAX_ROWS = 1048576
+
+# Data rows per shard by default: as many as fit next to the header row
+DEFAULT_SHARD_ROWS = EXCEL_MAX_ROWS - 1
+
+# Where shards go: numbered sheets of one workbook, or numbered files
+SHARD_MODES = ('sheets', 'files')
+DEFAULT_SHARD_MODE = 'sheets'
+
+# Digits of the shard number in shard file names
+SHARD_NUMBER_DIGITS = 3
+
+
+def source_group_rows(block_sources):
+    """
+    Merge the row counts of consecutive blocks from the same source file.
+
+    Args:
+        block_sources (iterable): (source filename, rows) of every block, in output order
+
+    Returns:
+        list: Rows of every source file's group, in output order
+    """
+    group_rows = []
+    previous_source = None
+    for source, rows in block_sources:
+        if group_rows and source == previous_source:
+            group_rows[-1] += rows
+        else:
+            group_rows.append(rows)
+        previous_source = source
+    return group_rows
+
+
+def plan_shards(group_rows, shard_rows=DEFAULT_SHARD_ROWS):
+    """
+    Split the combined rows into shards of at most shard_rows data rows.
+
+    A group that does not fit into the rest of the current shard starts a
+    new one, and a group larger than a whole shard is split at shard_rows.
+
+    Args:
+        group_rows (list): Rows of every source file's group, in output order
+        shard_rows (int): Maximum data rows per shard (1 to DEFAULT_SHARD_ROWS)
+
+    Returns:
+        list: (start, stop) data row range of every shard; a single shard
+            when everything fits
+
+    Raises:
+        ValueError: If shard_rows is not between 1 and DEFAULT_SHARD_ROWS
+    """
+    if not 1 <= shard_rows <= DEFAULT_SHARD_ROWS:
+        raise ValueError(f"Shard rows must be between 1 and {DEFAULT_SHARD_ROWS}")
+
+    shards = []
+    start = 0
+    position = 0
+    for rows in group_rows:
+        if position > start and position - start + rows > shard_rows:
+            shards.append((start, position))
+            start = position
+        position += rows
+        while position - start > shard_rows:
+            shards.append((start, start + shard_rows))
+            start += shard_rows
+    if position > start or not shards:
+        shards.append((start, position))
+    return shards
+
+
+def shard_sheet_title(base_title, index, count):
+    """Get the sheet title of shard index (0-based) of count; a single shard keeps base_title."""
+    if count == 1:
+        return base_title
+    return f"{base_title}_{index + 1}"
+
+
+def shard_path(output_path, index):
+    """Get the path of shard file index (0-based), e.g. combined.xlsx -> combined_001.xlsx."""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_{index + 1:0{SHARD_NUMBER_DIGITS}d}{ext}"
+
+
+def shard_file_regex(output_filename):
+    """
+    Get a regular expression matching the shard files of an output file name.
+
+    Only names exactly like shard_path() makes them match (combined_001.xlsx,
+    not combined_2024_final.xlsx), in any folder of a scan.
+
+    Returns:
+        str: Pattern for re.search() on a path relative to the scanned folder
+    """
+    stem, ext = os.path.splitext(os.path.basename(output_filename))
+    return f"(?:^|/){re.escape(stem)}_[0-9]{{{SHARD_NUMBER_DIGITS}}}{re.escape(ext)}$"
+
+
+def format_shard_plan(shards, shard_mode, shard_rows):
+    """Describe a split of the output for the log."""
+    total_rows = shards[-1][1]
+    return (f"Output has {total_rows} rows, more than {shard_rows} per sheet; "
+            f"splitting it into {len(shards)} {shard_mode} (source files are kept together where they fit)")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Parse Cache
+
+Persistent on-disk cache of per-file parse results. Entries are keyed by the
+SHA-256 of the input's content plus the name and version of the reader that
+produced them, so renamed or copied inputs still hit the cache and a reader
+change never serves stale results.
+
+Each entry is a block of the block store (see block_store): the DataFrames
+in Feather format and a JSON file with the rest of the reader result (e.g.
+the row formats). The cache folder may be shared, so nothing read from it is
+ever unpickled. The cache is kept under a configurable size cap by evicting
+the least recently used entries.
+"""
+
+import os
+import shutil
+import hashlib
+
+from block_store import save_block, load_block, HAS_PYARROW
+from combine_manifest import file_sha256
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+
+def default_cache_dir():
+    """Return the platform's per-user cache directory for the Excel combiner."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'ExcelCombiner', 'Cache')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'excel_combiner')
+
+
+class ParseCache:
+    """Size-bounded, least-recently-used cache of parsed Excel files."""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str): Cache directory (default: default_cache_dir())
+            max_bytes (int): Size cap enforced by evict()
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(file_path, reader_name, reader_version, sheet_name=None):
+        """Build the cache key of a file (or one of its sheets) for a given reader."""
+        key = f"{reader_name}-v{reader_version}-{file_sha256(file_path)}"
+        if sheet_name is not None:
+            # Sheet names may contain characters that are not valid in file names
+            key += '-' + hashlib.sha256(sheet_name.encode('utf-8')).hexdigest()[:16]
+        return key
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, file_path):
+        """
+        Load a cached entry and mark it as recently used.
+
+        Args:
+            key (str): Cache key from make_key()
+            file_path (str): Input file the entry belongs to
+
+        Returns:
+            The cached reader result, or None on a cache miss (including
+            entries that cannot be loaded)
+        """
+        entry_path = self._entry_path(key)
+        try:
+            result = load_block(entry_path, file_path)
+            # Touch the entry so the LRU eviction keeps it
+            os.utime(entry_path)
+            return result
+        except Exception:
+            return None
+
+    def put(self, key, result):
+        """
+        Store an entry. The block is written to a temporary directory that is
+        renamed into place, so concurrent readers never see a partial entry.
+
+        Raises:
+            TypeError: If the result holds values the block store cannot store
+            OSError: If the entry cannot be written
+        """
+        save_block(self._entry_path(key), result)
+
+    def _entries(self):
+        """Return (last used time, size in bytes, path) of every cache entry."""
+        entries = []
+        try:
+            dir_entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entries
+        for entry in dir_entries:
+            if not entry.is_dir() or entry.name.startswith('.tmp-'):
+                continue
+            size = 0
+            for item in os.scandir(entry.path):
+                try:
+                    size += item.stat().st_size
+                except OSError:
+                    pass
+            entries.append((entry.stat().st_mtime, size, entry.path))
+        return entries
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits its size cap.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def info(self):
+        """Return a dict describing the cache's location, entry count and size."""
+        entries = self._entries()
+        return {
+            'path': self.cache_dir,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'storage': 'feather' if HAS_PYARROW else 'json',
+        }
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = self._entries()
+        for _, _, path in entries:
+            shutil.rmtree(path, ignore_errors=True)
+        return len(entries)
+
+
+class CachedReader:
+    """
+    Reader wrapper that serves parse results from a ParseCache.
+
+    Instances are picklable (as long as the wrapped reader is a module-level
+    function), so they can be handed to excel_reader.read_excel_files() and
+    used inside its process pool.
+    """
+
+    def __init__(self, reader, reader_name, reader_version, cache):
+        """
+        Args:
+            reader (callable): Module-level reader taking a file path (and a
+                sheet_name keyword when sheets are selected)
+            reader_name (str): Name of the reader, part of the cache key
+            reader_version (int): Version of the reader's output, part of the cache key
+            cache (ParseCache): Cache to use
+        """
+        self.reader = reader
+        self.reader_name = reader_name
+        self.reader_version = reader_version
+        self.cache = cache
+
+    def __call__(self, file_path, sheet_name=None):
+        key = self.cache.make_key(file_path, self.reader_name, self.reader_version, sheet_name)
+
+        cached = self.cache.get(key, file_path)
+        if cached is not None:
+            return cached
+
+        if sheet_name is None:
+            result = self.reader(file_path)
+        else:
+            result = self.reader(file_path, sheet_name=sheet_name)
+        try:
+            self.cache.put(key, result)
+        except Exception:
+            # A cache that cannot be written must never fail the read itself
+            pass
+        return result
+
+
+def format_cache_info(info):
+    """Format the result of ParseCache.info() for display."""
+    return (f"Parse cache: {info['path']}\n"
+            f"  Entries: {info['entries']}\n"
+            f"  Size: {info['bytes'] / (1024 * 1024):.1f} MB of "
+            f"{info['max_bytes'] / (1024 * 1024):.0f} MB\n"
+            f"  Storage: {info['storage']}")
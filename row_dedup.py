@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Row Deduplication
+
+Exact deduplication of combined rows across input files. Each row's key
+columns (Filename and Transcription by default) are hashed into a 128-bit
+digest as the rows stream through, and a row is dropped when its digest has
+been seen before. Keeping the first occurrence filters every block as soon
+as it has been read, so only the set of digests grows with the input.
+Keeping the last occurrence is the same filter run over the rows in reverse
+order, which needs every block to have been read first.
+
+The digests of the rows seen so far are held in a set until it reaches a
+size limit; then they are spilled to an SQLite file in a temporary folder,
+so memory stays bounded however many rows are combined. Rows are looked up
+in batches, so a spilled run costs one indexed query per few hundred rows
+rather than per row, and the key values of no more than one batch are
+converted to Python objects at a time.
+"""
+
+import os
+import math
+import shutil
+import sqlite3
+import hashlib
+import datetime
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from combine_options import DEDUP_KEY_COLUMNS, DEFAULT_DEDUP_COLUMNS, DEDUP_KEEP_POLICIES, DEFAULT_DEDUP_KEEP  # noqa: F401
+
+# Digests held in memory before they are spilled to disk (about 80 MB)
+DEFAULT_MAX_MEMORY_KEYS = 1000000
+
+# Digests looked up in the spill file per query (below SQLite's parameter limit)
+SPILL_QUERY_SIZE = 500
+
+# SQLite page cache of the spill file, in KiB
+SPILL_CACHE_KIB = 16384
+
+# Rows hashed and looked up per batch
+DEDUP_BATCH_ROWS = 10000
+
+
+def _normalize(value):
+    """Convert a cell value to a canonical form, so equal values hash alike whichever reader produced them."""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        if isinstance(value, np.datetime64):
+            value = pd.Timestamp(value)
+        elif isinstance(value, np.timedelta64):
+            value = pd.Timedelta(value)
+        else:
+            value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str):
+        return value or None
+    if isinstance(value, int):
+        # bool too: like DataFrame.duplicated(), True matches 1
+        return int(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, datetime.datetime):
+        # pandas.Timestamp and datetime.datetime of the same moment
+        return ('datetime', pd.Timestamp(value).isoformat())
+    if isinstance(value, datetime.date):
+        return ('date', value.isoformat())
+    if isinstance(value, datetime.timedelta):
+        return ('timedelta', pd.Timedelta(value).value)
+    if isinstance(value, datetime.time):
+        return ('time', value.isoformat())
+    return value
+
+
+def row_key_digest(values):
+    """
+    Hash the key values of one row.
+
+    Values are normalized first, so a row read through pandas matches the
+    same row read by either formatting reader: empty cells (None, '', NaN,
+    NaT) hash alike, integral floats and numpy scalars hash like the Python
+    numbers they equal, and pandas.Timestamp, datetime.datetime and
+    numpy.datetime64 values of the same moment hash alike (as do timedeltas).
+    Other values are compared by their exact repr().
+
+    Returns:
+        bytes: 16-byte BLAKE2b digest
+    """
+    # Non-empty strings (most key values) need no normalization
+    key = repr(tuple([value if value.__class__ is str and value else _normalize(value) for value in values]))
+    return hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class RowDeduplicator:
+    """The set of row keys seen so far, spilled to disk past a size limit."""
+
+    def __init__(self, max_memory_keys=DEFAULT_MAX_MEMORY_KEYS, spill_dir=None):
+        """
+        Args:
+            max_memory_keys (int): Digests kept in memory before they are spilled
+            spill_dir (str): Folder for the spill file (default: the system temp folder)
+        """
+        self.max_memory_keys = max(1, max_memory_keys)
+        self.spill_dir = spill_dir
+        self.spilled_keys = 0
+        self._memory = set()
+        self._spill_path = None
+        self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _spill(self):
+        """Move the in-memory digests to the spill file."""
+        if self._db is None:
+            self._spill_path = tempfile.mkdtemp(prefix='excel-combiner-dedup-', dir=self.spill_dir)
+            self._db = sqlite3.connect(os.path.join(self._spill_path, 'keys.sqlite'))
+            self._db.execute('PRAGMA journal_mode = OFF')
+            self._db.execute('PRAGMA synchronous = OFF')
+            self._db.execute(f'PRAGMA cache_size = -{SPILL_CACHE_KIB}')
+            self._db.execute('CREATE TABLE keys (digest BLOB PRIMARY KEY) WITHOUT ROWID')
+        # Sorted inserts walk the index in order instead of jumping around it
+        self._db.executemany('INSERT OR IGNORE INTO keys VALUES (?)', ((digest,) for digest in sorted(self._memory)))
+        self._db.commit()
+        self.spilled_keys += len(self._memory)
+        self._memory = set()
+
+    def _spilled(self, digests):
+        """Get the digests that are already in the spill file."""
+        found = set()
+        for start in range(0, len(digests), SPILL_QUERY_SIZE):
+            batch = digests[start:start + SPILL_QUERY_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            found.update(row[0] for row in self._db.execute(
+                f'SELECT digest FROM keys WHERE digest IN ({placeholders})', batch))
+        return found
+
+    def filter(self, key_rows):
+        """
+        Record a batch of rows and tell which of them are new.
+
+        Args:
+            key_rows (iterable): Key values of every row, in order
+
+        Returns:
+            list: True for every row whose key was not seen before (including
+                earlier rows of the same batch), False for duplicates
+        """
+        digests = [row_key_digest(values) for values in key_rows]
+        spilled = set()
+        if self._db is not None:
+            spilled = self._spilled([digest for digest in digests if digest not in self._memory])
+
+        keep = []
+        for digest in digests:
+            if digest in self._memory or digest in spilled:
+                keep.append(False)
+            else:
+                self._memory.add(digest)
+                keep.append(True)
+
+        # Only spill between batches, so the batch's own digests stay visible above
+        if len(self._memory) >= self.max_memory_keys:
+            self._spill()
+        return keep
+
+    def close(self):
+        """Remove the spill file."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._spill_path is not None:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+        self._memory = set()
+
+
+def block_key_rows(block, key_columns, start=0, stop=None):
+    """Get the key values of the rows [start, stop) of a block (a pyarrow.Table or pandas.DataFrame)."""
+    if stop is None:
+        stop = len(block)
+    if isinstance(block, pd.DataFrame):
+        rows = block.iloc[start:stop]
+        return list(zip(*(rows[name].tolist() for name in key_columns)))
+    rows = block.slice(start, stop - start)
+    return list(zip(*(rows.column(name).to_pylist() for name in key_columns)))
+
+
+def block_keep_mask(block, key_columns, deduplicator, reverse=False):
+    """
+    Filter the rows of one block through a deduplicator.
+
+    The rows are looked up DEDUP_BATCH_ROWS at a time, so only one batch of
+    key values is held as Python objects.
+
+    Args:
+        block (pyarrow.Table or pandas.DataFrame): Block of combined rows
+        key_columns (list): Names of the key columns
+        deduplicator (RowDeduplicator): Keys seen so far
+        reverse (bool): Feed the rows to the deduplicator last row first
+
+    Returns:
+        numpy.ndarray: One keep flag (bool) per row of the block
+    """
+    mask = np.empty(len(block), dtype=bool)
+    starts = range(0, len(block), DEDUP_BATCH_ROWS)
+    for start in (reversed(starts) if reverse else starts):
+        stop = min(start + DEDUP_BATCH_ROWS, len(block))
+        key_rows = block_key_rows(block, key_columns, start, stop)
+        if reverse:
+            key_rows.reverse()
+            mask[start:stop] = deduplicator.filter(key_rows)[::-1]
+        else:
+            mask[start:stop] = deduplicator.filter(key_rows)
+    return mask
+
+
+def deduplicate_blocks(blocks, key_columns, deduplicator, keep=DEFAULT_DEDUP_KEEP):
+    """
+    Decide which rows of a sequence of blocks survive deduplication.
+
+    With keep='last' the blocks and their rows are fed to the deduplicator
+    in reverse order, so the last occurrence of every key is the one seen
+    first. That is why keeping the last occurrence needs every block to have
+    been read; with keep='first', block_keep_mask() can filter each block
+    as soon as it is read instead.
+
+    Args:
+        blocks (list): pyarrow.Table or pandas.DataFrame blocks, in output order
+        key_columns (list): Names of the key columns
+        deduplicator (RowDeduplicator): Keys seen so far
+        keep (str): 'first' or 'last' (see DEDUP_KEEP_POLICIES)
+
+    Returns:
+        list: One keep mask (numpy bool array) per block
+    """
+    masks = [None] * len(blocks)
+    reverse = keep == 'last'
+    order = reversed(range(len(blocks))) if reverse else range(len(blocks))
+    for block_index in order:
+        masks[block_index] = block_keep_mask(blocks[block_index], key_columns, deduplicator, reverse)
+    return masks
+
+
+def filter_frame(df, keep, markers):
+    """
+    Drop rows of a DataFrame block, moving its markers to the first remaining row.
+
+    Args:
+        df (pandas.DataFrame): Block of combined rows
+        keep (numpy.ndarray): Keep mask, one bool per row
+        markers (dict): {marker column (e.g. Source_File): value on the block's first row}
+
+    Returns:
+        pandas.DataFrame: The remaining rows
+    """
+    df = df[keep].copy()
+    for column, value in markers.items():
+        df[column] = ''
+        if len(df):
+            df.iloc[0, df.columns.get_loc(column)] = value
+    return df
+
+
+def format_dropped_rows(dropped_rows):
+    """
+    Describe the rows a deduplication dropped.
+
+    Args:
+        dropped_rows (dict): {source file: number of rows dropped from it}
+
+    Returns:
+        str: Multi-line description
+    """
+    total = sum(dropped_rows.values())
+    lines = [f"Removed {total} duplicate row(s)"]
+    for source, count in dropped_rows.items():
+        if count:
+            lines.append(f"  {source}: {count}")
+    return '\n'.join(lines)
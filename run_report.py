@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Run Report
+
+Instrumentation of a combine run. The combine marks where each of its
+stages (folder scan, reading, deduplication, concatenation, format
+extraction, the cell write loop and the save) begins, and the report times
+them with a monotonic clock. Per-file counters (bytes, rows, formatted rows,
+read seconds) and run-wide counters are recorded next to the stage times,
+and the whole report is saved as JSON.
+
+Two kinds of instrumentation are optional because they slow the run down:
+tracemalloc records the peak Python memory of every stage, and cProfile
+records the hot paths (the functions with the most own time), which can
+also be dumped for pstats or snakeviz. Both only see the main process; the
+time spent in worker processes shows up as the per-file read seconds.
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import platform
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+# Bump whenever the layout of the JSON report changes
+REPORT_VERSION = 1
+
+# Functions listed under hot_paths, by own time
+HOT_PATH_COUNT = 25
+
+
+class RunReport:
+    """Stage timings, memory peaks and counters of one combine run."""
+
+    def __init__(self, trace_memory=False, profile=False):
+        """
+        Args:
+            trace_memory (bool): Record the peak traced memory of every stage
+                with tracemalloc (roughly doubles the cost of allocations)
+            profile (bool): Profile the run with cProfile and list its hot paths
+        """
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.started_at = None
+        self.total_seconds = None
+        self.peak_memory_bytes = None
+        # {stage: {'seconds': ..., 'calls': ..., 'peak_memory_bytes': ...}}, in order of first use
+        self.stages = {}
+        self.files = []
+        self.counters = {}
+        self._run_start = None
+        self._stage = None
+        self._stage_start = None
+        self._started_tracing = False
+        self._profiler = None
+
+    def start(self):
+        """Start the run clock (and memory tracing and profiling, if enabled)."""
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._run_start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def begin(self, stage):
+        """
+        End the current stage, if any, and start timing the next one.
+
+        Stages do not nest. A stage that is entered several times (e.g. one
+        write per output format) accumulates its time.
+        """
+        self.end()
+        if self._run_start is None:
+            self.start()
+        self._stage = stage
+        self.stages.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._stage_start = time.perf_counter()
+
+    def end(self):
+        """End the current stage."""
+        if self._stage is None:
+            return
+        stage = self.stages[self._stage]
+        stage['seconds'] += time.perf_counter() - self._stage_start
+        stage['calls'] += 1
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            stage['peak_memory_bytes'] = max(stage.get('peak_memory_bytes', 0), peak)
+            self.peak_memory_bytes = max(self.peak_memory_bytes or 0, peak)
+        self._stage = None
+
+    @property
+    def current_stage(self):
+        """Name of the stage being timed, or None."""
+        return self._stage
+
+    @contextmanager
+    def stage(self, stage):
+        """Time a block of code as a stage."""
+        self.begin(stage)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def add_file(self, file_path, **counters):
+        """
+        Record the counters of one input file.
+
+        Args:
+            file_path (str): Path of the input file
+            **counters: e.g. bytes, rows, formatted_rows, read_seconds, error
+
+        Returns:
+            dict: The file's entry, for counters that are only known later
+        """
+        entry = {'path': file_path}
+        entry.update(counters)
+        self.files.append(entry)
+        return entry
+
+    def count(self, **counters):
+        """Set run-wide counters (e.g. rows=..., highlighted_rows=...)."""
+        self.counters.update(counters)
+
+    def finish(self):
+        """Stop the run clock, memory tracing and profiling."""
+        self.end()
+        if self._run_start is not None and self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._run_start
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def hot_paths(self, count=HOT_PATH_COUNT):
+        """
+        List the functions with the most own time in the profile.
+
+        Returns:
+            list: {'function', 'calls', 'own_seconds', 'cumulative_seconds'}
+                dicts, empty without profiling
+        """
+        if self._profiler is None:
+            return []
+        stats = pstats.Stats(self._profiler).stats
+        entries = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:count]
+        return [{
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'own_seconds': round(own_time, 6),
+            'cumulative_seconds': round(cumulative_time, 6),
+        } for (filename, line, function), (_, calls, own_time, cumulative_time, _) in entries]
+
+    def save_profile(self, path):
+        """Dump the cProfile statistics for pstats (no-op without profiling)."""
+        if self._profiler is not None:
+            self._profiler.dump_stats(path)
+
+    def to_dict(self):
+        """Get the report as a JSON-serializable dict."""
+        total_seconds = self.total_seconds
+        if total_seconds is None and self._run_start is not None:
+            total_seconds = time.perf_counter() - self._run_start
+
+        stages = []
+        for name, stage in self.stages.items():
+            entry = {'stage': name, 'seconds': round(stage['seconds'], 6), 'calls': stage['calls']}
+            if total_seconds:
+                entry['share'] = round(stage['seconds'] / total_seconds, 4)
+            if 'peak_memory_bytes' in stage:
+                entry['peak_memory_bytes'] = stage['peak_memory_bytes']
+            stages.append(entry)
+
+        return {
+            'version': REPORT_VERSION,
+            'started_at': self.started_at,
+            'total_seconds': round(total_seconds, 6) if total_seconds is not None else None,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'memory_traced': self.trace_memory,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'stages': stages,
+            'counters': self.counters,
+            'files': self.files,
+            'hot_paths': self.hot_paths(),
+        }
+
+    def save(self, path):
+        """Write the report as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def summary(self):
+        """Describe the stage times (and memory peaks) in one line."""
+        total_seconds = self.total_seconds or sum(stage['seconds'] for stage in self.stages.values())
+        parts = []
+        for name, stage in self.stages.items():
+            part = f"{name} {stage['seconds']:.2f}s"
+            if total_seconds:
+                part += f" ({stage['seconds'] / total_seconds * 100:.0f}%)"
+            if 'peak_memory_bytes' in stage:
+                part += f", peak {stage['peak_memory_bytes'] / (1024 * 1024):.1f} MB"
+            parts.append(part)
+        return f"Run report: {total_seconds:.2f}s total; " + '; '.join(parts)
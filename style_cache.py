@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Style Cache
+
+Interns the cell styles used on the combiner's output path. Every distinct
+(fill color, bold, italic, base font) combination is built and registered
+with the output workbook once; all later cells with the same combination
+reuse the already-registered style instead of creating new PatternFill/Font
+objects that openpyxl would have to hash and deduplicate one at a time.
+"""
+
+from copy import copy
+from openpyxl.styles import PatternFill, Font
+
+DEFAULT_BASE_FONT = ('Calibri', 11)
+
+
+class StyleCache:
+    """Cache of registered cell styles for a single output workbook."""
+
+    def __init__(self):
+        self._styles = {}
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, cell, fill_color=None, bold=False, italic=False, base_font=DEFAULT_BASE_FONT):
+        """
+        Apply a fill and/or font to a cell, reusing a cached style when possible.
+
+        Args:
+            cell: openpyxl Cell or WriteOnlyCell of the workbook this cache belongs to
+            fill_color (str): 6-digit hex fill color, or None for no fill
+            bold (bool): Bold font
+            italic (bool): Italic font
+            base_font (tuple): (font name, font size) of the font
+
+        Raises:
+            ValueError: If fill_color is not a valid color
+        """
+        key = (fill_color, bool(bold), bool(italic), base_font)
+        style = self._styles.get(key)
+        if style is not None:
+            self.hits += 1
+            cell._style = copy(style)
+            return
+
+        self.misses += 1
+        if fill_color is not None:
+            cell.fill = PatternFill(start_color=fill_color,
+                                    end_color=fill_color,
+                                    fill_type='solid')
+        if bold or italic:
+            cell.font = Font(name=base_font[0], size=base_font[1],
+                             bold=bold, italic=italic)
+        self._styles[key] = copy(cell._style)
+
+    def merge(self, other):
+        """
+        Add the statistics of another cache (e.g. of another output file).
+
+        The merged styles belong to the other workbook, so the cache is only
+        used for its statistics afterwards.
+        """
+        self.hits += other.hits
+        self.misses += other.misses
+        for key, style in other._styles.items():
+            self._styles.setdefault(key, style)
+
+    def summary(self):
+        """Return a one-line description of the cache statistics."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return (f"Style cache: {len(self._styles)} distinct style(s), "
+                f"{self.hits:,} hit(s), {self.misses:,} build(s) "
+                f"({hit_rate:.1f}% hit rate)")
@@ -10,6 +10,18 @@ import pandas as pd
 from openpyxl import load_workbook, Workbook
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils.dataframe import dataframe_to_rows
+import datetime
+import numpy as np
+import pytest
+
+import combine_manifest
+from combine_manifest import InputManifest, FileStat
+from parse_cache import ParseCache, CachedReader
+import excel_reader
+import xlsx_reader
+from row_dedup import RowDeduplicator, deduplicate_blocks
+from output_shards import plan_shards, shard_file_regex, DEFAULT_SHARD_ROWS
+from folder_scanner import scan_excel_files
 
 def read_excel_data_with_formatting(file_path):
     """Read Excel file and return data with formatting information."""
@@ -243,6 +255,178 @@ def combine_excel_files_with_formatting(folder_path, output_filename):
         traceback.print_exc()
         return False
 
+def test_manifest_invalidation(tmp_path):
+    """Modified, added and removed inputs are read again or dropped; unchanged ones are reused."""
+    output_path = str(tmp_path / 'combined.xlsx')
+    paths = [str(tmp_path / f'{name}.csv') for name in 'abcd']
+    for path in paths[:3]:
+        with open(path, 'w') as f:
+            f.write(f"Filename,Transcription\n{os.path.basename(path)},text\n")
+
+    def run(file_paths):
+        manifest = InputManifest(output_path, 'csv')
+        results = {path: result for path, result, error in manifest.read_files(pd.read_csv, file_paths)}
+        return manifest, results
+
+    manifest, _ = run(paths[:3])
+    assert (manifest.reused, manifest.read, manifest.dropped) == (0, 3, 0)
+
+    manifest, results = run(paths[:3])
+    assert (manifest.reused, manifest.read, manifest.dropped) == (3, 0, 0)
+    pd.testing.assert_frame_equal(results[paths[2]], pd.read_csv(paths[2]))
+
+    # Modify a, remove b, add d
+    with open(paths[0], 'a') as f:
+        f.write("a2.csv,more text\n")
+    with open(paths[3], 'w') as f:
+        f.write("Filename,Transcription\nd.csv,text\n")
+    manifest, results = run([paths[0], paths[2], paths[3]])
+    assert (manifest.reused, manifest.read, manifest.dropped) == (1, 2, 2)
+    assert len(results[paths[0]]) == 2
+    # The blocks of the removed file and of a's old content are deleted
+    assert len(os.listdir(manifest.blocks_dir)) == 3
+
+
+def test_manifest_skips_inputs_it_cannot_record(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.csv')
+    with open(path, 'w') as f:
+        f.write("Filename,Transcription\na.wav,text\n")
+    stat_before_read = FileStat(os.path.getsize(path), os.path.getmtime(path))
+    manifest = InputManifest(str(tmp_path / 'combined.xlsx'), 'csv')
+
+    # Changed between the read and the hash: the hash would not match the block
+    with open(path, 'a') as f:
+        f.write("b.wav,more text\n")
+    assert manifest.store(path, pd.read_csv(path), stat_before_read) is not None
+    assert manifest.entries == {}
+
+    # A block that cannot be written does not abort the combine
+    def save_block(block_dir, result):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(combine_manifest, 'save_block', save_block)
+    logged = []
+    results = list(manifest.read_files(pd.read_csv, [path], log=logged.append))
+    assert results[0][2] is None and len(results[0][1]) == 2
+    assert manifest.entries == {}
+    assert 'No space left on device' in logged[0]
+
+
+def test_parse_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'input.csv')
+    with open(path, 'w') as f:
+        f.write("Filename,Transcription\na.wav,hello\nb.wav,\n")
+    cache = ParseCache(str(tmp_path / 'cache'))
+    reader = CachedReader(pd.read_csv, 'csv', 1, cache)
+
+    fresh = reader(path)
+    assert cache.info()['entries'] == 1
+    pd.testing.assert_frame_equal(reader(path), fresh)
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    df = pd.DataFrame({'Filename': ['a.wav', 'b.wav']})
+    for age, key in enumerate(['oldest', 'middle', 'newest']):
+        cache.put(key, df)
+        os.utime(os.path.join(cache.cache_dir, key), (1000000000 + age, 1000000000 + age))
+
+    # Reading an entry makes it the most recently used one
+    assert cache.get('oldest', 'input.xlsx') is not None
+    cache.max_bytes = cache.info()['bytes'] // 3
+    assert cache.evict() == 2
+    assert cache.get('middle', 'input.xlsx') is None and cache.get('newest', 'input.xlsx') is None
+    pd.testing.assert_frame_equal(cache.get('oldest', 'input.xlsx'), df)
+
+
+def test_parse_cache_never_unpickles(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    # Mixed-type columns cannot be stored in Feather and go to the JSON file
+    df = pd.DataFrame({'Filename': ['a.wav', 'b.wav'], 'Status': [1, 'ok']})
+    result = (df, 'input.xlsx', {2: {1: {'fill_color': 'FFFFFF00'}}}, 0)
+    cache.put('entry', result)
+    assert not any(name.endswith('.pkl') for name in os.listdir(os.path.join(cache.cache_dir, 'entry')))
+    cached = cache.get('entry', str(tmp_path / 'input.xlsx'))
+    pd.testing.assert_frame_equal(cached[0], df)
+    assert cached[1:] == result[1:]
+
+    # An entry in the old pickled layout is a miss, not something to unpickle
+    planted = os.path.join(cache.cache_dir, 'planted')
+    os.makedirs(planted)
+    with open(os.path.join(planted, 'meta.pkl'), 'wb') as f:
+        f.write(b'\x80\x05N.')
+    assert cache.get('planted', 'input.xlsx') is None
+
+
+def test_native_reader_matches_openpyxl_reader(tmp_path):
+    path = str(tmp_path / 'input.xlsx')
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Filename', 'Transcription', 'Status'])
+    ws.append(['a.wav', 'hello', 1])
+    ws.append(['b.wav', None, 2.5])
+    ws.append(['c.wav', 'styled', datetime.datetime(2025, 1, 2, 3, 4)])
+    ws['A2'].fill = PatternFill('solid', start_color='FFFF00')
+    ws['A4'].font = Font(bold=True)
+    ws['B4'].font = Font(italic=True)
+    # A stray fill below the data leaves phantom rows 5-7
+    ws['C7'].fill = PatternFill('solid', start_color='00FF00')
+    wb.save(path)
+
+    native = xlsx_reader.read_xlsx_data_with_formatting(path)
+    reference = excel_reader.read_excel_data_with_formatting(path)
+    pd.testing.assert_frame_equal(native[0], reference[0])
+    assert native[1:] == reference[1:]
+    assert native[2][2] == {1: {'fill_color': '00FFFF00'}}
+    assert native[2][4] == {1: {'font': {'bold': True}}, 2: {'font': {'italic': True}}}
+    assert native[3] == 3
+
+
+@pytest.mark.parametrize('keep', ['first', 'last'])
+def test_dedup_across_spill(keep):
+    blocks = [pd.DataFrame({'Filename': ['a', 'b', 'a', 'c']}),
+              pd.DataFrame({'Filename': ['b', 'd', 'a']}),
+              pd.DataFrame({'Filename': ['d', 'e', 'c']})]
+    expected = ~pd.concat(blocks, ignore_index=True).duplicated(keep=keep)
+
+    with RowDeduplicator(max_memory_keys=1) as deduplicator:
+        masks = deduplicate_blocks(blocks, ['Filename'], deduplicator, keep=keep)
+        assert deduplicator.spilled_keys > 0
+    assert np.concatenate(masks).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('keep', ['first', 'last'])
+def test_dedup_mixed_types_across_spill(keep):
+    moment = datetime.datetime(2025, 1, 2, 3, 4)
+    # Equal values of different types, as different readers produce them
+    blocks = [pd.DataFrame({'Status': pd.Series([1, moment, 'ok'], dtype=object)}),
+              pd.DataFrame({'Status': pd.Series([1.0, pd.Timestamp(moment), 2.5], dtype=object)}),
+              pd.DataFrame({'Status': pd.Series([np.int64(1), np.datetime64(moment), 'ok'], dtype=object)})]
+    expected = ~pd.concat(blocks, ignore_index=True).duplicated(keep=keep)
+
+    with RowDeduplicator(max_memory_keys=1) as deduplicator:
+        masks = deduplicate_blocks(blocks, ['Status'], deduplicator, keep=keep)
+        assert deduplicator.spilled_keys > 0
+    assert np.concatenate(masks).tolist() == expected.tolist()
+
+
+def test_plan_shards_at_row_limit():
+    limit = DEFAULT_SHARD_ROWS
+    assert plan_shards([limit]) == [(0, limit)]
+    # A group that no longer fits starts a new shard
+    assert plan_shards([limit - 1, 2]) == [(0, limit - 1), (limit - 1, limit + 1)]
+    # A group larger than a whole shard is split at the limit
+    assert plan_shards([limit + 1]) == [(0, limit), (limit, limit + 1)]
+
+
+def test_shard_files_excluded_from_scan(tmp_path):
+    for name in ['combined_001.xlsx', 'combined_012.xlsx', 'combined_2024_final.xlsx',
+                 'combined_0001.xlsx', 'report.xlsx']:
+        (tmp_path / name).write_bytes(b'')
+    files = scan_excel_files(str(tmp_path), exclude_regex=[shard_file_regex('combined.xlsx')])
+    assert sorted(f.relative_path for f in files) == ['combined_0001.xlsx', 'combined_2024_final.xlsx',
+                                                       'report.xlsx']
+
+
 def main():
     # Test with sample data
     sample_folder = "/Users/gr4yf1r3/Library/CloudStorage/OneDrive-Nuance/audioMover/_migration/walgreens_excelPlayground/ReDooV2/en_transcriptions_locationprompt_Tuned_9.15.2025_For_ScriptSplits_part1-4/sample_data"
@@ -12,8 +12,17 @@ sys.path.append('/Users/gr4yf1r3/Library/CloudStorage/OneDrive-Nuance/audioMover
 # Import the combiner class
 from excel_combiner_gui import ExcelCombinerGUI
 import tkinter as tk
+import pytest
+
+from combine_options import SheetSelection
+from openpyxl import Workbook
+from folder_scanner import scan_excel_files
+from workbook_prescan import prescan_files
 
 class TestCombiner:
+    # Needs a display and the sample folder; run by main(), not collected by pytest
+    __test__ = False
+
     def __init__(self):
         # Create a minimal GUI instance for testing
         root = tk.Tk()
@@ -30,6 +39,52 @@ class TestCombiner:
         result = self.app.combine_excel_files()
         return result
 
+def test_combine_settings_snapshot(tmp_path):
+    gui = ExcelCombinerGUI.__new__(ExcelCombinerGUI)
+    gui.create_variables(tk.Tcl())
+    gui.folder_path.set(str(tmp_path))
+    gui.workers.set(2)
+    gui.sheet_pattern.set('^Q[1-4]$')
+    gui.sheet_column.set(True)
+
+    settings = gui.combine_settings()
+    assert settings.workers == 2
+    assert settings.sheets == SheetSelection((), ('^Q[1-4]$',))
+    assert settings.sheet_column is True
+    # The worker thread gets plain values, not the Tk variables
+    gui.workers.set(4)
+    assert settings.workers == 2
+
+
+def test_combine_settings_rejects_non_numeric_workers(tmp_path):
+    gui = ExcelCombinerGUI.__new__(ExcelCombinerGUI)
+    gui.create_variables(tk.Tcl())
+    gui.folder_path.set(str(tmp_path))
+    gui.workers.set('two')
+    with pytest.raises(ValueError, match='Workers'):
+        gui.combine_settings()
+
+
+def test_prescan_reused_only_for_unchanged_files(tmp_path):
+    for name in 'ab':
+        wb = Workbook()
+        wb.active.append(['Filename', 'Transcription', 'Status'])
+        wb.save(str(tmp_path / f'{name}.xlsx'))
+    scanned_files = scan_excel_files(str(tmp_path))
+    workbooks = prescan_files([scanned_file.path for scanned_file in scanned_files])
+
+    gui = ExcelCombinerGUI.__new__(ExcelCombinerGUI)
+    gui.prescan = (str(tmp_path), None, workbooks)
+    assert gui.prescan_results(str(tmp_path), None, scanned_files) is workbooks
+
+    # A modified file invalidates the pre-scan
+    wb = Workbook()
+    wb.active.append(['Filename', 'Transcription', 'Status'])
+    wb.active.append(['b.wav', 'added', 'ok'])
+    wb.save(str(tmp_path / 'b.xlsx'))
+    assert gui.prescan_results(str(tmp_path), None, scan_excel_files(str(tmp_path))) is None
+
+
 def main():
     tester = TestCombiner()
     success = tester.test_combine()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Workbook Pre-scan
+
+Sizes up a combine before it runs. Each xlsx package is opened through its
+zip directory, and only a few parts are read: the workbook part with the
+sheet list, the start of every scanned sheet's XML (its <dimension> tag and
+first rows) and the few shared strings the header row uses. A workbook is
+never loaded fully, so a folder of large files is pre-scanned in well under
+a second per file.
+
+The row count of a sheet is approximate. It is taken from the <dimension>
+tag, or estimated from the size of the sheet XML in the zip directory and
+the bytes per row of the first rows when the tag is missing (write-only
+writers leave it out) or declares far more rows than the XML can hold
+(stray formatting far below the data). The summary adds up the rows the
+combine will produce, lists header mismatches and files that do not fit on
+one sheet, and estimates the runtime and peak memory of the combine.
+
+Only the standard library is used, so the GUI can pre-scan a folder while
+pandas and openpyxl are still loading. Other formats (.xls) are not
+pre-scanned.
+"""
+
+import os
+import re
+import zipfile
+from collections import namedtuple
+import xml.etree.ElementTree as ET
+
+from combine_options import DEFAULT_READER_BACKEND
+from output_shards import plan_shards, DEFAULT_SHARD_ROWS
+from xlsx_package import MAIN_NS, column_index, text_content, read_workbook, sheet_path
+
+# Bytes read from the start of every sheet XML
+PRESCAN_SAMPLE_BYTES = 65536
+
+# Columns of the header row that are compared between files (A-C are combined)
+HEADER_COLUMNS = 3
+
+# A <dimension> tag declaring more than this many times the rows the sheet XML
+# can hold is taken to include stray formatting, and the size estimate is used
+DIMENSION_SLACK = 2
+
+# Rough combine cost, measured with benchmarks/run_benchmarks.py workbooks
+# (single process, Python memory): rows read per second by each reader
+# backend, rows written per second, and memory per row while a file is read,
+# per combined row, and per row of an in-memory (non-streaming) workbook
+ESTIMATED_READ_ROWS_PER_SECOND = {'openpyxl': 12000, 'native': 35000}
+ESTIMATED_WRITE_ROWS_PER_SECOND = 13000
+ESTIMATED_READ_BYTES_PER_ROW = 700
+ESTIMATED_COMBINED_BYTES_PER_ROW = 150
+ESTIMATED_WORKBOOK_BYTES_PER_ROW = 1500
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="[A-Z]*(\d*):?[A-Z]*(\d*)"')
+_SHEET_DATA = re.compile(rb'<(?:\w+:)?sheetData[\s>]')
+_ROW_START = re.compile(rb'<(?:\w+:)?row[\s>/]')
+_CELL_REFERENCE = re.compile(r'([A-Z]+)(\d*)')
+
+# Pre-scan of one sheet: its dimension ref ('' if missing), approximate row
+# count (header included) and header row (columns A-C)
+SheetPrescan = namedtuple('SheetPrescan', ['name', 'dimension', 'rows', 'header'])
+
+# Pre-scan of one workbook; size and mtime come from the same stat as the scan
+WorkbookPrescan = namedtuple('WorkbookPrescan', ['path', 'size', 'mtime', 'sheets', 'error'])
+
+
+def _first_row_cells(sample):
+    """
+    Parse the first row of a sheet from the start of its XML.
+
+    Returns:
+        dict: {column: (cell type, raw text)} of columns A-C, empty if the
+            sample holds no complete row
+    """
+    parser = ET.XMLPullParser(events=('end',))
+    cells = {}
+    try:
+        parser.feed(sample)
+        for _, element in parser.read_events():
+            if element.tag == MAIN_NS + 'c':
+                reference = _CELL_REFERENCE.match(element.get('r', ''))
+                column = column_index(reference.group(1)) if reference else len(cells) + 1
+                if column > HEADER_COLUMNS:
+                    continue
+                cell_type = element.get('t', 'n')
+                if cell_type == 'inlineStr':
+                    inline = element.find(MAIN_NS + 'is')
+                    cells[column] = ('str', text_content(inline) if inline is not None else '')
+                else:
+                    value = element.find(MAIN_NS + 'v')
+                    cells[column] = (cell_type, (value.text or '') if value is not None else '')
+            elif element.tag == MAIN_NS + 'row':
+                return cells
+    except ET.ParseError:
+        pass  # The sample ends inside a tag or the XML is malformed: no complete row
+    return {}
+
+
+def _shared_strings(package, indexes):
+    """Read the shared strings with the given indexes, stopping after the last one needed."""
+    strings = {}
+    if not indexes:
+        return strings
+    last_index = max(indexes)
+    try:
+        source = package.open('xl/sharedStrings.xml')
+    except KeyError:
+        return strings
+    with source:
+        index = 0
+        for _, element in ET.iterparse(source):
+            if element.tag != MAIN_NS + 'si':
+                continue
+            if index in indexes:
+                strings[index] = text_content(element)
+            element.clear()
+            if index >= last_index:
+                break
+            index += 1
+    return strings
+
+
+def _estimate_rows(sample, sheet_size):
+    """
+    Estimate the rows of a sheet from the size of its XML and the bytes per row of its first rows.
+
+    Returns:
+        int: Approximate number of row elements (0 if the sample holds none)
+    """
+    starts = [match.start() for match in _ROW_START.finditer(sample)]
+    if not starts:
+        return 0
+    if len(sample) >= sheet_size or len(starts) == 1:
+        # The whole sheet was sampled (or one row fills the sample)
+        return len(starts)
+    bytes_per_row = (starts[-1] - starts[0]) / (len(starts) - 1)
+    return max(len(starts), round((sheet_size - starts[0]) / bytes_per_row))
+
+
+def _prescan_sheet(package, name, sheet_path):
+    """Pre-scan one worksheet of an open package."""
+    sheet_size = package.getinfo(sheet_path).file_size
+    with package.open(sheet_path) as source:
+        sample = source.read(PRESCAN_SAMPLE_BYTES)
+
+    dimension = ''
+    dimension_rows = 0
+    match = _DIMENSION.search(sample)
+    if match:
+        dimension = match.group(0).split(b'"')[1].decode('ascii')
+        dimension_rows = int(match.group(2) or match.group(1) or 0)
+
+    estimated_rows = 0
+    sheet_data = _SHEET_DATA.search(sample)
+    if sheet_data:
+        estimated_rows = _estimate_rows(sample[sheet_data.end():], sheet_size - sheet_data.end())
+
+    rows = dimension_rows
+    if not rows or rows == 1 or (estimated_rows and rows > estimated_rows * DIMENSION_SLACK):
+        rows = estimated_rows
+
+    cells = _first_row_cells(sample)
+    strings = _shared_strings(package, {int(text) for cell_type, text in cells.values()
+                                        if cell_type == 's' and text.isdigit()})
+    header = []
+    for column in range(1, HEADER_COLUMNS + 1):
+        cell_type, text = cells.get(column, ('str', ''))
+        header.append(strings.get(int(text), '') if cell_type == 's' and text.isdigit() else text)
+    return SheetPrescan(name, dimension, rows, tuple(header))
+
+
+def prescan_workbook(file_path, sheets=None, file_stat=None):
+    """
+    Pre-scan one workbook without loading it.
+
+    Args:
+        file_path (str): Path of the Excel file
+        sheets (combine_options.SheetSelection): Sheets to pre-scan (default: the active sheet)
+        file_stat (folder_scanner.ScannedFile): Size and modification time from
+            the folder scan, so the file is not stat'ed again
+
+    Returns:
+        WorkbookPrescan: The scanned sheets, or the error that stopped the
+            pre-scan (e.g. for .xls files)
+    """
+    size = mtime = None
+    try:
+        if file_stat is not None:
+            size, mtime = file_stat.size, file_stat.mtime
+        else:
+            stat = os.stat(file_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        if not zipfile.is_zipfile(file_path):
+            return WorkbookPrescan(file_path, size, mtime, [], "not an xlsx package, not pre-scanned")
+        with zipfile.ZipFile(file_path) as package:
+            workbook = read_workbook(package)
+            if sheets is None:
+                selected = [(workbook.sheets[workbook.active_tab][0], sheet_path(workbook))]
+            else:
+                selected = [(name, sheet_path(workbook, name))
+                            for name in sheets.select([name for name, _ in workbook.sheets])]
+            return WorkbookPrescan(file_path, size, mtime,
+                                   [_prescan_sheet(package, name, path) for name, path in selected], None)
+    except Exception as e:
+        return WorkbookPrescan(file_path, size, mtime, [], str(e))
+
+
+def prescan_files(file_paths, sheets=None, file_stats=None, cancel_event=None):
+    """
+    Pre-scan a list of Excel files.
+
+    Args:
+        file_paths (list): Excel files, in combine order
+        sheets (combine_options.SheetSelection): Sheets to pre-scan (default: the active sheet)
+        file_stats (dict): Optional {path: folder_scanner.ScannedFile}
+        cancel_event (threading.Event): When set, the pre-scan stops before the next file
+
+    Returns:
+        dict: {path: WorkbookPrescan}, in combine order
+    """
+    workbooks = {}
+    for file_path in file_paths:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        workbooks[file_path] = prescan_workbook(file_path, sheets, (file_stats or {}).get(file_path))
+    return workbooks
+
+
+def prescan_group_rows(workbooks):
+    """
+    Get the approximate output rows of every file's group, in combine order.
+
+    Like the combine, the first sheet keeps all its rows below the header
+    and every later sheet loses its first data row; empty sheets are left out.
+
+    Returns:
+        list: Rows of every file that adds rows
+    """
+    group_rows = []
+    first_block = True
+    for workbook in workbooks.values():
+        rows = 0
+        for sheet in workbook.sheets:
+            if sheet.rows < 2:
+                continue
+            # The header row becomes the column names; later blocks also skip
+            # their first row unless it is their only one
+            data_rows = sheet.rows - 1
+            rows += data_rows if first_block or data_rows == 1 else data_rows - 1
+            first_block = False
+        if rows:
+            group_rows.append(rows)
+    return group_rows
+
+
+def estimate_cost(group_rows, reader_backend=DEFAULT_READER_BACKEND, workers=1, streaming=True):
+    """
+    Estimate the runtime and peak memory of a combine.
+
+    Args:
+        group_rows (list): Output rows of every file (see prescan_group_rows())
+        reader_backend (str): Reader backend (see combine_engine.READER_BACKENDS)
+        workers (int): Worker processes reading the files
+        streaming (bool): Whether the output is written with the streaming engine
+
+    Returns:
+        tuple: (estimated seconds, estimated peak bytes)
+    """
+    total_rows = sum(group_rows)
+    read_workers = max(1, min(workers, len(group_rows)))
+    read_rate = ESTIMATED_READ_ROWS_PER_SECOND.get(reader_backend, ESTIMATED_READ_ROWS_PER_SECOND['openpyxl'])
+    seconds = total_rows / (read_rate * read_workers) + total_rows / ESTIMATED_WRITE_ROWS_PER_SECOND
+
+    # The largest files are read at the same time, one per worker
+    largest_rows = sum(sorted(group_rows, reverse=True)[:read_workers])
+    peak_bytes = largest_rows * ESTIMATED_READ_BYTES_PER_ROW + total_rows * ESTIMATED_COMBINED_BYTES_PER_ROW
+    if not streaming:
+        peak_bytes += total_rows * ESTIMATED_WORKBOOK_BYTES_PER_ROW
+    return seconds, peak_bytes
+
+
+def summarize_prescan(workbooks, reader_backend=DEFAULT_READER_BACKEND, workers=1, streaming=True,
+                      shard_rows=DEFAULT_SHARD_ROWS):
+    """
+    Sum up the pre-scan of the files of a combine.
+
+    Args:
+        workbooks (dict): {path: WorkbookPrescan}, in combine order
+        reader_backend (str): Reader backend of the combine
+        workers (int): Worker processes of the combine
+        streaming (bool): Whether the combine writes with the streaming engine
+        shard_rows (int): Most data rows per output sheet
+
+    Returns:
+        dict: 'files', 'scanned' (files pre-scanned), 'rows' (approximate
+            data rows of the output, like the combine's summary), 'header', 'header_mismatches'
+            ([(path, sheet name, header)] of sheets whose header differs from
+            the first one), 'files_over_limit' ([(path, rows)] of files with
+            more rows than one output sheet holds), 'shards', 'errors'
+            ([(path, error)]), 'estimated_seconds' and 'estimated_peak_bytes'
+    """
+    header = None
+    header_mismatches = []
+    for workbook in workbooks.values():
+        for sheet in workbook.sheets:
+            if sheet.rows < 2:
+                continue
+            normalized = tuple(value.strip() for value in sheet.header)
+            if header is None:
+                header = normalized
+            elif normalized != header:
+                header_mismatches.append((workbook.path, sheet.name, sheet.header))
+
+    group_rows = prescan_group_rows(workbooks)
+    files_over_limit = []
+    file_rows = iter(group_rows)
+    for workbook in workbooks.values():
+        if any(sheet.rows >= 2 for sheet in workbook.sheets):
+            rows = next(file_rows)
+            if rows > shard_rows:
+                files_over_limit.append((workbook.path, rows))
+
+    seconds, peak_bytes = estimate_cost(group_rows, reader_backend, workers, streaming)
+    return {
+        'files': len(workbooks),
+        'scanned': sum(1 for workbook in workbooks.values() if workbook.error is None),
+        'rows': sum(group_rows),
+        'header': header,
+        'header_mismatches': header_mismatches,
+        'files_over_limit': files_over_limit,
+        'shards': len(plan_shards(group_rows, shard_rows)),
+        'errors': [(workbook.path, workbook.error) for workbook in workbooks.values() if workbook.error],
+        'estimated_seconds': seconds,
+        'estimated_peak_bytes': peak_bytes,
+    }
+
+
+def format_prescan(summary):
+    """
+    Describe a pre-scan summary for the log.
+
+    Returns:
+        str: Multi-line description
+    """
+    lines = [f"Pre-scan: about {summary['rows']:,} rows from {summary['scanned']} of {summary['files']} file(s); "
+             f"estimated {summary['estimated_seconds']:.1f}s and "
+             f"{summary['estimated_peak_bytes'] / (1024 * 1024):.0f} MB peak memory"]
+    if summary['shards'] > 1:
+        lines.append(f"  More rows than one output sheet holds: the output will be split into "
+                     f"about {summary['shards']} parts")
+    for path, rows in summary['files_over_limit']:
+        lines.append(f"  {os.path.basename(path)}: about {rows:,} rows, more than one output sheet holds")
+    if summary['header_mismatches']:
+        lines.append(f"  Header differs from {', '.join(summary['header'])}:")
+        for path, sheet_name, header in summary['header_mismatches']:
+            name = os.path.basename(path) + (f" [{sheet_name}]" if sheet_name else "")
+            lines.append(f"    {name}: {', '.join(header)}")
+    for path, error in summary['errors']:
+        lines.append(f"  {os.path.basename(path)}: {error}")
+    return '\n'.join(lines)
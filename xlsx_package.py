@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+XLSX Package
+
+The parts of reading an xlsx package that the native reader (xlsx_reader)
+and the pre-scan (workbook_prescan) share: the XML namespaces, cell
+references, string items, and the sheet list of the workbook part with the
+path of every sheet's XML resolved through the workbook relationships.
+
+Only the standard library is used, so the GUI can pre-scan a folder while
+pandas and openpyxl are still loading.
+"""
+
+import re
+import posixpath
+from collections import namedtuple
+import xml.etree.ElementTree as ET
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_TEXT = MAIN_NS + 't'
+_PHONETIC_RUN = MAIN_NS + 'rPh'
+
+_COLUMN_LETTERS = re.compile(r'[A-Z]+')
+
+# Sheet list of a workbook part: [(sheet name, path of the sheet XML)] in
+# workbook order (the path is None if the workbook relationships lack the
+# sheet), the index of the active sheet, and whether dates use the 1904 epoch
+WorkbookParts = namedtuple('WorkbookParts', ['sheets', 'active_tab', 'date1904'])
+
+
+def column_index(reference):
+    """Convert the column letters of a cell reference such as 'AB12' (or just 'AB') to a 1-based index."""
+    index = 0
+    for letter in _COLUMN_LETTERS.match(reference).group():
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def text_content(element):
+    """Join the text runs of a string item (<si> or <is>), leaving out phonetic runs."""
+    parts = []
+    for child in element:
+        if child.tag == _TEXT:
+            parts.append(child.text or '')
+        elif child.tag != _PHONETIC_RUN:
+            parts.extend(t.text or '' for t in child.iter(_TEXT))
+    return ''.join(parts)
+
+
+def package_path(base_dir, target):
+    """Resolve a relationship target against the folder of its source part."""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def read_workbook(package):
+    """
+    Read the sheet list of a workbook.
+
+    Args:
+        package (zipfile.ZipFile): Open xlsx package
+
+    Returns:
+        WorkbookParts: The sheets with the paths of their XML, the active sheet
+            and the date epoch
+
+    Raises:
+        ValueError: If the workbook has no sheets
+    """
+    workbook = ET.fromstring(package.read('xl/workbook.xml'))
+    sheets = workbook.find(MAIN_NS + 'sheets')
+    if sheets is None or not len(sheets):
+        raise ValueError("Workbook contains no sheets")
+
+    active_tab = 0
+    view = workbook.find(f'{MAIN_NS}bookViews/{MAIN_NS}workbookView')
+    if view is not None:
+        active_tab = int(view.get('activeTab', 0))
+    if active_tab >= len(sheets):
+        active_tab = 0
+
+    properties = workbook.find(MAIN_NS + 'workbookPr')
+    date1904 = properties is not None and properties.get('date1904', '0').lower() in ('1', 'true')
+
+    rels = ET.fromstring(package.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(PACKAGE_REL_NS + 'Relationship')}
+    sheet_list = []
+    for sheet in sheets:
+        target = targets.get(sheet.get(REL_NS + 'id'))
+        sheet_list.append((sheet.get('name'), package_path('xl', target) if target is not None else None))
+
+    return WorkbookParts(sheet_list, active_tab, date1904)
+
+
+def sheet_path(workbook, sheet_name=None):
+    """
+    Get the path of a worksheet's XML, by name or the active one like openpyxl's workbook.active.
+
+    Args:
+        workbook (WorkbookParts): Sheet list from read_workbook()
+        sheet_name (str): Name of the sheet (default: the active sheet)
+
+    Raises:
+        KeyError: If the workbook has no sheet named sheet_name
+        ValueError: If the workbook relationships lack the sheet
+    """
+    if sheet_name is None:
+        sheet_name, path = workbook.sheets[workbook.active_tab]
+    else:
+        paths = dict(workbook.sheets)
+        if sheet_name not in paths:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        path = paths[sheet_name]
+    if path is None:
+        raise ValueError(f"Worksheet relationship of {sheet_name} not found")
+    return path
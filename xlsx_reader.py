@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Native XLSX Reader
+
+Streaming reader backend that reads the xlsx package directly instead of
+going through openpyxl's cell objects. The style table (styles.xml) is
+resolved once per workbook into a compact tuple per cell style index, the
+shared strings are loaded once, and the sheet XML is streamed with an
+incremental parser that clears every row once it has been converted, so
+only plain values and the few formats the combiner needs (fill color and
+bold/italic) are ever materialized.
+
+The result is the same as excel_reader.read_excel_data_with_formatting():
+values are converted like pandas.read_excel converts them and the data
+extent rules are shared. Only .xlsx/.xlsm packages are supported.
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import from_excel, from_ISO8601, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+
+from excel_reader import build_formatted_result
+from xlsx_package import MAIN_NS, column_index, text_content, read_workbook, sheet_path
+
+# Bump whenever the result of read_xlsx_data_with_formatting() changes (parse cache key)
+XLSX_READER_VERSION = 1
+
+_SHEET_DATA = MAIN_NS + 'sheetData'
+_ROW = MAIN_NS + 'row'
+_CELL = MAIN_NS + 'c'
+_VALUE = MAIN_NS + 'v'
+_INLINE_STRING = MAIN_NS + 'is'
+
+# Cell style without fill or bold/italic font
+_PLAIN_STYLE = (None, False, False, None)
+
+
+def _is_true(element):
+    """Read a boolean flag element such as <b/> or <i val="0"/>."""
+    return element is not None and element.get('val', '1').lower() not in ('0', 'false')
+
+
+def _find_sheet(package, sheet_name=None):
+    """
+    Find a worksheet of a workbook by name, or the active one like openpyxl's workbook.active.
+
+    Returns:
+        tuple: (path of the sheet XML in the package, epoch of the workbook's dates)
+
+    Raises:
+        KeyError: If the workbook has no sheet named sheet_name
+    """
+    workbook = read_workbook(package)
+    epoch = CALENDAR_MAC_1904 if workbook.date1904 else CALENDAR_WINDOWS_1900
+    return sheet_path(workbook, sheet_name), epoch
+
+
+def list_sheet_names(file_path):
+    """
+    List the sheet names of a workbook in workbook order.
+
+    Only the workbook part of an xlsx package is parsed, so listing is cheap
+    even for large workbooks. Other formats (.xls) are listed through pandas.
+    """
+    if not zipfile.is_zipfile(file_path):
+        with pd.ExcelFile(file_path) as workbook:
+            return list(workbook.sheet_names)
+    with zipfile.ZipFile(file_path) as package:
+        return [name for name, _ in read_workbook(package).sheets]
+
+
+def read_shared_strings(package):
+    """Read the shared string table of a workbook as a list of strings."""
+    try:
+        source = package.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, element in ET.iterparse(source):
+            if element.tag == MAIN_NS + 'si':
+                strings.append(text_content(element))
+                element.clear()
+    return strings
+
+
+def read_style_table(package):
+    """
+    Resolve the cell styles (cellXfs) of a workbook once.
+
+    Returns:
+        list: One (fill rgb or None, bold, italic, number format or None) tuple
+            per style index; the number format is only set for date and
+            duration formats
+    """
+    try:
+        styles = ET.fromstring(package.read('xl/styles.xml'))
+    except KeyError:
+        return []
+
+    number_formats = dict(BUILTIN_FORMATS)
+    for number_format in styles.iter(MAIN_NS + 'numFmt'):
+        number_formats[int(number_format.get('numFmtId'))] = number_format.get('formatCode')
+
+    fill_colors = []
+    for fill in styles.iterfind(f'{MAIN_NS}fills/{MAIN_NS}fill'):
+        pattern = fill.find(MAIN_NS + 'patternFill')
+        color = None
+        if pattern is not None and pattern.get('patternType', 'none') != 'none':
+            fg_color = pattern.find(MAIN_NS + 'fgColor')
+            # Theme and indexed colors carry no rgb and never count as highlighting
+            if fg_color is not None:
+                color = fg_color.get('rgb')
+        fill_colors.append(color)
+
+    fonts = [(_is_true(font.find(MAIN_NS + 'b')), _is_true(font.find(MAIN_NS + 'i')))
+             for font in styles.iterfind(f'{MAIN_NS}fonts/{MAIN_NS}font')]
+
+    style_table = []
+    for xf in styles.iterfind(f'{MAIN_NS}cellXfs/{MAIN_NS}xf'):
+        fill_id = int(xf.get('fillId', 0))
+        font_id = int(xf.get('fontId', 0))
+        fill_color = fill_colors[fill_id] if fill_id < len(fill_colors) else None
+        bold, italic = fonts[font_id] if font_id < len(fonts) else (False, False)
+        number_format = number_formats.get(int(xf.get('numFmtId', 0)))
+        if number_format is None or not is_date_format(number_format):
+            number_format = None
+        style_table.append((fill_color, bold, italic, number_format))
+    return style_table
+
+
+def _style_format(style):
+    """Build the cell format dict of a resolved style, as excel_reader._cell_format() does."""
+    fill_color, bold, italic, _ = style
+    cell_format = {}
+    if fill_color:
+        cell_format['fill_color'] = fill_color
+    if bold or italic:
+        font_info = {}
+        if bold:
+            font_info['bold'] = True
+        if italic:
+            font_info['italic'] = True
+        cell_format['font'] = font_info
+    return cell_format
+
+
+def _convert_value(cell_type, text, style, epoch):
+    """Convert the raw value of a cell the same way pandas.read_excel does."""
+    if cell_type == 'n':
+        number = float(text) if ('.' in text or 'E' in text or 'e' in text) else int(text)
+        number_format = style[3]
+        if number_format is not None:
+            return from_excel(number, epoch, timedelta=is_timedelta_format(number_format))
+        if isinstance(number, float) and number.is_integer():
+            return int(number)
+        return number
+    if cell_type in ('s', 'str', 'inlineStr'):
+        return text
+    if cell_type == 'b':
+        return bool(int(text))
+    if cell_type == 'e':
+        return float('nan')
+    if cell_type == 'd':
+        return from_ISO8601(text)
+    return text
+
+
+def _stream_rows(source, shared_strings, style_table, epoch):
+    """
+    Stream the rows of a worksheet.
+
+    Yields:
+        tuple: (1-based row number, converted cell values, {column: cell format})
+    """
+    format_cache = {}
+    row_number = 0
+    sheet_data = None
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == _SHEET_DATA:
+                sheet_data = element
+            continue
+        if element.tag != _ROW:
+            continue
+
+        row_number = int(element.get('r', row_number + 1))
+        values = []
+        row_format = {}
+        column = 0
+        for cell in element.iter(_CELL):
+            reference = cell.get('r')
+            column = column_index(reference) if reference else column + 1
+            if len(values) < column - 1:
+                values.extend([""] * (column - 1 - len(values)))
+
+            style_index = int(cell.get('s', 0))
+            style = style_table[style_index] if style_index < len(style_table) else _PLAIN_STYLE
+            cell_format = format_cache.get(style_index)
+            if cell_format is None:
+                cell_format = format_cache[style_index] = _style_format(style)
+            if cell_format:
+                # The dicts are shared between cells; readers never modify them
+                row_format[column] = cell_format
+
+            cell_type = cell.get('t', 'n')
+            if cell_type == 'inlineStr':
+                inline = cell.find(_INLINE_STRING)
+                text = text_content(inline) if inline is not None else None
+            else:
+                value = cell.find(_VALUE)
+                text = value.text if value is not None else None
+
+            if text is None:
+                values.append("")
+            elif cell_type == 's':
+                values.append(shared_strings[int(text)])
+            else:
+                values.append(_convert_value(cell_type, text, style, epoch))
+
+        # Drop the finished row so the parsed tree never grows with the sheet
+        if sheet_data is not None:
+            del sheet_data[:]
+        yield row_number, values, row_format
+
+
+def _declared_max_row(package, sheet_path):
+    """Read the last row of the sheet's dimension tag without parsing the sheet (0 if missing)."""
+    with package.open(sheet_path) as source:
+        head = source.read(4096).decode('utf-8', errors='ignore')
+    match = re.search(r'<(?:\w+:)?dimension\s+ref="[A-Z]*\d*:?[A-Z]*(\d+)"', head)
+    return int(match.group(1)) if match else 0
+
+
+def read_xlsx_data_with_formatting(file_path, sheet_name=None):
+    """
+    Read an xlsx file and return its data together with row formatting.
+
+    Drop-in alternative to excel_reader.read_excel_data_with_formatting()
+    that parses the package natively.
+
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_name (str): Name of the sheet to read (default: the active sheet)
+
+    Returns:
+        tuple: (DataFrame, source filename, row formats, phantom row count),
+            see excel_reader.read_excel_data_with_formatting()
+
+    Raises:
+        Exception: Any error raised while opening or parsing the workbook
+    """
+    with zipfile.ZipFile(file_path) as package:
+        sheet_path, epoch = _find_sheet(package, sheet_name)
+        shared_strings = read_shared_strings(package)
+        style_table = read_style_table(package)
+        declared_max_row = _declared_max_row(package, sheet_path)
+        with package.open(sheet_path) as source:
+            return build_formatted_result(_stream_rows(source, shared_strings, style_table, epoch),
+                                          declared_max_row, file_path)